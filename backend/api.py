@@ -0,0 +1,202 @@
+"""JSON read API over claims for integrations (``GET /api/claims/``).
+
+Query parameters:
+
+- ``ids=1,2,3``: fetch these claims (up to ``CLAIMS_API_MAX_IDS``) in one call;
+  ids that match no claim are listed under ``missing``
+- ``cursor``/``limit``: otherwise claims are paged in claim id order. Pass the
+  ``next_cursor`` (a claim id) of a page back as ``cursor`` for the next one; it is null on
+  the last page. ``limit`` defaults to ``DEFAULT_LIMIT`` and is capped at
+  ``CLAIMS_API_MAX_LIMIT``
+- ``fields=id,billed_amount,status``: only these of ``FIELDS`` (default: all)
+- ``include=detail,notes,flags``: add the claim's detail, notes and flags
+- ``archived=1`` and the dashboard filters (``status``, ``billed_min``, ...,
+  see database/claim_query.py) narrow either mode; ``sort`` is ignored
+
+Claims are read as ``values()`` projections of just the requested columns,
+never as model instances: one query per claim database for the claims (the
+detail is joined in) and one per included relation. Responses are gzipped for
+clients that send ``Accept-Encoding: gzip``.
+"""
+import asyncio
+import heapq
+from collections import defaultdict
+from operator import itemgetter
+
+from django.conf import settings
+
+from database import claim_query
+
+DEFAULT_LIMIT = 100
+# Ids and cursors must fit a signed 64-bit column; larger values are bad input, not server errors
+MAX_INTEGER = 2 ** 63 - 1
+
+# Public field name -> values() path; ``underpayment`` and ``archived`` are derived
+FIELDS = {
+    'id': 'id',
+    'patient_name': 'patient_name',
+    'billed_amount': 'billed_amount',
+    'paid_amount': 'paid_amount',
+    'underpayment': None,
+    'status': 'status',
+    'insurer_name': 'insurer_name',
+    'discharge_date': 'discharge_date',
+    'created_at': 'created_at',
+    'priority_score': 'priority_score',
+    'archived': None,
+}
+
+DETAIL_FIELDS = {
+    'denial_reason': 'detail__denial_reason__text',
+    'cpt_codes': 'detail__cpt_codes',
+}
+
+# include= name -> (related name on the claim models, columns of each row)
+RELATIONS = {
+    'notes': ('notes', ['id', 'text', 'created_by_id', 'created_at']),
+    'flags': ('flags', ['id', 'created_by_id', 'created_at']),
+}
+
+INCLUDES = ['detail', *RELATIONS]
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _names(value, allowed, label):
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise ValueError(f'Unknown {label}: {", ".join(unknown)} (expected some of {", ".join(allowed)})')
+    return list(dict.fromkeys(names))
+
+
+def parse_integer(value, label):
+    """``value`` as an int within ``MAX_INTEGER``; raises ValueError naming ``label`` otherwise."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f'{label} must be an integer') from None
+    if not -MAX_INTEGER - 1 <= number <= MAX_INTEGER:
+        raise ValueError(f'{label} is out of range')
+    return number
+
+
+class ApiQuery:
+    """The API's query string, validated; raises ValueError on bad input."""
+
+    def __init__(self, params):
+        self.fields = _names(params.get('fields', ''), FIELDS, 'field') or list(FIELDS)
+        self.includes = _names(params.get('include', ''), INCLUDES, 'include')
+        self.include_archived = params.get('archived') == '1'
+        self.claims = claim_query.ClaimQuery.from_params(params)
+
+        self.ids = None
+        if params.get('ids'):
+            self.ids = sorted({parse_integer(value, 'each id') for value in params['ids'].split(',') if value.strip()})
+            if not self.ids:
+                raise ValueError('ids must list at least one id')
+            max_ids = _setting('CLAIMS_API_MAX_IDS', 1000)
+            if len(self.ids) > max_ids:
+                raise ValueError(f'At most {max_ids} ids per request')
+        self.cursor = parse_integer(params['cursor'], 'cursor') if params.get('cursor') else 0
+        self.limit = parse_integer(params['limit'], 'limit') if params.get('limit') else DEFAULT_LIMIT
+        if not 1 <= self.limit <= _setting('CLAIMS_API_MAX_LIMIT', 1000):
+            raise ValueError(f'limit must be between 1 and {_setting("CLAIMS_API_MAX_LIMIT", 1000)}')
+
+    def columns(self):
+        """values() paths of the claim query: the requested fields, plus the id and detail."""
+        columns = {'id'}
+        for name in self.fields:
+            if FIELDS[name]:
+                columns.add(FIELDS[name])
+            elif name == 'underpayment':
+                columns.update(('billed_amount', 'paid_amount'))
+        if 'detail' in self.includes:
+            columns.update(DETAIL_FIELDS.values())
+        return sorted(columns)
+
+    def querysets(self):
+        """One values() queryset per claim source (shard, live/archived), in claim id order."""
+        querysets = []
+        for queryset in self.claims.querysets(self.include_archived):
+            queryset = queryset.order_by('id')
+            if self.ids is not None:
+                queryset = queryset.filter(id__in=self.ids)
+            else:
+                queryset = queryset.filter(id__gt=self.cursor)[:self.limit + 1]
+            querysets.append(queryset.values(*self.columns()))
+        return querysets
+
+
+def _shape(row, query, archived):
+    # The id leads every claim until afetch() is done with it
+    claim = {'id': row['id']}
+    for name in query.fields:
+        if name == 'underpayment':
+            claim[name] = max(row['billed_amount'] - row['paid_amount'], 0)
+        elif name == 'archived':
+            claim[name] = archived
+        else:
+            claim[name] = row[FIELDS[name]]
+    if 'detail' in query.includes:
+        # Claims without a detail row come back with nulls from the outer join
+        claim['detail'] = {name: row[path] for name, path in DETAIL_FIELDS.items()}
+    return claim
+
+
+async def _asource(queryset, query):
+    """(model, database, shaped claims) of one claim source."""
+    rows = [row async for row in queryset]
+    return queryset.model, queryset.db, [_shape(row, query, queryset.model.is_archived) for row in rows]
+
+
+async def _arelated(model, db, relation, claim_ids):
+    """{claim id: [row, ...]} of one relation of ``model`` for ``claim_ids`` on ``db``."""
+    related_name, columns = RELATIONS[relation]
+    related_model = model._meta.get_field(related_name).related_model
+    grouped = defaultdict(list)
+    if not claim_ids:
+        return grouped
+    async for row in (
+        related_model.objects.using(db).filter(claim_id__in=claim_ids)
+        .order_by('claim_id', 'created_at', 'id').values('claim_id', *columns)
+    ):
+        claim_id = row.pop('claim_id')
+        if 'created_by_id' in row:
+            row['created_by'] = row.pop('created_by_id')
+        grouped[claim_id].append(row)
+    return grouped
+
+
+async def afetch(query):
+    """The API response body for ``query``: its claims and, by mode, ``next_cursor`` or ``missing``."""
+    sources = await asyncio.gather(*(_asource(queryset, query) for queryset in query.querysets()))
+
+    if query.ids is None:
+        # Every source was read one claim past the limit; the page is the
+        # first ``limit`` claims across them
+        ids = sorted(claim['id'] for _, _, claims in sources for claim in claims)
+        page = set(ids[:query.limit])
+        sources = [(model, db, [claim for claim in claims if claim['id'] in page]) for model, db, claims in sources]
+        extra = {'next_cursor': ids[query.limit - 1] if len(ids) > query.limit else None}
+    else:
+        found = {claim['id'] for _, _, claims in sources for claim in claims}
+        extra = {'missing': [claim_id for claim_id in query.ids if claim_id not in found]}
+
+    relations = [relation for relation in query.includes if relation in RELATIONS]
+    lookups = [(claims, relation) for _, _, claims in sources for relation in relations]
+    results = await asyncio.gather(*(
+        _arelated(model, db, relation, [claim['id'] for claim in claims])
+        for model, db, claims in sources for relation in relations
+    ))
+    for (claims, relation), grouped in zip(lookups, results):
+        for claim in claims:
+            claim[relation] = grouped.get(claim['id'], [])
+
+    claims = list(heapq.merge(*(claims for _, _, claims in sources), key=itemgetter('id')))
+    if 'id' not in query.fields:
+        for claim in claims:
+            del claim['id']
+    return {'success': True, 'claims': claims, **extra}
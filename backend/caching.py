@@ -0,0 +1,254 @@
+"""Two-tier cache used by the views: a per-process LRU in front of the shared Django cache.
+
+Keys are versioned per data namespace. Writers call ``bump_version()`` after
+their transaction commits, which makes every cached entry of that namespace
+unreachable in all processes without deleting anything. When an entry is
+missing, only the process holding the recompute lock (``cache.add``) runs the
+computation; the others wait briefly for its result instead of stampeding the
+database.
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+# Data namespaces whose version counters invalidate cached entries
+CLAIMS = 'claims'
+
+_MISSING = object()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def shared_cache():
+    return caches[_setting('CACHE_LAYER_ALIAS', 'default')]
+
+
+class LRUCache:
+    """Thread-safe bounded mapping that evicts the least recently used entry."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=_MISSING):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class CacheMetrics:
+    """Per-process hit/miss counters and latency totals for the cache layer."""
+
+    COUNTERS = ('local_hits', 'shared_hits', 'misses', 'computes', 'lock_waits', 'lock_wait_timeouts')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = dict.fromkeys(self.COUNTERS, 0)
+            self.lookup_seconds = 0.0
+            self.lookups = 0
+            self.compute_seconds = 0.0
+
+    def incr(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def observe_lookup(self, seconds):
+        with self._lock:
+            self.lookups += 1
+            self.lookup_seconds += seconds
+
+    def observe_compute(self, seconds):
+        with self._lock:
+            self.counters['computes'] += 1
+            self.compute_seconds += seconds
+
+    def snapshot(self):
+        with self._lock:
+            hits = self.counters['local_hits'] + self.counters['shared_hits']
+            total = hits + self.counters['misses']
+            return {
+                **self.counters,
+                'hit_ratio': hits / total if total else 0.0,
+                'lookups': self.lookups,
+                'lookup_seconds_total': self.lookup_seconds,
+                'compute_seconds_total': self.compute_seconds,
+                'local_entries': len(local_cache),
+            }
+
+
+local_cache = LRUCache(_setting('CACHE_LOCAL_MAX_ENTRIES', 256))
+metrics = CacheMetrics()
+
+# namespace -> (version, checked_at); avoids a shared-cache round trip per lookup
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+def reset():
+    """Forget this process's cached entries and version counters (the shared tier is untouched)."""
+    local_cache.clear()
+    with _versions_lock:
+        _versions.clear()
+
+
+def _version_key(namespace):
+    return f'datavers:{namespace}'
+
+
+def data_version(namespace):
+    """Current version counter for a data namespace (re-read at most every CACHE_VERSION_CHECK_SECONDS)."""
+    now = time.monotonic()
+    with _versions_lock:
+        cached = _versions.get(namespace)
+    if cached and now - cached[1] < _setting('CACHE_VERSION_CHECK_SECONDS', 1.0):
+        return cached[0]
+
+    shared = shared_cache()
+    key = _version_key(namespace)
+    version = shared.get(key)
+    if version is None:
+        shared.add(key, 1, timeout=None)
+        version = shared.get(key, 1)
+    with _versions_lock:
+        _versions[namespace] = (version, now)
+    return version
+
+
+def bump_version(*namespaces):
+    """Invalidate every cached entry of the namespaces once the current transaction commits."""
+    def bump():
+        shared = shared_cache()
+        for namespace in namespaces:
+            key = _version_key(namespace)
+            try:
+                version = shared.incr(key)
+            except ValueError:
+                shared.add(key, 2, timeout=None)
+                version = shared.get(key, 2)
+            with _versions_lock:
+                _versions[namespace] = (version, time.monotonic())
+    transaction.on_commit(bump)
+
+
+def _full_key(namespace, key):
+    return f'{namespace}:v{data_version(namespace)}:{key}'
+
+
+def _lookup(full_key):
+    started = time.perf_counter()
+    value = local_cache.get(full_key)
+    if value is not _MISSING:
+        metrics.incr('local_hits')
+    else:
+        value = shared_cache().get(full_key, _MISSING)
+        if value is not _MISSING:
+            metrics.incr('shared_hits')
+            local_cache.set(full_key, value)
+    metrics.observe_lookup(time.perf_counter() - started)
+    return value
+
+
+def _store(full_key, value, timeout):
+    shared_cache().set(full_key, value, timeout)
+    local_cache.set(full_key, value)
+
+
+def get_or_compute(namespace, key, compute, timeout=None):
+    """Return the cached value for ``key`` or compute it once across all workers."""
+    timeout = timeout if timeout is not None else _setting('CACHE_LAYER_TIMEOUT', 300)
+    full_key = _full_key(namespace, key)
+    value = _lookup(full_key)
+    if value is not _MISSING:
+        return value
+    metrics.incr('misses')
+
+    shared = shared_cache()
+    lock_key = f'lock:{full_key}'
+    locked = shared.add(lock_key, 1, _setting('CACHE_LOCK_TIMEOUT', 30))
+    if not locked:
+        # Another worker is recomputing; wait for its result before doing the work ourselves
+        metrics.incr('lock_waits')
+        deadline = time.monotonic() + _setting('CACHE_LOCK_WAIT_SECONDS', 5)
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            value = shared.get(full_key, _MISSING)
+            if value is not _MISSING:
+                local_cache.set(full_key, value)
+                return value
+        metrics.incr('lock_wait_timeouts')
+
+    try:
+        started = time.perf_counter()
+        value = compute()
+        metrics.observe_compute(time.perf_counter() - started)
+        _store(full_key, value, timeout)
+        return value
+    finally:
+        # After a wait timeout the lock is still the other worker's
+        if locked:
+            shared.delete(lock_key)
+
+
+async def aget_or_compute(namespace, key, acompute, timeout=None):
+    """Async get_or_compute() for coroutine functions, used by the async views."""
+    timeout = timeout if timeout is not None else _setting('CACHE_LAYER_TIMEOUT', 300)
+    full_key = await sync_to_async(_full_key)(namespace, key)
+    value = await sync_to_async(_lookup)(full_key)
+    if value is not _MISSING:
+        return value
+    metrics.incr('misses')
+
+    shared = shared_cache()
+    lock_key = f'lock:{full_key}'
+    locked = await shared.aadd(lock_key, 1, _setting('CACHE_LOCK_TIMEOUT', 30))
+    if not locked:
+        metrics.incr('lock_waits')
+        deadline = time.monotonic() + _setting('CACHE_LOCK_WAIT_SECONDS', 5)
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            value = await shared.aget(full_key, _MISSING)
+            if value is not _MISSING:
+                local_cache.set(full_key, value)
+                return value
+        metrics.incr('lock_wait_timeouts')
+
+    try:
+        started = time.perf_counter()
+        value = await acompute()
+        metrics.observe_compute(time.perf_counter() - started)
+        await sync_to_async(_store)(full_key, value, timeout)
+        return value
+    finally:
+        if locked:
+            await shared.adelete(lock_key)
+
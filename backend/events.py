@@ -0,0 +1,189 @@
+"""Change feed behind the live dashboard's server-sent events stream.
+
+Claim, flag and note changes are written to the ``DashboardEvent`` table once
+their transaction commits, so every worker process streams the same ordered
+feed. Import progress is short-lived state and lives in the shared cache
+instead, because the import's own transaction hides its rows until the end.
+"""
+import asyncio
+import json
+import threading
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from database.models import DashboardEvent
+
+IMPORT_PROGRESS_KEY = 'dashboard-events:import-progress'
+
+# Claim ids are split across events so one large import cannot produce a huge message
+CLAIM_IDS_PER_EVENT = 500
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def publish(kind, payload):
+    """Append an event to the feed after the current transaction commits."""
+    transaction.on_commit(lambda: DashboardEvent.objects.create(kind=kind, payload=payload))
+
+
+def publish_stats(deltas, values=None):
+    """Publish counter deltas (and optional absolute values) for the stat cards."""
+    if not deltas and not values:
+        return
+    payload = {'deltas': deltas}
+    if values:
+        payload['values'] = values
+    publish('stats', payload)
+
+
+def publish_claims(claim_ids):
+    """Publish the ids of claims whose table rows changed."""
+    claim_ids = sorted(set(claim_ids))
+    for start in range(0, len(claim_ids), CLAIM_IDS_PER_EVENT):
+        publish('claims', {'ids': claim_ids[start:start + CLAIM_IDS_PER_EVENT]})
+
+
+def publish_import_progress(job_id, phase, processed, total=None, done=False):
+    """Record the latest progress of an import job for streaming clients."""
+    cache.set(IMPORT_PROGRESS_KEY, {
+        'job_id': job_id,
+        'phase': phase,
+        'processed': processed,
+        'total': total,
+        'done': done,
+        'updated_at': time.time(),
+    }, timeout=_setting('SSE_IMPORT_PROGRESS_TTL', 600))
+
+
+def latest_event_id():
+    """Return the id of the newest event, or 0 when the feed is empty."""
+    return DashboardEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def events_after(last_id, limit=100):
+    """Return up to ``limit`` events newer than ``last_id``."""
+    return list(
+        DashboardEvent.objects.filter(id__gt=last_id)
+        .order_by('id')
+        .values('id', 'kind', 'payload')[:limit]
+    )
+
+
+def prune_events(max_age=None):
+    """Delete events older than ``max_age`` (a timedelta); returns the number removed."""
+    if max_age is None:
+        max_age = timedelta(seconds=_setting('SSE_EVENT_RETENTION_SECONDS', 3600))
+    deleted, _ = DashboardEvent.objects.filter(created_at__lt=timezone.now() - max_age).delete()
+    return deleted
+
+
+class ConnectionLimiter:
+    """Caps how many SSE streams a single worker process keeps open."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._semaphore = threading.BoundedSemaphore(limit)
+
+    def acquire(self):
+        return self._semaphore.acquire(blocking=False)
+
+    def release(self):
+        self._semaphore.release()
+
+
+connection_limiter = ConnectionLimiter(_setting('SSE_MAX_CONNECTIONS_PER_WORKER', 8))
+
+
+def format_sse(data, event=None, event_id=None, retry=None):
+    """Serialize one message in the text/event-stream wire format."""
+    lines = []
+    if retry is not None:
+        lines.append(f'retry: {retry}')
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if event:
+        lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, default=str)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+class _EventFeed:
+    """Shared state for a bounded-lifetime stream of feed events.
+
+    Streams end after ``SSE_MAX_STREAM_SECONDS`` so a worker's thread (or
+    event-loop slot) is returned to the pool; the browser reconnects with its
+    ``Last-Event-ID`` and resumes where it left off. ``close()`` is called by
+    Django when the response finishes and hands the slot back to the limiter.
+    """
+
+    def __init__(self, last_id, limiter=None):
+        self.last_id = last_id
+        self.limiter = limiter
+        self.poll_interval = _setting('SSE_POLL_INTERVAL', 1.0)
+        self.heartbeat_every = _setting('SSE_HEARTBEAT_SECONDS', 15)
+        self.deadline = time.monotonic() + _setting('SSE_MAX_STREAM_SECONDS', 300)
+        self.last_progress = None
+        self.last_sent = time.monotonic()
+        self._closed = False
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self.limiter:
+            self.limiter.release()
+
+    def _hello(self):
+        return format_sse({'last_id': self.last_id}, event='hello', retry=_setting('SSE_RETRY_MS', 3000))
+
+    def _poll(self):
+        """Collect the messages that became available since the last poll."""
+        messages = []
+        for event in events_after(self.last_id):
+            self.last_id = event['id']
+            messages.append(format_sse(event['payload'], event=event['kind'], event_id=self.last_id))
+
+        progress = cache.get(IMPORT_PROGRESS_KEY)
+        if progress and progress != self.last_progress:
+            self.last_progress = progress
+            messages.append(format_sse(progress, event='import'))
+
+        if messages:
+            self.last_sent = time.monotonic()
+        elif time.monotonic() - self.last_sent >= self.heartbeat_every:
+            # Comment lines keep proxies from closing an idle stream
+            messages.append(': keep-alive\n\n')
+            self.last_sent = time.monotonic()
+        return messages
+
+    def _expired(self):
+        return self._closed or time.monotonic() >= self.deadline
+
+
+class EventStream(_EventFeed):
+    """Blocking iterator of SSE messages for WSGI workers."""
+
+    def __iter__(self):
+        yield self._hello()
+        while not self._expired():
+            yield from self._poll()
+            time.sleep(self.poll_interval)
+
+
+class AsyncEventStream(_EventFeed):
+    """Async iterator of SSE messages that waits on the event loop under ASGI."""
+
+    async def __aiter__(self):
+        yield self._hello()
+        while not self._expired():
+            for message in await sync_to_async(self._poll)():
+                yield message
+            await asyncio.sleep(self.poll_interval)
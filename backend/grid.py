@@ -0,0 +1,111 @@
+"""Column-oriented claim rows for the dashboard's grid view (``?view=grid``).
+
+The grid scrolls through every claim matching the dashboard's filters and
+sort, and only the rows in view exist in the DOM (static/js/dashboard.js). It
+fetches them in chunks of consecutive positions. A chunk is one list per
+column instead of one object or one rendered ``<tr>`` per claim, and the
+status and insurer columns hold indexes into a per-chunk list of their
+distinct values:
+
+    {"start": 0, "total": 12345,
+     "columns": {"id": [...], "patient_name": [...], "insurer_name": [0, 1, 0],
+                 "status": [...], "billed_amount": [...], "paid_amount": [...], "archived": [0, 0, 1]},
+     "dictionaries": {"insurer_name": ["Aetna", "Cigna"], "status": [...]}}
+
+Amounts are JSON numbers and the underpayment is left to the client.
+``total`` is only counted for the chunk at position 0. Like the paged table,
+a chunk deep into several sources (shards, the archive) reads each source's
+head up to the chunk's end and merges them.
+"""
+import asyncio
+import heapq
+from operator import attrgetter
+
+from django.db.models import Value
+
+from database import shards
+from database.models import Claim
+
+from .api import MAX_INTEGER, parse_integer
+
+MAX_CHUNK = 2000
+
+COLUMNS = ['id', 'patient_name', 'insurer_name', 'status', 'billed_amount', 'paid_amount']
+
+# Low-cardinality columns sent as indexes into a list of their values
+DICTIONARY_COLUMNS = ['insurer_name', 'status']
+
+# Read as well so rows can be merged across sources in any ClaimQuery sort
+SORT_COLUMNS = ['discharge_date', 'priority_score']
+
+
+def chunk_bounds(params):
+    """(start, end) of the chunk asked for by the ``start`` and ``limit`` parameters; raises ValueError."""
+    start = max(parse_integer(params.get('start') or 0, 'start'), 0)
+    limit = min(max(parse_integer(params.get('limit') or 500, 'limit'), 1), MAX_CHUNK)
+    _check_bounds(start, start + limit)
+    return start, start + limit
+
+
+def _check_bounds(start, end):
+    # Beyond a 64-bit OFFSET the database raises an overflow instead of returning nothing
+    if not 0 <= start <= end <= MAX_INTEGER:
+        raise ValueError(f'start and end must be between 0 and {MAX_INTEGER}')
+
+
+def _encode(rows, start, total):
+    columns = {name: [getattr(row, name) for row in rows] for name in COLUMNS}
+    for name in ('billed_amount', 'paid_amount'):
+        columns[name] = [float(value) for value in columns[name]]
+    dictionaries = {}
+    for name in DICTIONARY_COLUMNS:
+        values = dict.fromkeys(columns[name])
+        index = {value: position for position, value in enumerate(values)}
+        dictionaries[name] = list(values)
+        columns[name] = [index[value] for value in columns[name]]
+    columns['archived'] = [int(row.archived) for row in rows]
+    chunk = {'start': start, 'columns': columns, 'dictionaries': dictionaries}
+    if total is not None:
+        chunk['total'] = total
+    return chunk
+
+
+def _values(queryset):
+    """Named rows of ``COLUMNS``, ``SORT_COLUMNS`` and ``archived`` from a claim queryset, in its order."""
+    return queryset.annotate(archived=Value(queryset.model.is_archived)).values_list(
+        *COLUMNS, *SORT_COLUMNS, 'archived', named=True,
+    )
+
+
+async def _alist(queryset):
+    return [row async for row in queryset]
+
+
+async def achunk(query, querysets, start, end):
+    """The encoded rows ``start:end`` across ``querysets`` (``query.querysets()``) in ``query`` order."""
+    _check_bounds(start, end)
+    pages = [_values(queryset) for queryset in querysets]
+    if len(pages) == 1:
+        pages = [pages[0][start:end]]
+    else:
+        # Every source could hold the whole chunk; merge their heads and slice
+        pages = [page[:end] for page in pages]
+    counts = [queryset.acount() for queryset in querysets] if start == 0 else []
+    results = await asyncio.gather(*(_alist(page) for page in pages), *counts)
+    rows = list(heapq.merge(*results[:len(pages)], key=query.sort_key, reverse=query.descending))
+    if len(pages) > 1:
+        rows = rows[start:end]
+    return _encode(rows, start, sum(results[len(pages):]) if counts else None)
+
+
+async def aworklist_chunk(worklist, start, end):
+    """The encoded rows ``start:end`` of a materialized worklist, in claim id order."""
+    _check_bounds(start, end)
+    ids = [claim_id async for claim_id in (
+        worklist.entries.order_by('claim_id').values_list('claim_id', flat=True)[start:end]
+    )]
+    results = await asyncio.gather(*(
+        _alist(_values(Claim.objects.using(alias).filter(id__in=ids))) for alias in shards.claim_databases()
+    ))
+    rows = sorted((row for rows in results for row in rows), key=attrgetter('id'))
+    return _encode(rows, start, worklist.claim_count if start == 0 else None)
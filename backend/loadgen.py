@@ -0,0 +1,177 @@
+"""Minimal HTTP load generator and local server launcher for benchmark commands."""
+import http.client
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from urllib.parse import urlsplit
+
+
+class ServerProcess:
+    """Run an app server in a subprocess and wait until it answers requests."""
+
+    def __init__(self, command, base_url, env=None, ready_path='/', startup_timeout=30):
+        self.command = command
+        self.base_url = base_url
+        self.env = {**os.environ, **(env or {})}
+        self.ready_path = ready_path
+        self.startup_timeout = startup_timeout
+        self.process = None
+        # Last lines the server wrote to stderr; drained continuously so a
+        # chatty server never blocks on a full pipe
+        self.stderr_tail = deque(maxlen=200)
+        self._stderr_reader = None
+
+    def _drain_stderr(self):
+        for line in iter(self.process.stderr.readline, b''):
+            self.stderr_tail.append(line.decode(errors='replace'))
+
+    def __enter__(self):
+        self.process = subprocess.Popen(
+            self.command,
+            env=self.env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        self._stderr_reader = threading.Thread(target=self._drain_stderr, daemon=True)
+        self._stderr_reader.start()
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                self._stderr_reader.join(timeout=2)
+                error = ''.join(self.stderr_tail)
+                raise RuntimeError(f'Server exited during startup: {error[-2000:]}')
+            try:
+                status, _ = fetch(self.base_url, self.ready_path, timeout=2)
+                if status < 500:
+                    return self
+            except OSError:
+                pass
+            time.sleep(0.2)
+        self.__exit__(None, None, None)
+        raise RuntimeError(f'Server did not become ready within {self.startup_timeout}s')
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+def python_module_command(module, *args):
+    """Command line that runs ``python -m module`` with the current interpreter."""
+    return [sys.executable, '-m', module, *args]
+
+
+def fetch(base_url, path, method='GET', body=None, headers=None, timeout=30, connection=None):
+    """Issue one request and return ``(status, body_bytes)``."""
+    parts = urlsplit(base_url)
+    conn = connection or http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+    try:
+        conn.request(method, path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        if connection is None:
+            conn.close()
+
+
+class LoadResult:
+    """Latency samples and error counts grouped by endpoint label."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, label, seconds, ok):
+        with self._lock:
+            if ok:
+                self.samples[label].append(seconds)
+            else:
+                self.errors[label] += 1
+
+    def summary(self):
+        """Per-endpoint request count, RPS and p50/p95/p99 latency in milliseconds."""
+        rows = {}
+        for label in sorted(set(self.samples) | set(self.errors)):
+            latencies = sorted(self.samples[label])
+            rows[label] = {
+                'requests': len(latencies),
+                'errors': self.errors[label],
+                'rps': len(latencies) / self.elapsed if self.elapsed else 0.0,
+                'p50_ms': percentile(latencies, 50) * 1000,
+                'p95_ms': percentile(latencies, 95) * 1000,
+                'p99_ms': percentile(latencies, 99) * 1000,
+            }
+        all_latencies = sorted(latency for samples in self.samples.values() for latency in samples)
+        rows['TOTAL'] = {
+            'requests': len(all_latencies),
+            'errors': sum(self.errors.values()),
+            'rps': len(all_latencies) / self.elapsed if self.elapsed else 0.0,
+            'p50_ms': percentile(all_latencies, 50) * 1000,
+            'p95_ms': percentile(all_latencies, 95) * 1000,
+            'p99_ms': percentile(all_latencies, 99) * 1000,
+        }
+        return rows
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list (0 when empty)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def run_load(base_url, next_request, concurrency=16, duration=10.0, timeout=30):
+    """Drive ``concurrency`` keep-alive clients against ``base_url`` for ``duration`` seconds.
+
+    ``next_request(client_index)`` returns ``(label, method, path, body, headers)``
+    for the next request a client should send.
+    """
+    result = LoadResult()
+    parts = urlsplit(base_url)
+    deadline = time.monotonic() + duration
+
+    def client(index):
+        conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+        try:
+            while time.monotonic() < deadline:
+                label, method, path, body, headers = next_request(index)
+                started = time.perf_counter()
+                try:
+                    status, _ = fetch(base_url, path, method, body, headers, connection=conn)
+                    ok = status < 400
+                except (OSError, http.client.HTTPException):
+                    ok = False
+                    conn.close()
+                    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+                result.record(label, time.perf_counter() - started, ok)
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    result.elapsed = time.monotonic() - started
+    return result
+
+
+def format_summary(summary):
+    """Render a LoadResult.summary() as an aligned text table."""
+    lines = [f'{"endpoint":<28} {"reqs":>7} {"errs":>5} {"rps":>8} {"p50ms":>8} {"p95ms":>8} {"p99ms":>8}']
+    for label, row in summary.items():
+        lines.append(
+            f'{label:<28} {row["requests"]:>7} {row["errors"]:>5} {row["rps"]:>8.1f} '
+            f'{row["p50_ms"]:>8.1f} {row["p95_ms"]:>8.1f} {row["p99_ms"]:>8.1f}'
+        )
+    return '\n'.join(lines)
@@ -0,0 +1,148 @@
+"""In-process request metrics, rendered in the Prometheus text exposition format.
+
+Each worker process keeps its own counters, so a Prometheus scrape of
+``/metrics`` reports the worker that served it; scrape every worker (or sum
+per instance) when running several.
+"""
+import threading
+from collections import defaultdict
+
+from .caching import metrics as cache_metrics
+
+# Upper bounds (seconds) shared by the duration histograms
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Upper bounds for the per-request query count histogram
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 1000)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                base = _format_labels(self.label_names, labels)
+                for bound, count in zip(self.buckets, series['counts']):
+                    lines.append(f'{self.name}_bucket{_with_le(base, bound)} {count}')
+                lines.append(f'{self.name}_bucket{_with_le(base, "+Inf")} {series["count"]}')
+                lines.append(f'{self.name}_sum{{{base}}} {series["sum"]:.6f}')
+                lines.append(f'{self.name}_count{{{base}}} {series["count"]}')
+        return lines
+
+
+class Counter:
+    """Monotonic counter keyed by a tuple of label values."""
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] += amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{{{_format_labels(self.label_names, labels)}}} {value}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _with_le(base, bound):
+    le = f'le="{bound}"'
+    return f'{{{base},{le}}}' if base else f'{{{le}}}'
+
+
+REQUEST_LABELS = ('view', 'method')
+
+requests_total = Counter(
+    'erisa_http_requests_total', 'HTTP requests by view, method and status code.', ('view', 'method', 'status'),
+)
+request_duration = Histogram(
+    'erisa_http_request_duration_seconds', 'Total time to produce the response.', REQUEST_LABELS, DURATION_BUCKETS,
+)
+db_duration = Histogram(
+    'erisa_http_request_db_seconds', 'Time spent executing SQL per request.', REQUEST_LABELS, DURATION_BUCKETS,
+)
+db_queries = Histogram(
+    'erisa_http_request_db_queries', 'SQL queries executed per request.', REQUEST_LABELS, QUERY_BUCKETS,
+)
+template_duration = Histogram(
+    'erisa_http_request_template_seconds', 'Time spent rendering templates per request.', REQUEST_LABELS,
+    DURATION_BUCKETS,
+)
+
+REQUEST_METRICS = (requests_total, request_duration, db_duration, db_queries, template_duration)
+
+
+def record_request(view, method, status, total, sql_time, query_count, template_time):
+    """Add one finished request to the per-view series."""
+    labels = (view, method)
+    requests_total.inc((view, method, str(status)))
+    request_duration.observe(labels, total)
+    db_duration.observe(labels, sql_time)
+    db_queries.observe(labels, query_count)
+    template_duration.observe(labels, template_time)
+
+
+def _cache_lines():
+    snapshot = cache_metrics.snapshot()
+    lines = [
+        '# HELP erisa_cache_events_total Two-tier cache lookups by outcome.',
+        '# TYPE erisa_cache_events_total counter',
+    ]
+    for outcome in ('local_hits', 'shared_hits', 'misses', 'computes', 'lock_waits', 'lock_wait_timeouts'):
+        lines.append(f'erisa_cache_events_total{{outcome="{outcome}"}} {snapshot[outcome]}')
+    lines += [
+        '# HELP erisa_cache_lookup_seconds_total Time spent reading the cache tiers.',
+        '# TYPE erisa_cache_lookup_seconds_total counter',
+        f'erisa_cache_lookup_seconds_total {snapshot["lookup_seconds_total"]:.6f}',
+        '# HELP erisa_cache_compute_seconds_total Time spent recomputing missing entries.',
+        '# TYPE erisa_cache_compute_seconds_total counter',
+        f'erisa_cache_compute_seconds_total {snapshot["compute_seconds_total"]:.6f}',
+        '# HELP erisa_cache_local_entries Entries held in this process\'s LRU tier.',
+        '# TYPE erisa_cache_local_entries gauge',
+        f'erisa_cache_local_entries {snapshot["local_entries"]}',
+    ]
+    return lines
+
+
+def render_prometheus():
+    """All request and cache metrics as a Prometheus text payload."""
+    lines = []
+    for metric in REQUEST_METRICS:
+        lines.extend(metric.render())
+    lines.extend(_cache_lines())
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,224 @@
+"""Per-request performance instrumentation and primary-database pinning.
+
+``RequestTimingMiddleware`` measures SQL, template and total time for every
+request, adds a ``Server-Timing`` header, writes one structured log line and
+feeds the per-view histograms served at ``/metrics``.
+
+SQL is captured by an execute wrapper installed on every database connection
+and template time by wrapping ``Template.render``; both report to the request
+found in a context variable, so queries run from ``sync_to_async`` threads
+under ASGI are attributed to the right request.
+"""
+import json
+import logging
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.base import Template
+
+from database.routers import pin_to_primary
+
+from . import metrics
+
+logger = logging.getLogger('backend.performance')
+
+_current = ContextVar('request_timing', default=None)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class RequestTiming:
+    """Timings collected while one request is being served."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self._template_depth = 0
+
+    @property
+    def query_count(self):
+        return len(self.queries)
+
+    def slowest_queries(self, limit):
+        return sorted(self.queries, key=lambda query: query[1], reverse=True)[:limit]
+
+
+def _record_query(execute, sql, params, many, context):
+    timing = _current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        timing.sql_time += duration
+        timing.queries.append((sql, duration))
+
+
+def _install_query_recorder(sender=None, connection=None, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+_original_template_render = Template.render
+
+
+def _timed_template_render(self, context):
+    timing = _current.get()
+    if timing is None:
+        return _original_template_render(self, context)
+    # Included templates render inside their parent; only time the outermost one
+    timing._template_depth += 1
+    started = time.perf_counter()
+    try:
+        return _original_template_render(self, context)
+    finally:
+        timing._template_depth -= 1
+        if timing._template_depth == 0:
+            timing.template_time += time.perf_counter() - started
+
+
+def install_instrumentation():
+    """Hook SQL and template timing into Django (idempotent)."""
+    connection_created.connect(_install_query_recorder, dispatch_uid='backend.middleware.query_recorder')
+    for connection in connections.all(initialized_only=True):
+        _install_query_recorder(connection=connection)
+    Template.render = _timed_template_render
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or match.route
+
+
+class RequestTimingMiddleware:
+    """Record SQL/template/total time per request and publish it as headers, logs and metrics."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_threshold = _setting('SLOW_REQUEST_THRESHOLD_MS', 500) / 1000
+        self.slow_query_count = _setting('SLOW_REQUEST_TOP_QUERIES', 5)
+        install_instrumentation()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timing = RequestTiming()
+        token = _current.set(timing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timing)
+
+    async def __acall__(self, request):
+        timing = RequestTiming()
+        token = _current.set(timing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timing)
+
+    def _finish(self, request, response, timing):
+        total = time.perf_counter() - timing.started
+        view = _view_name(request)
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={timing.sql_time * 1000:.1f};desc="{timing.query_count} queries"',
+            f'tpl;dur={timing.template_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+        metrics.record_request(
+            view, request.method, response.status_code, total,
+            timing.sql_time, timing.query_count, timing.template_time,
+        )
+
+        record = {
+            'view': view,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'db_ms': round(timing.sql_time * 1000, 1),
+            'queries': timing.query_count,
+            'template_ms': round(timing.template_time * 1000, 1),
+        }
+        if total >= self.slow_threshold:
+            record['top_queries'] = [
+                {'ms': round(duration * 1000, 1), 'sql': sql[:500]}
+                for sql, duration in timing.slowest_queries(self.slow_query_count)
+            ]
+            logger.warning('slow request %s', json.dumps(record))
+        else:
+            logger.info('request %s', json.dumps(record))
+        return response
+
+
+UNSAFE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+
+
+class PrimaryPinMiddleware:
+    """Keep a client's reads on the primary database for a short window after it writes.
+
+    Unsafe requests run pinned and set a cookie holding the time the pin
+    expires; requests carrying an unexpired cookie are pinned too, so the
+    client reads its own writes even when the replica lags behind.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.cookie_name = _setting('REPLICA_PIN_COOKIE', 'db_primary_until')
+        self.pin_seconds = _setting('REPLICA_PIN_SECONDS', 5)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _pinned(self, request):
+        if request.method in UNSAFE_METHODS:
+            return True
+        try:
+            return float(request.COOKIES.get(self.cookie_name, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def _finish(self, request, response):
+        if request.method in UNSAFE_METHODS:
+            response.set_cookie(
+                self.cookie_name, f'{time.time() + self.pin_seconds:.3f}',
+                max_age=self.pin_seconds, httponly=True, samesite='Lax',
+            )
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._pinned(request):
+            return self._finish(request, self.get_response(request))
+        with pin_to_primary():
+            response = self.get_response(request)
+        return self._finish(request, response)
+
+    async def __acall__(self, request):
+        if not self._pinned(request):
+            return self._finish(request, await self.get_response(request))
+        with pin_to_primary():
+            response = await self.get_response(request)
+        return self._finish(request, response)
@@ -0,0 +1,582 @@
+"""Dashboard and report statistics shared by the views, the importer and the event feed.
+
+Each statistic is computed per claim database and the results are added up,
+so with sharded claims (see database/shards.py) every shard is queried and
+the async versions await all shards together.
+"""
+import asyncio
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from database import duplicates, shards
+from database.models import (
+    ArchivedClaim, ArchivedClaimCptCode, ArchivedClaimDetail, ArchiveRollup, Claim, ClaimCptCode, ClaimDetail,
+    DenialReason, Flag, Note,
+)
+
+# Sidebar counters keyed by the substring the dashboard filters on
+STATUS_COUNTERS = {
+    'pending_count': 'pending',
+    'under_review_count': 'under review',
+    'paid_count': 'paid',
+    'denied_count': 'denied',
+    'underpaid_count': 'underpaid',
+}
+
+# Counters that can be patched on the client by adding a delta
+ADDITIVE_STATS = ('total_claims', 'flagged_claims', 'total_notes') + tuple(STATUS_COUNTERS)
+
+
+def underpayment_expression(prefix=''):
+    """SQL expression for max(billed - paid, 0), matching Claim.underpayment().
+
+    ``prefix`` reaches the claim through a relation, e.g. ``'claim__'``.
+    """
+    return Greatest(
+        F(f'{prefix}billed_amount') - F(f'{prefix}paid_amount'),
+        Value(Decimal('0')),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+ROLLUP_FIELDS = (
+    'claim_count', 'billed_total', 'paid_total', 'underpayment_total',
+    'flag_count', 'note_count', 'flagged_claim_count', 'noted_claim_count',
+)
+
+
+def archive_rollups():
+    """Per insurer/status totals of archived claims (see database/archive.py)."""
+    return list(ArchiveRollup.objects.values('insurer_name', 'status', *ROLLUP_FIELDS))
+
+
+async def aarchive_rollups():
+    return [row async for row in ArchiveRollup.objects.values('insurer_name', 'status', *ROLLUP_FIELDS)]
+
+
+def rollup_totals(rollups, status=None):
+    """Sum the rollup rows, optionally only those whose status contains ``status``."""
+    totals = dict.fromkeys(ROLLUP_FIELDS, 0)
+    for row in rollups:
+        if status is None or status in row['status'].lower():
+            for field in ROLLUP_FIELDS:
+                totals[field] += row[field]
+    return totals
+
+
+def _average(total, count):
+    return (total or 0) / count if count else 0
+
+
+def _concat(parts, key):
+    """Rows under ``key`` of every per-database result, in one list."""
+    return [row for part in parts for row in part[key]]
+
+
+def _combine_dashboard_stats(parts):
+    """Add up per-database counters and archived claims, as dashboard_stats() reports them."""
+    stats = {key: sum(part['counts'][key] for part in parts) for key in parts[0]['counts']}
+    underpayment_sum = sum(part['underpayment'] or 0 for part in parts)
+    rollups = _concat(parts, 'rollups')
+    archived = rollup_totals(rollups)
+    stats['total_claims'] += archived['claim_count']
+    stats['flagged_claims'] += archived['flag_count']
+    stats['total_notes'] += archived['note_count']
+    for key, status in STATUS_COUNTERS.items():
+        stats[key] += rollup_totals(rollups, status)['claim_count']
+    stats['avg_underpayment'] = _average(underpayment_sum + archived['underpayment_total'], stats['total_claims'])
+    return stats
+
+
+def _dashboard_counts():
+    """Live counters, underpayment total and archive rollups of one claim database."""
+    counts = {
+        'total_claims': Claim.objects.count(),
+        'flagged_claims': Flag.objects.count(),
+        'total_notes': Note.objects.count(),
+    }
+    for key, status in STATUS_COUNTERS.items():
+        counts[key] = Claim.objects.filter(status__icontains=status).count()
+
+    underpayment_sum = Claim.objects.aggregate(total=Sum(underpayment_expression()))['total']
+    return {'counts': counts, 'underpayment': underpayment_sum, 'rollups': archive_rollups()}
+
+
+def dashboard_stats():
+    """Compute the stat cards and sidebar counters shown on the dashboard."""
+    return _combine_dashboard_stats(shards.fan_out(_dashboard_counts))
+
+
+async def _adashboard_counts():
+    keys = ['total_claims', 'flagged_claims', 'total_notes', *STATUS_COUNTERS]
+    *results, underpayment, rollups = await asyncio.gather(
+        Claim.objects.acount(),
+        Flag.objects.acount(),
+        Note.objects.acount(),
+        *(Claim.objects.filter(status__icontains=status).acount() for status in STATUS_COUNTERS.values()),
+        Claim.objects.aaggregate(total=Sum(underpayment_expression())),
+        aarchive_rollups(),
+    )
+    return {'counts': dict(zip(keys, results)), 'underpayment': underpayment['total'], 'rollups': rollups}
+
+
+async def adashboard_stats():
+    """Async dashboard_stats(); the independent counts of every shard are awaited together."""
+    return _combine_dashboard_stats(await shards.afan_out(_adashboard_counts))
+
+
+def _upload_totals():
+    totals = Claim.objects.aggregate(
+        total_claims=Count('id'),
+        total_billed=Sum('billed_amount'),
+        total_paid=Sum('paid_amount'),
+        total_underpayment=Sum(underpayment_expression()),
+    )
+    totals['flagged_claims'] = Flag.objects.count()
+    totals['total_notes'] = Note.objects.count()
+    return {'totals': totals, 'rollups': archive_rollups()}
+
+
+def upload_stats():
+    """Current totals shown beside the CSV upload form, archived claims included."""
+    parts = shards.fan_out(_upload_totals)
+    totals = {key: sum(part['totals'][key] or 0 for part in parts) for key in parts[0]['totals']}
+    archived = rollup_totals(_concat(parts, 'rollups'))
+    total_claims = totals['total_claims'] + archived['claim_count']
+    total_underpayment = totals['total_underpayment'] + archived['underpayment_total']
+    return {
+        'total_claims': total_claims,
+        'flagged_claims': totals['flagged_claims'] + archived['flag_count'],
+        'total_notes': totals['total_notes'] + archived['note_count'],
+        'financial_stats': {
+            'total_billed': totals['total_billed'] + archived['billed_total'],
+            'total_paid': totals['total_paid'] + archived['paid_total'],
+        },
+        'total_underpayment': total_underpayment,
+        'avg_underpayment': _average(total_underpayment, total_claims),
+    }
+
+
+def stats_deltas(before, after):
+    """Return the non-zero differences between two dashboard_stats() snapshots."""
+    deltas = {}
+    for key in ADDITIVE_STATS:
+        change = after.get(key, 0) - before.get(key, 0)
+        if change:
+            deltas[key] = change
+    return deltas
+
+
+# Report charts show the insurers with the largest billed totals
+REPORT_INSURERS = 5
+REPORT_MONTHS = 6
+REPORT_TOP_UNDERPAYMENTS = 5
+REPORT_CPT_CODES = 10
+REPORT_DENIAL_REASONS = 10
+REPORT_DUPLICATE_GROUPS = 10
+STATUS_COLORS = ['#3B82F6', '#10B981', '#F59E0B', '#EF4444', '#8B5CF6', '#06B6D4']
+
+
+async def _status_distribution():
+    rows = Claim.objects.values('status').annotate(count=Count('id'))
+    return [row async for row in rows]
+
+
+async def _insurer_totals():
+    rows = (
+        Claim.objects.values('insurer_name')
+        .annotate(
+            billed=Sum('billed_amount'),
+            paid=Sum('paid_amount'),
+            underpayment=Sum(underpayment_expression()),
+            claim_count=Count('id'),
+        )
+        .order_by()
+    )
+    return [row async for row in rows]
+
+
+async def _financial_summary():
+    return await Claim.objects.aaggregate(
+        total_billed=Sum('billed_amount'),
+        total_paid=Sum('paid_amount'),
+        total_underpayment=Sum(underpayment_expression()),
+        total_claims=Count('id'),
+    )
+
+
+async def _monthly_totals(model):
+    """Counts and amounts for each of the last REPORT_MONTHS 30-day windows, in one query."""
+    now = timezone.now()
+    windows = []
+    aggregates = {}
+    for i in range(REPORT_MONTHS):
+        window_end = now - timedelta(days=30 * i)
+        window = Q(created_at__gt=window_end - timedelta(days=30), created_at__lte=window_end)
+        windows.append(window_end)
+        aggregates[f'count_{i}'] = Count('id', filter=window)
+        aggregates[f'billed_{i}'] = Sum('billed_amount', filter=window)
+        aggregates[f'paid_{i}'] = Sum('paid_amount', filter=window)
+        aggregates[f'underpayment_{i}'] = Sum(underpayment_expression(), filter=window)
+    totals = await model.objects.aaggregate(**aggregates)
+
+    monthly_data = []
+    for i, window_end in enumerate(windows):
+        monthly_data.append({
+            'month': window_end.strftime('%b %Y'),
+            'count': totals[f'count_{i}'],
+            'billed': float(totals[f'billed_{i}'] or 0),
+            'paid': float(totals[f'paid_{i}'] or 0),
+            'underpayment': float(totals[f'underpayment_{i}'] or 0),
+        })
+    monthly_data.reverse()  # Show oldest to newest
+    return monthly_data
+
+
+async def _top_underpayments(limit=REPORT_TOP_UNDERPAYMENTS):
+    rows = (
+        Claim.objects.annotate(underpayment_value=underpayment_expression())
+        .filter(underpayment_value__gt=0)
+        .order_by('-underpayment_value')
+        .values('id', 'patient_name', 'insurer_name', 'underpayment_value', 'billed_amount', 'paid_amount')[:limit]
+    )
+    return [{
+        'claim_id': row['id'],
+        'patient_name': row['patient_name'],
+        'insurer': row['insurer_name'],
+        'underpayment': float(row['underpayment_value']),
+        'billed': float(row['billed_amount']),
+        'paid': float(row['paid_amount']),
+    } async for row in rows]
+
+
+async def _duplicate_groups(limit=REPORT_DUPLICATE_GROUPS):
+    return [row async for row in duplicates.top_groups(limit)]
+
+
+def _duplicate_report(rows):
+    """Top duplicate groups over every claim database, with their totals.
+
+    Each database's rows carry that database's totals (see
+    duplicates.top_groups()), so the first row of each is added up.
+    """
+    totals = {'group_count': 0, 'claim_count': 0, 'excess_total': 0.0}
+    for part in rows:
+        if part:
+            for field in totals:
+                totals[field] += float(part[0][field] or 0) if field == 'excess_total' else part[0][field]
+    groups = sorted((row for part in rows for row in part), key=lambda row: -row['score'])
+    return {
+        **totals,
+        'groups': [{
+            'claim_ids': row['claim_ids'],
+            'size': row['size'],
+            'similarity': row['score'],
+            'patient_name': row['patient_name'],
+            'discharge_date': row['discharge_date'],
+            'billed': float(row['billed_amount']),
+            'excess_billed': float(row['excess_billed']),
+        } for row in groups[:REPORT_DUPLICATE_GROUPS]],
+    }
+
+
+def _cpt_code_rows(model, codes=None):
+    """Per-code totals over one link table, joined to its claims through the (code, claim) index."""
+    rows = model.objects.all()
+    if codes:
+        rows = rows.filter(code__code__in=[code.strip().upper() for code in codes])
+    return rows.values('code__code').annotate(
+        claim_count=Count('claim_id'),
+        billed=Sum('claim__billed_amount'),
+        paid=Sum('claim__paid_amount'),
+        underpayment=Sum(underpayment_expression('claim__')),
+    ).order_by()
+
+
+def _cpt_code_totals(row_sets, limit=None):
+    totals = {}
+    for rows in row_sets:
+        for row in rows:
+            entry = totals.setdefault(row['code__code'], {
+                'code': row['code__code'], 'claim_count': 0, 'billed': 0, 'paid': 0, 'underpayment': 0,
+            })
+            for field in ('claim_count', 'billed', 'paid', 'underpayment'):
+                entry[field] += row[field] or 0
+    rows = sorted(totals.values(), key=lambda row: row['underpayment'], reverse=True)
+    return rows[:limit] if limit else rows
+
+
+def cpt_code_stats(codes=None, include_archived=False, limit=None):
+    """Claim count, billed, paid and underpayment per CPT code, largest underpayment first.
+
+    A claim billing several codes counts towards each of them. ``codes``
+    restricts the result to those codes.
+    """
+    models = [ClaimCptCode, ArchivedClaimCptCode] if include_archived else [ClaimCptCode]
+    return _cpt_code_totals([list(_cpt_code_rows(model, codes)) for model in models], limit)
+
+
+async def _cpt_code_report_rows():
+    return [row async for row in _cpt_code_rows(ClaimCptCode)]
+
+
+def _cpt_code_report(row_sets):
+    """The REPORT_CPT_CODES codes with the largest underpayment across the per-database row sets."""
+    return [{
+        'code': row['code'],
+        'claim_count': row['claim_count'],
+        'billed': float(row['billed']),
+        'paid': float(row['paid']),
+        'underpayment': float(row['underpayment']),
+    } for row in _cpt_code_totals(row_sets, REPORT_CPT_CODES)]
+
+
+def _denial_reason_groups(model):
+    """Claims and underpayment per (reason id, insurer) of live or archived details: an integer GROUP BY."""
+    return (
+        model.objects.filter(denial_reason__isnull=False)
+        .values('denial_reason_id', 'claim__insurer_name')
+        .annotate(claim_count=Count('id'), at_risk=Sum(underpayment_expression('claim__')))
+        .order_by()
+    )
+
+
+async def _denial_reason_rows():
+    """Denial rows of live and archived details in one query; a (reason, insurer) may appear once for each.
+
+    Closed denials are what archiving moves out, so leaving the archive out
+    would empty the breakdown over time.
+    """
+    rows = _denial_reason_groups(ClaimDetail).union(_denial_reason_groups(ArchivedClaimDetail), all=True)
+    return [row async for row in rows]
+
+
+async def _reason_texts():
+    return {reason_id: text async for reason_id, text in DenialReason.objects.values_list('id', 'text')}
+
+
+def _denial_reason_report(rows, texts):
+    """Denial reasons with the most dollars at risk, each split by insurer.
+
+    Reason ids are the same on every shard, so rows from all of them add up.
+    """
+    reasons = {}
+    for row in rows:
+        entry = reasons.setdefault(row['denial_reason_id'], {
+            'reason': texts.get(row['denial_reason_id'], ''), 'claim_count': 0, 'at_risk': 0.0, 'insurers': {},
+        })
+        at_risk = float(row['at_risk'] or 0)
+        entry['claim_count'] += row['claim_count']
+        entry['at_risk'] += at_risk
+        insurer = entry['insurers'].setdefault(row['claim__insurer_name'], {
+            'insurer': row['claim__insurer_name'], 'claim_count': 0, 'at_risk': 0.0,
+        })
+        insurer['claim_count'] += row['claim_count']
+        insurer['at_risk'] += at_risk
+    for entry in reasons.values():
+        entry['insurers'] = sorted(entry['insurers'].values(), key=lambda insurer: insurer['at_risk'], reverse=True)
+    return sorted(reasons.values(), key=lambda entry: entry['at_risk'], reverse=True)[:REPORT_DENIAL_REASONS]
+
+
+async def _flagged_status_distribution():
+    rows = (
+        Claim.objects.filter(flags__isnull=False)
+        .values('status')
+        .annotate(count=Count('id', distinct=True))
+    )
+    return [row async for row in rows]
+
+
+def _add_archived_counts(rows, key, rollups, rollup_field):
+    """Add up per-``key`` ``count`` rows and rollup counts, largest first."""
+    counts = Counter()
+    for row in rows:
+        counts[row[key]] += row['count']
+    for rollup in rollups:
+        counts[rollup[key]] += rollup[rollup_field]
+    return [{key: value, 'count': count} for value, count in counts.most_common() if count]
+
+
+def _add_archived_insurers(rows, rollups):
+    """Add up per-insurer totals and rollup amounts and keep the REPORT_INSURERS largest."""
+    amounts = [
+        (row['insurer_name'], row['billed'], row['paid'], row['underpayment'], row['claim_count']) for row in rows
+    ] + [
+        (rollup['insurer_name'], rollup['billed_total'], rollup['paid_total'], rollup['underpayment_total'],
+         rollup['claim_count'])
+        for rollup in rollups
+    ]
+    insurers = {}
+    for insurer_name, billed, paid, underpayment, claim_count in amounts:
+        row = insurers.setdefault(insurer_name, {
+            'insurer_name': insurer_name, 'billed': 0, 'paid': 0, 'underpayment': 0, 'claim_count': 0,
+        })
+        row['billed'] += billed or 0
+        row['paid'] += paid or 0
+        row['underpayment'] += underpayment or 0
+        row['claim_count'] += claim_count
+    return sorted(insurers.values(), key=lambda row: row['billed'], reverse=True)[:REPORT_INSURERS]
+
+
+def _add_months(series):
+    """Add up _monthly_totals() results, which cover the same windows."""
+    fields = ('count', 'billed', 'paid', 'underpayment')
+    return [
+        {**months[0], **{field: sum(month[field] for month in months) for field in fields}}
+        for months in zip(*series)
+    ]
+
+
+async def _report_aggregates():
+    """The report's aggregates over one claim database, for areport_data() to add up."""
+    (
+        status_distribution,
+        insurer_totals,
+        financial_summary,
+        monthly_data,
+        archived_monthly_data,
+        top_underpayments,
+        cpt_code_rows,
+        denial_rows,
+        flagged_status_dist,
+        flagged_claims_count,
+        claims_with_notes_count,
+        rollups,
+        duplicate_groups,
+    ) = await asyncio.gather(
+        _status_distribution(),
+        _insurer_totals(),
+        _financial_summary(),
+        _monthly_totals(Claim),
+        _monthly_totals(ArchivedClaim),
+        _top_underpayments(),
+        _cpt_code_report_rows(),
+        _denial_reason_rows(),
+        _flagged_status_distribution(),
+        Claim.objects.filter(flags__isnull=False).distinct().acount(),
+        Claim.objects.filter(notes__isnull=False).distinct().acount(),
+        aarchive_rollups(),
+        _duplicate_groups(),
+    )
+    return {
+        'status_distribution': status_distribution,
+        'insurer_totals': insurer_totals,
+        'financial_summary': financial_summary,
+        'monthly_data': monthly_data,
+        'archived_monthly_data': archived_monthly_data,
+        'top_underpayments': top_underpayments,
+        'cpt_code_rows': cpt_code_rows,
+        'denial_rows': denial_rows,
+        'flagged_status_dist': flagged_status_dist,
+        'flagged_claims_count': flagged_claims_count,
+        'claims_with_notes_count': claims_with_notes_count,
+        'rollups': rollups,
+        'duplicate_groups': duplicate_groups,
+    }
+
+
+async def areport_data():
+    """Build the analytics report context with database aggregates run concurrently.
+
+    Archived claims are included through their rollups, and in the denial
+    reason breakdown through their details. The top underpayments and the CPT
+    code breakdown cover live claims only. A claim lives on exactly one shard, so the per-shard
+    counts, sums and top lists combine into the totals of a single database.
+    """
+    parts, reason_texts = await asyncio.gather(
+        shards.afan_out(_report_aggregates),
+        _reason_texts(),
+    )
+
+    rollups = _concat(parts, 'rollups')
+    archived = rollup_totals(rollups)
+    status_distribution = _add_archived_counts(_concat(parts, 'status_distribution'), 'status', rollups, 'claim_count')
+    flagged_status_dist = _add_archived_counts(
+        _concat(parts, 'flagged_status_dist'), 'status', rollups, 'flagged_claim_count',
+    )
+    insurer_totals = _add_archived_insurers(_concat(parts, 'insurer_totals'), rollups)
+    monthly_data = _add_months([part[key] for part in parts for key in ('monthly_data', 'archived_monthly_data')])
+    top_underpayments = sorted(
+        _concat(parts, 'top_underpayments'), key=lambda row: row['underpayment'], reverse=True,
+    )[:REPORT_TOP_UNDERPAYMENTS]
+    cpt_code_data = _cpt_code_report([part['cpt_code_rows'] for part in parts])
+    denial_data = _denial_reason_report(_concat(parts, 'denial_rows'), reason_texts)
+    flagged_claims_count = sum(part['flagged_claims_count'] for part in parts)
+    claims_with_notes_count = sum(part['claims_with_notes_count'] for part in parts)
+    duplicate_data = _duplicate_report([part['duplicate_groups'] for part in parts])
+
+    financial_summary = {
+        field: sum(part['financial_summary'][field] or 0 for part in parts) for field in parts[0]['financial_summary']
+    }
+    total_claims = financial_summary['total_claims'] + archived['claim_count']
+    for field, rollup_field in (('total_billed', 'billed_total'), ('total_paid', 'paid_total'),
+                                ('total_underpayment', 'underpayment_total')):
+        financial_summary[field] += archived[rollup_field]
+    financial_summary.update(
+        total_claims=total_claims,
+        avg_billed=_average(financial_summary['total_billed'], total_claims),
+        avg_paid=_average(financial_summary['total_paid'], total_claims),
+        avg_underpayment=_average(financial_summary['total_underpayment'], total_claims),
+    )
+
+    status_data = {
+        'labels': [item['status'] for item in status_distribution],
+        'data': [item['count'] for item in status_distribution],
+        'colors': STATUS_COLORS,
+    }
+    billed_paid_data = [{
+        'insurer': row['insurer_name'],
+        'billed': float(row['billed'] or 0),
+        'paid': float(row['paid'] or 0),
+    } for row in insurer_totals]
+    underpayment_data = [{
+        'insurer': row['insurer_name'],
+        'avg_underpayment': float(row['underpayment'] or 0) / row['claim_count'] if row['claim_count'] else 0,
+        'total_underpayment': float(row['underpayment'] or 0),
+        'claim_count': row['claim_count'],
+    } for row in insurer_totals]
+    underpayment_data.sort(key=lambda x: x['avg_underpayment'], reverse=True)
+
+    return {
+        'status_data': status_data,
+        'billed_paid_data': billed_paid_data,
+        'underpayment_data': underpayment_data,
+        'financial_summary': financial_summary,
+        'total_underpayment': float(financial_summary['total_underpayment']),
+        'avg_underpayment': float(financial_summary['avg_underpayment']),
+        'monthly_data': monthly_data,
+        'top_underpayments': top_underpayments,
+        'cpt_code_data': cpt_code_data,
+        'denial_data': denial_data,
+        'duplicate_data': duplicate_data,
+        'flagged_claims_count': flagged_claims_count + archived['flagged_claim_count'],
+        'flagged_status_dist': flagged_status_dist,
+        'claims_with_notes_count': claims_with_notes_count + archived['noted_claim_count'],
+        'total_claims': total_claims,
+    }
+
+
+def empty_report_data():
+    """Report context used when the report cannot be built."""
+    return {
+        'status_data': {'labels': [], 'data': [], 'colors': []},
+        'billed_paid_data': [],
+        'underpayment_data': [],
+        'financial_summary': {},
+        'total_underpayment': 0,
+        'avg_underpayment': 0,
+        'monthly_data': [],
+        'top_underpayments': [],
+        'cpt_code_data': [],
+        'denial_data': [],
+        'duplicate_data': {'group_count': 0, 'claim_count': 0, 'excess_total': 0, 'groups': []},
+        'flagged_claims_count': 0,
+        'flagged_status_dist': [],
+        'claims_with_notes_count': 0,
+        'total_claims': 0,
+    }
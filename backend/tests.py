@@ -0,0 +1,67 @@
+from datetime import date
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from database.archive import archive_claims
+from database.claim_query import ClaimQuery
+from database.models import ArchivedClaim, Claim, ClaimDetail, DenialReason
+
+from . import grid, stats
+from .api import MAX_INTEGER
+
+
+class DenialReportTests(TransactionTestCase):
+    """The report's denial breakdown keeps counting claims once they are archived."""
+
+    def add_claim(self, claim_id, reason, discharge_date, billed, paid):
+        claim = Claim.objects.create(
+            id=claim_id, patient_name=f'Patient {claim_id}', billed_amount=Decimal(billed),
+            paid_amount=Decimal(paid), status='Denied', insurer_name='Aetna', discharge_date=discharge_date,
+        )
+        ClaimDetail.objects.create(claim=claim, denial_reason=reason)
+
+    def test_archived_denials_stay_in_the_breakdown(self):
+        reason = DenialReason.objects.create(text='Not medically necessary')
+        self.add_claim(1, reason, date(2020, 1, 10), '1000.00', '0.00')
+        self.add_claim(2, reason, date(2020, 2, 10), '500.00', '100.00')
+        self.add_claim(3, reason, date.today(), '300.00', '0.00')
+
+        self.assertEqual(archive_claims(before=date(2021, 1, 1), statuses=['Denied']), 2)
+        self.assertEqual(ArchivedClaim.objects.count(), 2)
+
+        denial_data = async_to_sync(stats.areport_data)()['denial_data']
+        self.assertEqual(len(denial_data), 1)
+        self.assertEqual(denial_data[0]['reason'], 'Not medically necessary')
+        self.assertEqual(denial_data[0]['claim_count'], 3)
+        self.assertEqual(denial_data[0]['at_risk'], 1700.0)
+        self.assertEqual(denial_data[0]['insurers'], [{'insurer': 'Aetna', 'claim_count': 3, 'at_risk': 1700.0}])
+
+
+class GridBoundsTests(TestCase):
+    """Grid chunks outside the 64-bit range are a 400, not a database overflow."""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('analyst'))
+
+    def get(self, query):
+        return self.client.get(f'{reverse("claims:claims_grid")}?{query}')
+
+    def test_out_of_range_start_is_rejected(self):
+        self.assertEqual(self.get('start=99999999999999999999').status_code, 400)
+        self.assertEqual(self.get(f'start={MAX_INTEGER}&limit=500').status_code, 400)
+        self.assertEqual(self.get('limit=99999999999999999999').status_code, 400)
+        self.assertEqual(self.get('start=abc').status_code, 400)
+
+    def test_chunk_in_range(self):
+        response = self.get('start=0&limit=10')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total'], 0)
+
+    def test_chunk_functions_check_bounds(self):
+        query = ClaimQuery.from_params({})
+        with self.assertRaises(ValueError):
+            async_to_sync(grid.achunk)(query, query.querysets(), MAX_INTEGER, MAX_INTEGER + 500)
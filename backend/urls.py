@@ -6,13 +6,25 @@ urlpatterns = [
     path('', views.dashboard, name='dashboard'),  # New dashboard as default
     path('list/', views.claim_list, name='claim_list'),  # Legacy list view
     path('csv_upload/', views.csv_upload_view, name='csv_upload'),  # Direct CSV upload
+    path('csv_upload/preview/', views.csv_upload_preview, name='csv_upload_preview'),
+    path('csv_upload/preview/<str:token>/', views.csv_upload_preview_page, name='csv_upload_preview_page'),
     path('<int:claim_id>/detail/', views.claim_detail_partial, name='claim_detail'),
     path('<int:claim_id>/detail/partial/', views.claim_detail_partial, name='claim_detail_partial'),
+    path('<int:pk>/detail/flag/', views.add_flag, name='add_flag'),
+    path('<int:pk>/detail/note/', views.add_note, name='add_note'),
     
     # API endpoints for dashboard functionality
     path('<int:pk>/flag/', views.flag_claim_api, name='flag_claim_api'),
     path('<int:pk>/note/', views.add_note_api, name='add_note_api'),
     path('load-more/', views.load_more_claims, name='load_more_claims'),
+    path('rows/', views.claim_rows, name='claim_rows'),
+    path('grid/', views.claims_grid, name='claims_grid'),
+    path('api/claims/', views.claims_api, name='claims_api'),
+    path('export/', views.export_claims, name='export_claims'),
+    path('events/', views.dashboard_events, name='dashboard_events'),
+    path('saved-filters/', views.save_filter, name='save_filter'),
+    path('saved-filters/<int:pk>/delete/', views.delete_saved_filter, name='delete_saved_filter'),
+    path('metrics', views.metrics_view, name='metrics'),
     
     # Report page
     path('report/', views.report_view, name='report'),
@@ -1,42 +1,120 @@
-from django.shortcuts import render, get_object_or_404
-from django.db.models import Count, Sum, Avg, Q
-from django.http import JsonResponse
+import asyncio
+import csv
+import heapq
+import logging
+from operator import attrgetter, itemgetter
+from asgiref.sync import sync_to_async
+from django.shortcuts import render
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse, QueryDict, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.gzip import gzip_page
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
 import os
+import shutil
 import tempfile
+import uuid
 from django.core.management import call_command
 from django.http import HttpResponseRedirect
 from django.urls import reverse
+from django.utils.http import urlencode
 import json
-from database.models import Claim, Note, Flag
+from django.template.loader import render_to_string
+from database import claim_query, duplicates, import_diff, import_profile, shards, worklists
+from database.models import Claim, ImportRun, Note, Flag, SavedFilter
+from database.routers import reads_from_replica
+from . import api, caching, events, grid, metrics
+from .stats import adashboard_stats, areport_data, empty_report_data, upload_stats
 
-def dashboard(request):
+logger = logging.getLogger(__name__)
+
+# Async views render through sync_to_async: template rendering is sync-only and
+# lazy attributes (request.user, related managers) may still touch the database
+arender = sync_to_async(render)
+arender_to_string = sync_to_async(render_to_string)
+
+
+async def _alist(queryset):
+    """Evaluate a queryset with the async ORM."""
+    return [obj async for obj in queryset]
+
+
+async def _aclaim_page(query, querysets, start, end):
+    """Claims ``start:end`` across the querysets in ``query`` order, and the total they match."""
+    pages = [qs.select_related('detail__denial_reason').prefetch_related('flags', 'notes') for qs in querysets]
+    if len(pages) == 1:
+        pages = [pages[0][start:end]]
+    else:
+        # Every source could hold the whole page; merge their heads and slice
+        pages = [page[:end] for page in pages]
+    results = await asyncio.gather(*(_alist(page) for page in pages), *(qs.acount() for qs in querysets))
+    claims = list(heapq.merge(*results[:len(pages)], key=query.sort_key, reverse=query.descending))
+    if len(pages) > 1:
+        claims = claims[start:end]
+    return claims, sum(results[len(pages):])
+
+
+async def _aclaims_by_id(ids):
+    """Live claims with the given ids from every claim database, in id order."""
+    results = await asyncio.gather(*(
+        _alist(
+            Claim.objects.using(alias).filter(id__in=ids)
+            .select_related('detail__denial_reason').prefetch_related('flags', 'notes')
+        )
+        for alias in shards.claim_databases()
+    ))
+    return sorted((claim for claims in results for claim in claims), key=attrgetter('id'))
+
+
+async def _aworklist(request, user):
+    """The signed-in user's saved filter named by ?worklist=, or None."""
+    try:
+        worklist_id = int(request.GET.get('worklist') or 0)
+    except ValueError:
+        return None
+    if not worklist_id or not user.is_authenticated:
+        return None
+    return await SavedFilter.objects.filter(user=user, id=worklist_id).afirst()
+
+
+async def _aworklist_page(worklist, start, end):
+    """Claims ``start:end`` of a materialized worklist (claim id order) and its stored size.
+
+    The ids come from one range read of the worklist index; the filter itself
+    is not re-run.
+    """
+    ids = [claim_id async for claim_id in (
+        worklist.entries.order_by('claim_id').values_list('claim_id', flat=True)[start:end]
+    )]
+    return await _aclaims_by_id(ids), worklist.claim_count
+
+
+@reads_from_replica
+async def dashboard(request):
     """Main dashboard view with statistics and claims list."""
-    # Get filter parameters
-    status_q = request.GET.get('status') or ''
-    insurer_q = request.GET.get('insurer') or ''
+    # Get filter parameters; malformed sort/range values are ignored here
+    query = claim_query.ClaimQuery.from_params(request.GET, strict=False)
+    include_archived = request.GET.get('archived') == '1'
+    user = await request.auser()
+    worklist = await _aworklist(request, user)
+    if worklist is not None:
+        # The worklist's own filters, shown in the sidebar; its claims come from the worklist
+        query = worklists.query_for(worklist)
+        include_archived = False
     page = request.GET.get('page', 1)
     try:
         page = int(page)
     except ValueError:
         page = 1
+    # The grid view fetches its rows from claims_grid once the page has loaded
+    grid_view = request.GET.get('view') == 'grid'
     
-    # Base queryset - order by claim ID for consistent ordering
-    qs = Claim.objects.all().order_by('id')
-    
-    # Apply filters
-    if status_q:
-        qs = qs.filter(status__icontains=status_q)
-    if insurer_q:
-        qs = qs.filter(insurer_name__icontains=insurer_q)
-    
-    # Get total count for pagination
-    total_filtered_claims = qs.count()
+    # Sorted server-side (claim ID by default), with claim ID breaking ties for consistent paging
+    querysets = query.querysets(include_archived)
     
     # Pagination: 30 claims per page, max 100 claims total
     claims_per_page = 30
@@ -49,74 +127,104 @@ def dashboard(request):
     start_index = (page - 1) * claims_per_page
     end_index = min(start_index + claims_per_page, max_claims)
     
-    # Get claims for current page
-    claims = qs.select_related('detail').prefetch_related('flags', 'notes')[start_index:end_index]
+    # Count, current page, statistics and saved filters are independent, so fetch them together
+    (claims, total_filtered_claims), stats, saved_filters = await asyncio.gather(
+        asyncio.sleep(0, ([], 0)) if grid_view
+        else _aworklist_page(worklist, start_index, end_index) if worklist is not None
+        else _aclaim_page(query, querysets, start_index, end_index),
+        caching.aget_or_compute(caching.CLAIMS, 'dashboard-stats', adashboard_stats),
+        _alist(SavedFilter.objects.filter(user=user)) if user.is_authenticated else asyncio.sleep(0, []),
+    )
     
     # Check if there are more claims to load
     has_more = end_index < min(total_filtered_claims, max_claims)
     has_previous = page > 1
     
-    # Get statistics
-    total_claims = Claim.objects.count()
-    flagged_claims = Flag.objects.count()
-    total_notes = Note.objects.count()
-    
-    # Get status-based counts for sidebar
-    pending_count = Claim.objects.filter(status__icontains='pending').count()
-    under_review_count = Claim.objects.filter(status__icontains='under review').count()
-    paid_count = Claim.objects.filter(status__icontains='paid').count()
-    denied_count = Claim.objects.filter(status__icontains='denied').count()
-    underpaid_count = Claim.objects.filter(status__icontains='underpaid').count()
-    
-    # Calculate average underpayment
-    claims_with_underpayment = [claim.underpayment() for claim in Claim.objects.all()]
-    avg_underpayment = sum(claims_with_underpayment) / len(claims_with_underpayment) if claims_with_underpayment else 0
-    
     context = {
         "claims": claims,
-        "q_status": status_q,
-        "q_insurer": insurer_q,
-        "total_claims": total_claims,
-        "flagged_claims": flagged_claims,
-        "total_notes": total_notes,
-        "avg_underpayment": avg_underpayment,
-        "pending_count": pending_count,
-        "under_review_count": under_review_count,
-        "paid_count": paid_count,
-        "denied_count": denied_count,
-        "underpaid_count": underpaid_count,
+        "q_status": query.status,
+        "q_insurer": query.insurer,
+        "q_cpt": query.cpt_code,
+        "query": query,
+        "sorts": claim_query.SORT_LABELS.items(),
+        "include_archived": include_archived,
+        "worklist": worklist,
+        "grid_view": grid_view,
+        "saved_filters": saved_filters,
+        # Posted back by the "save filters" form
+        "filter_spec": urlencode(query.spec()),
+        **stats,
         "current_page": page,
         "has_more": has_more,
         "has_previous": has_previous,
         "total_filtered_claims": total_filtered_claims,
         "showing_start": start_index + 1,
         "showing_end": end_index,
+        # Read by static/js/dashboard.js through json_script
+        "dashboard_config": {
+            "currentPage": page,
+            "includeArchived": include_archived,
+            "worklist": worklist.id if worklist is not None else None,
+            "grid": grid_view,
+            "filterSpec": query.spec(),
+            "cptCode": query.cpt_code,
+            "query": query.params(),
+            "hasMore": has_more,
+            "hasPrevious": has_previous,
+            "urls": {
+                "csvUpload": reverse("claims:csv_upload"),
+                "loadMore": reverse("claims:load_more_claims"),
+                "grid": reverse("claims:claims_grid"),
+                "events": reverse("claims:dashboard_events"),
+                "claimRows": reverse("claims:claim_rows"),
+                "export": reverse("claims:export_claims"),
+            },
+        },
     }
     
-    return render(request, "claims/dashboard.html", context)
+    return await arender(request, "claims/dashboard.html", context)
 
-def claim_list(request):
+async def claim_list(request):
     """Legacy claim list view - redirects to dashboard."""
-    return dashboard(request)
+    return await dashboard(request)
+
+def _claim_detail_queryset():
+    return Claim.objects.select_related('detail__denial_reason').prefetch_related('notes', 'flags')
 
-def claim_detail_partial(request, pk):
+def _get_claim_or_404(pk, queryset=None):
+    """Look a claim up on whichever shard holds it (the only database when unsharded)."""
+    try:
+        return shards.get_claim(Claim.objects.all() if queryset is None else queryset, pk)
+    except Claim.DoesNotExist:
+        raise Http404(f"Claim {pk} not found")
+
+@reads_from_replica
+async def claim_detail_partial(request, claim_id):
     """HTMX endpoint for claim details."""
-    claim = get_object_or_404(Claim.objects.select_related('detail'), pk=pk)
-    print(f"DEBUG: Rendering claim {pk} with template claims/_claim_detail.html")
-    print(f"DEBUG: Claim has {claim.notes.count()} notes and {claim.flags.count()} flags")
     try:
-        return render(request, "claims/_claim_detail.html", {"claim": claim})
-    except Exception as e:
-        print(f"ERROR rendering template: {e}")
-        return render(request, "claims/_claim_detail.html", {"claim": claim})
+        claim = await shards.aget_claim(_claim_detail_queryset(), claim_id)
+    except Claim.DoesNotExist:
+        raise Http404(f"Claim {claim_id} not found")
+    candidates = [pair async for pair in duplicates.candidates(claim)]
+    return await arender(request, "claims/_claim_detail.html", {"claim": claim, "duplicates": candidates})
+
+def _render_claim_detail(request, pk):
+    """Re-render the detail partial after a synchronous write."""
+    claim = _get_claim_or_404(pk, _claim_detail_queryset())
+    candidates = list(duplicates.candidates(claim))
+    return render(request, "claims/_claim_detail.html", {"claim": claim, "duplicates": candidates})
 
 @csrf_exempt
 @require_http_methods(["POST"])
 def flag_claim_api(request, pk):
     """API endpoint to flag a claim."""
     try:
-        claim = get_object_or_404(Claim, pk=pk)
-        Flag.objects.create(claim=claim, created_by=request.user if request.user.is_authenticated else None)
+        claim = _get_claim_or_404(pk)
+        # Through the claim, so the flag is written to the claim's shard
+        claim.flags.create(created_by=request.user if request.user.is_authenticated else None)
+        events.publish_stats({'flagged_claims': 1})
+        events.publish_claims([claim.pk])
+        caching.bump_version(caching.CLAIMS)
         return JsonResponse({'success': True, 'message': 'Claim flagged successfully'})
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=400)
@@ -126,24 +234,42 @@ def flag_claim_api(request, pk):
 def add_note_api(request, pk):
     """API endpoint to add a note to a claim."""
     try:
-        claim = get_object_or_404(Claim, pk=pk)
+        claim = _get_claim_or_404(pk)
         data = json.loads(request.body)
         note_text = data.get('text', '').strip()
         
         if not note_text:
             return JsonResponse({'success': False, 'error': 'Note text is required'}, status=400)
         
-        Note.objects.create(
-            claim=claim, 
+        claim.notes.create(
             text=note_text,
             created_by=request.user if request.user.is_authenticated else None
         )
+        events.publish_stats({'total_notes': 1})
+        events.publish_claims([claim.pk])
+        caching.bump_version(caching.CLAIMS)
         return JsonResponse({'success': True, 'message': 'Note added successfully'})
     except json.JSONDecodeError:
         return JsonResponse({'success': False, 'error': 'Invalid JSON'}, status=400)
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=400)
 
+@login_required(login_url='admin:login')
+@require_http_methods(["POST"])
+def save_filter(request):
+    """Save the dashboard's current filters as a worklist of the signed-in user."""
+    query = claim_query.ClaimQuery.from_params(QueryDict(request.POST.get('spec', '')), strict=False)
+    name = request.POST.get('name', '').strip()[:100] or 'Saved filter'
+    saved_filter = worklists.save_filter(request.user, name, query)
+    return HttpResponseRedirect(f'{reverse("claims:dashboard")}?worklist={saved_filter.id}')
+
+@login_required(login_url='admin:login')
+@require_http_methods(["POST"])
+def delete_saved_filter(request, pk):
+    """Delete one of the signed-in user's saved filters and its worklist."""
+    SavedFilter.objects.filter(user=request.user, id=pk).delete()
+    return HttpResponseRedirect(reverse('claims:dashboard'))
+
 def csv_upload_view(request):
     """CSV upload view with smart merge functionality"""
     if request.method == 'POST':
@@ -190,18 +316,24 @@ def csv_upload_view(request):
                         f.write(chunk)
             
             # Count existing claims and user data before import
-            existing_claims_count = Claim.objects.count()
-            existing_flags_count = Flag.objects.count()
-            existing_notes_count = Note.objects.count()
+            existing_claims_count = shards.count(Claim)
+            existing_flags_count = shards.count(Flag)
+            existing_notes_count = shards.count(Note)
             
-            # Call the management command with smart merge
+            # Call the management command with smart merge; progress is streamed to dashboards
+            job_id = uuid.uuid4().hex[:12]
+            profile = bool(request.POST.get('profile'))
+            profile_args = ['--profile', *(['--profile-no-memory'] if request.POST.get('profile_no_memory') else [])]
             try:
-                call_command('load_claims', claim_list_path, claim_detail_path, '--mode', 'smart', '--force')
+                call_command(
+                    'load_claims', claim_list_path, claim_detail_path,
+                    '--mode', 'smart', '--force', '--job-id', job_id, *(profile_args if profile else []),
+                )
                 
                 # Count after import
-                new_claims_count = Claim.objects.count()
-                new_flags_count = Flag.objects.count()
-                new_notes_count = Note.objects.count()
+                new_claims_count = shards.count(Claim)
+                new_flags_count = shards.count(Flag)
+                new_notes_count = shards.count(Note)
                 
                 # Calculate what was updated
                 claims_updated = new_claims_count - existing_claims_count
@@ -210,76 +342,106 @@ def csv_upload_view(request):
                 
                 message = f"Updated {claims_updated} claims. Preserved {flags_preserved} flags and {notes_preserved} notes."
                 
-                return JsonResponse({
+                response = {
                     'success': True, 
                     'message': message,
+                    'job_id': job_id,
                     'claims_updated': claims_updated,
                     'flags_preserved': flags_preserved,
                     'notes_preserved': notes_preserved
-                })
+                }
+                run = ImportRun.objects.filter(job_id=job_id).first() if profile else None
+                if run:
+                    response['profile'] = {
+                        key: run.profile[key] for key in ('seconds', 'queries', 'memory_tracked', 'peak_memory', 'stages')
+                    }
+                return JsonResponse(response)
                 
             except Exception as e:
                 return JsonResponse({'success': False, 'message': f'Error during import: {str(e)}'})
             finally:
                 # Clean up temp files
-                import shutil
                 shutil.rmtree(temp_dir)
                 
         except Exception as e:
             return JsonResponse({'success': False, 'message': f'Error processing upload: {str(e)}'})
     
     # Get current statistics for context
-    total_claims = Claim.objects.count()
-    flagged_claims = Flag.objects.count()
-    total_notes = Note.objects.count()
-    
-    # Financial summary
-    financial_stats = Claim.objects.aggregate(
-        total_billed=Sum('billed_amount'),
-        total_paid=Sum('paid_amount'),
-    )
-    
-    total_underpayment = sum(claim.underpayment() for claim in Claim.objects.all())
-    avg_underpayment = total_underpayment / total_claims if total_claims > 0 else 0
-    
-    context = {
-        'total_claims': total_claims,
-        'flagged_claims': flagged_claims,
-        'total_notes': total_notes,
-        'financial_stats': financial_stats,
-        'total_underpayment': total_underpayment,
-        'avg_underpayment': avg_underpayment,
+    context = dict(caching.get_or_compute(caching.CLAIMS, 'upload-stats', upload_stats))
+    # Profiled imports, newest first
+    context['import_runs'] = import_profile.recent_runs()
+    # For static/js/csv_upload.js, rendered with json_script
+    context['upload_config'] = {
+        'urls': {
+            'preview': reverse('claims:csv_upload_preview'),
+            'previewPage': reverse('claims:csv_upload_preview_page', args=['TOKEN']),
+        },
     }
     
     return render(request, 'claims/csv_upload.html', context)
 
+@require_http_methods(["POST"])
+def csv_upload_preview(request):
+    """Diff an uploaded claim list against the database without importing it."""
+    claim_list_file = request.FILES.get('claim_list_file')
+    if not claim_list_file:
+        return JsonResponse({'success': False, 'message': 'Please upload the claim list file to preview.'}, status=400)
+    try:
+        token, diff = import_diff.create_preview(claim_list_file.chunks())
+    except (ValueError, UnicodeDecodeError) as e:
+        return JsonResponse({'success': False, 'message': f'Could not read claim list file: {e}'}, status=400)
+    return JsonResponse({
+        'success': True,
+        'token': token,
+        'summary': diff.summary(),
+        'page': diff.page('changed' if diff.changed else 'new'),
+    })
+
+def csv_upload_preview_page(request, token):
+    """One page of a stored import preview (?category=new|changed|missing|restored&page=N)."""
+    # Previews describe what an import would do to the primary, so they read from it
+    diff = import_diff.load_preview(token)
+    if diff is None:
+        return JsonResponse({'success': False, 'message': 'Preview expired, please upload the file again.'}, status=404)
+    category = request.GET.get('category', 'changed')
+    if category not in import_diff.CATEGORIES:
+        return JsonResponse({'success': False, 'message': f'Unknown category: {category}'}, status=400)
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    return JsonResponse({'success': True, 'page': diff.page(category, page)})
+
+@require_http_methods(["POST"])
 def add_flag(request, pk):
     """Add a flag to a claim."""
-    claim = get_object_or_404(Claim, pk=pk)
-    Flag.objects.create(claim=claim)
-    return claim_detail_partial(request, pk)
+    claim = _get_claim_or_404(pk)
+    claim.flags.create()
+    events.publish_stats({'flagged_claims': 1})
+    events.publish_claims([claim.pk])
+    caching.bump_version(caching.CLAIMS)
+    return _render_claim_detail(request, pk)
 
+@require_http_methods(["POST"])
 def add_note(request, pk):
     """Add a note to a claim."""
-    claim = get_object_or_404(Claim, pk=pk)
-    Note.objects.create(claim=claim, text=request.POST.get("text",""))
-    return claim_detail_partial(request, pk)
+    claim = _get_claim_or_404(pk)
+    claim.notes.create(text=request.POST.get("text",""))
+    events.publish_stats({'total_notes': 1})
+    events.publish_claims([claim.pk])
+    caching.bump_version(caching.CLAIMS)
+    return _render_claim_detail(request, pk)
 
-def load_more_claims(request):
+@reads_from_replica
+async def load_more_claims(request):
     """API endpoint to load more claims for pagination."""
     try:
         page = int(request.GET.get('page', 1))
-        status_q = request.GET.get('status', '')
-        insurer_q = request.GET.get('insurer', '')
+        query = claim_query.ClaimQuery.from_params(request.GET)
+        include_archived = request.GET.get('archived') == '1'
         
-        # Base queryset - order by claim ID for consistent ordering
-        qs = Claim.objects.all().order_by('id')
-        
-        # Apply filters
-        if status_q:
-            qs = qs.filter(status__icontains=status_q)
-        if insurer_q:
-            qs = qs.filter(insurer_name__icontains=insurer_q)
+        # Sorted server-side (claim ID by default), with claim ID breaking ties for consistent paging
+        querysets = query.querysets(include_archived)
         
         # Pagination: 30 claims per page, max 100 claims total
         claims_per_page = 30
@@ -288,17 +450,19 @@ def load_more_claims(request):
         start_index = (page - 1) * claims_per_page
         end_index = min(start_index + claims_per_page, max_claims)
         
-        # Get claims for current page
-        claims = qs.select_related('detail').prefetch_related('flags', 'notes')[start_index:end_index]
+        # Get claims for current page together with the filtered total
+        worklist = await _aworklist(request, await request.auser()) if request.GET.get('worklist') else None
+        if worklist is not None:
+            claims, total_filtered_claims = await _aworklist_page(worklist, start_index, end_index)
+        else:
+            claims, total_filtered_claims = await _aclaim_page(query, querysets, start_index, end_index)
         
         # Check if there are more claims to load
-        total_filtered_claims = qs.count()
         has_more = end_index < min(total_filtered_claims, max_claims)
         has_previous = page > 1
         
         # Render claims as HTML
-        from django.template.loader import render_to_string
-        claims_html = render_to_string('claims/claims_table_rows.html', {
+        claims_html = await arender_to_string('claims/claims_table_rows.html', {
             'claims': claims,
             'request': request
         })
@@ -315,153 +479,150 @@ def load_more_claims(request):
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=400)
 
-def report_view(request):
-    """Generate comprehensive reports with charts and analytics."""
+def claim_rows(request):
+    """Render table rows for specific claims so live dashboards can patch them in place."""
+    # Fetched right after a change event, so read from the primary: the
+    # replica may not have the change yet
     try:
-        print("Starting report_view...")
-        
-        # Get limited claims data for performance
-        claims = Claim.objects.all()
-        print(f"Total claims available: {claims.count()}")
-        
-        # Status distribution for pie chart (limit to 1000 claims)
-        status_distribution = claims.values('status').annotate(count=Count('id')).order_by('-count')[:1000]
-        print(f"Status distribution: {list(status_distribution)}")
-        status_data = {
-            'labels': [item['status'] for item in status_distribution],
-            'data': [item['count'] for item in status_distribution],
-            'colors': ['#3B82F6', '#10B981', '#F59E0B', '#EF4444', '#8B5CF6', '#06B6D4']
-        }
-        print(f"Status data: {status_data}")
-        print("Status data processed...")
-        
-        # Billed vs Paid amounts by insurer for bar chart (limit to 5 insurers)
-        billed_paid_data = []
-        insurers = list(claims.values('insurer_name').distinct()[:5])
-        print(f"Found insurers: {insurers}")
-        for insurer in insurers:
-            insurer_claims = claims.filter(insurer_name=insurer['insurer_name'])[:1000]  # Limit per insurer
-            total_billed = float(insurer_claims.aggregate(Sum('billed_amount'))['billed_amount__sum'] or 0)
-            total_paid = float(insurer_claims.aggregate(Sum('paid_amount'))['paid_amount__sum'] or 0)
-            billed_paid_data.append({
-                'insurer': insurer['insurer_name'],
-                'billed': total_billed,
-                'paid': total_paid
-            })
-        print(f"Billed paid data: {billed_paid_data}")
-        print("Billed paid data processed...")
-        
-        # Underpayment by insurer for horizontal bar chart (limit to 5 insurers)
-        underpayment_data = []
-        for insurer in insurers:
-            insurer_claims = claims.filter(insurer_name=insurer['insurer_name'])[:1000]  # Limit per insurer
-            total_underpayment = sum(float(claim.underpayment()) for claim in insurer_claims)
-            avg_underpayment = total_underpayment / insurer_claims.count() if insurer_claims.count() > 0 else 0
-            underpayment_data.append({
-                'insurer': insurer['insurer_name'],
-                'avg_underpayment': avg_underpayment,
-                'total_underpayment': total_underpayment,
-                'claim_count': insurer_claims.count()
-            })
-        
-        # Sort by average underpayment
-        underpayment_data.sort(key=lambda x: x['avg_underpayment'], reverse=True)
-        print(f"Underpayment data: {underpayment_data}")
-        print("Underpayment data processed...")
-        
-        # Financial summary (limit to 1000 claims for performance)
-        limited_claims = claims[:1000]
-        financial_summary = limited_claims.aggregate(
-            total_billed=Sum('billed_amount'),
-            total_paid=Sum('paid_amount'),
-            avg_billed=Avg('billed_amount'),
-            avg_paid=Avg('paid_amount')
+        ids = [int(value) for value in request.GET.get('ids', '').split(',') if value.strip()]
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'ids must be a comma-separated list of integers'}, status=400)
+    
+    # Clients only ask for rows they are displaying, so keep requests page-sized
+    ids = ids[:100]
+    claims = [
+        claim
+        for alias in shards.claim_databases()
+        for claim in (
+            Claim.objects.using(alias).filter(id__in=ids).order_by('id')
+            .select_related('detail__denial_reason').prefetch_related('flags', 'notes')
         )
-        
-        # Calculate total underpayment (simplified)
-        total_underpayment = float(sum(claim.underpayment() for claim in limited_claims))
-        avg_underpayment = total_underpayment / limited_claims.count() if limited_claims.count() > 0 else 0
-        print("Financial summary processed...")
-        
-        # Simplified monthly data (last 6 months only)
-        from datetime import datetime, timedelta
-        from django.utils import timezone
-        
-        monthly_data = []
-        for i in range(6):  # Reduced from 12 to 6 months
-            month_start = timezone.now() - timedelta(days=30*i)
-            month_end = month_start + timedelta(days=30)
-            month_claims = claims.filter(created_at__range=[month_start, month_end])[:1000]  # Limit per month
-            monthly_data.append({
-                'month': month_start.strftime('%b %Y'),
-                'count': month_claims.count(),
-                'billed': float(sum(claim.billed_amount for claim in month_claims)),
-                'paid': float(sum(claim.paid_amount for claim in month_claims)),
-                'underpayment': float(sum(claim.underpayment() for claim in month_claims))
-            })
-        
-        monthly_data.reverse()  # Show oldest to newest
-        print("Monthly data processed...")
-        
-        # Top underpayments (limit to 5)
-        top_underpayments = []
-        for claim in limited_claims[:100]:  # Only check first 100 claims
-            underpayment = claim.underpayment()
-            if underpayment > 0:
-                top_underpayments.append({
-                    'claim_id': claim.id,
-                    'patient_name': claim.patient_name,
-                    'insurer': claim.insurer_name,
-                    'underpayment': float(underpayment),
-                    'billed': float(claim.billed_amount),
-                    'paid': float(claim.paid_amount)
-                })
-        
-        top_underpayments.sort(key=lambda x: x['underpayment'], reverse=True)
-        top_underpayments = top_underpayments[:5]  # Limit to 5
-        print("Top underpayments processed...")
-        
-        # Flagged claims analysis
-        flagged_claims = claims.filter(flags__isnull=False).distinct()[:1000]
-        flagged_status_dist = flagged_claims.values('status').annotate(count=Count('id'))
-        
-        # Notes analysis
-        claims_with_notes = claims.filter(notes__isnull=False).distinct()[:1000]
-        
-        context = {
-            'status_data': status_data,
-            'billed_paid_data': billed_paid_data,
-            'underpayment_data': underpayment_data,
-            'financial_summary': financial_summary,
-            'total_underpayment': total_underpayment,
-            'avg_underpayment': avg_underpayment,
-            'monthly_data': monthly_data,
-            'top_underpayments': top_underpayments,
-            'flagged_claims_count': flagged_claims.count(),
-            'flagged_status_dist': flagged_status_dist,
-            'claims_with_notes_count': claims_with_notes.count(),
-            'total_claims': limited_claims.count(),
-        }
-        
-        print("Rendering template...")
-        return render(request, 'claims/report.html', context)
+    ]
+    
+    rows = {
+        claim.id: render_to_string('claims/claims_table_rows.html', {'claims': [claim], 'request': request})
+        for claim in claims
+    }
     
+    return JsonResponse({'success': True, 'rows': rows})
+
+@gzip_page
+@reads_from_replica
+async def claims_grid(request):
+    """Column-oriented rows start:start+limit for the dashboard's grid view (see backend/grid.py)."""
+    try:
+        query = claim_query.ClaimQuery.from_params(request.GET)
+        start, end = grid.chunk_bounds(request.GET)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    worklist = await _aworklist(request, await request.auser()) if request.GET.get('worklist') else None
+    if worklist is not None:
+        chunk = await grid.aworklist_chunk(worklist, start, end)
+    else:
+        querysets = query.querysets(request.GET.get('archived') == '1')
+        chunk = await grid.achunk(query, querysets, start, end)
+    return JsonResponse({'success': True, **chunk})
+
+@gzip_page
+@reads_from_replica
+async def claims_api(request):
+    """JSON read API for integrations: claims by id list or cursor page, with sparse fields (see backend/api.py)."""
+    try:
+        query = api.ApiQuery(request.GET)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    return JsonResponse(await api.afetch(query))
+
+def dashboard_events(request):
+    """Server-sent events stream of stats deltas, changed claim rows and import progress."""
+    if not events.connection_limiter.acquire():
+        response = JsonResponse({'success': False, 'error': 'Too many live connections, retry shortly'}, status=503)
+        response['Retry-After'] = '10'
+        return response
+    
+    # Resume after the last event the browser saw, or start from "now" on first connect
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or request.GET.get('last_id') or 0)
+    except ValueError:
+        last_id = 0
+    try:
+        if last_id <= 0:
+            last_id = events.latest_event_id()
+    except Exception:
+        events.connection_limiter.release()
+        raise
+    
+    # Under ASGI the stream waits on the event loop instead of holding a thread
+    stream_class = events.AsyncEventStream if isinstance(request, ASGIRequest) else events.EventStream
+    response = StreamingHttpResponse(
+        stream_class(last_id, limiter=events.connection_limiter),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@reads_from_replica
+async def report_view(request):
+    """Generate comprehensive reports with charts and analytics."""
+    try:
+        context = dict(await caching.aget_or_compute(caching.CLAIMS, 'report', areport_data))
     except Exception as e:
-        print(f"Error in report_view: {e}")
-        import traceback
-        traceback.print_exc()
-        return render(request, 'claims/report.html', {
-            'error': str(e),
-            'status_data': {'labels': [], 'data': [], 'colors': []},
-            'billed_paid_data': [],
-            'underpayment_data': [],
-            'financial_summary': {},
-            'total_underpayment': 0,
-            'avg_underpayment': 0,
-            'monthly_data': [],
-            'top_underpayments': [],
-            'flagged_claims_count': 0,
-            'flagged_status_dist': [],
-            'claims_with_notes_count': 0,
-            'total_claims': 0,
-        })
+        logger.exception("Error building report")
+        context = {'error': str(e), **empty_report_data()}
+    
+    return await arender(request, 'claims/report.html', context)
+
+EXPORT_FIELDS = [
+    'id', 'patient_name', 'billed_amount', 'paid_amount', 'status', 'insurer_name', 'discharge_date',
+    'detail__denial_reason__text', 'detail__cpt_codes',
+]
+EXPORT_HEADER = [
+    'Claim ID', 'Patient Name', 'Billed Amount', 'Paid Amount', 'Underpayment', 'Status', 'Insurer',
+    'Discharge Date', 'Denial Reason', 'CPT Codes', 'Archived',
+]
+
+
+class _Echo:
+    """Write target that returns each CSV line so it can be streamed."""
+
+    def write(self, value):
+        return value
+
+
+def _export_rows(querysets):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_HEADER)
+    sources = [
+        ((*row, qs.model.is_archived) for row in qs.values_list(*EXPORT_FIELDS).iterator(chunk_size=2000))
+        for qs in querysets
+    ]
+    for (claim_id, patient, billed, paid, status, insurer, discharged, denial, cpt, archived) in heapq.merge(
+        *sources, key=itemgetter(0)
+    ):
+        yield writer.writerow([
+            claim_id, patient, billed, paid, max(billed - paid, 0), status, insurer,
+            discharged.isoformat(), denial or '', cpt or '', 'yes' if archived else 'no',
+        ])
+
+@reads_from_replica
+def export_claims(request):
+    """Stream the claims matching the dashboard filters as CSV (with archived claims when archived=1).
+
+    Rows are always in claim ID order; the table's sort does not apply.
+    """
+    try:
+        query = claim_query.ClaimQuery.from_params(request.GET)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    # Rows are read after the view returns, outside its routing context, so pin
+    # each queryset to its database (shard, replica or primary) now
+    querysets = [qs.order_by('id').using(qs.db) for qs in query.querysets(request.GET.get('archived') == '1')]
+    response = StreamingHttpResponse(_export_rows(querysets), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="claims.csv"'
+    return response
+
+def metrics_view(request):
+    """Prometheus scrape endpoint for this worker's request and cache metrics."""
+    return HttpResponse(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,160 @@
+"""Per-process warm-up for freshly started or recycled workers.
+
+Without it the first requests a worker serves pay for compiling the large
+dashboard templates, building the URL resolver, opening the database
+connection and computing the dashboard and report statistics. ``warm_up()``
+does all of that before the worker takes traffic:
+
+- compiles every template under the project template directories
+  (``claims/*`` and the ``base.html`` they extend) into the cached loader
+- resolves the claim URLs, which imports the views and builds the resolver
+- opens the connection of each configured database and runs a trivial query
+- fills the dashboard, upload and report entries of the stats cache
+
+It runs once per process, from ``erisa_recovery.wsgi``/``asgi`` when
+``WARMUP_ON_STARTUP`` is on and from the ``post_worker_init`` hook in
+``gunicorn.conf.py``. Failed steps are logged and skipped so a worker still
+starts when, say, the database is not migrated yet.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import connections
+from django.template import engines
+from django.template.loader import get_template
+from django.urls import reverse
+
+from . import caching
+from .stats import areport_data, dashboard_stats, upload_stats
+
+logger = logging.getLogger(__name__)
+
+# URLs resolved during warm-up (their kwargs only need to be well-formed)
+WARMUP_URLS = [
+    ('claims:dashboard', {}),
+    ('claims:load_more_claims', {}),
+    ('claims:claim_detail_partial', {'claim_id': 1}),
+    ('claims:report', {}),
+    ('claims:csv_upload', {}),
+]
+
+_lock = threading.Lock()
+# pid -> step timings of the warm-up that already ran in that process
+_done = {}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def template_names():
+    """Names of the templates in the project template directories, e.g. ``claims/dashboard.html``."""
+    names = []
+    for engine in engines.all():
+        for directory in getattr(engine, 'dirs', []):
+            root = Path(directory)
+            names.extend(str(path.relative_to(root)) for path in sorted(root.rglob('*.html')))
+    return names
+
+
+def compile_templates():
+    for name in template_names():
+        get_template(name)
+
+
+def resolve_urls():
+    for name, kwargs in WARMUP_URLS:
+        reverse(name, kwargs=kwargs)
+
+
+def open_connections():
+    for alias in settings.DATABASES:
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+
+def fill_caches():
+    # Same namespaces and keys as the views, so their first lookups are hits
+    caching.get_or_compute(caching.CLAIMS, 'dashboard-stats', dashboard_stats)
+    caching.get_or_compute(caching.CLAIMS, 'upload-stats', upload_stats)
+    async_to_sync(caching.aget_or_compute)(caching.CLAIMS, 'report', areport_data)
+
+
+STEPS = [
+    ('templates', compile_templates),
+    ('urls', resolve_urls),
+    ('database', open_connections),
+    ('caches', fill_caches),
+]
+
+
+def _run_steps():
+    timings = {}
+    for name, step in STEPS:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            logger.exception('Warm-up step %s failed', name)
+            timings[name] = None
+            continue
+        timings[name] = time.perf_counter() - started
+    return timings
+
+
+def _in_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def warm_up():
+    """Run the warm-up steps once in this process and return ``{step: seconds}`` (None for failures).
+
+    Runs in the calling thread, so a sync worker's request thread keeps the
+    connection it opened. ASGI servers import the application inside their
+    event loop, where the async-to-sync calls cannot run; there the steps
+    run in a helper thread, whose connections are closed afterwards.
+    """
+    with _lock:
+        pid = os.getpid()
+        if pid in _done:
+            return _done[pid]
+        started = time.perf_counter()
+        if _in_event_loop():
+            result = {}
+
+            def run():
+                try:
+                    result.update(_run_steps())
+                finally:
+                    connections.close_all()
+
+            thread = threading.Thread(target=run, name='warm-up')
+            thread.start()
+            thread.join()
+            timings = result
+        else:
+            timings = _run_steps()
+        _done[pid] = timings
+        logger.info(
+            'Worker %s warmed up in %.0fms (%s)', pid, (time.perf_counter() - started) * 1000,
+            ', '.join(f'{name} {"failed" if seconds is None else f"{seconds * 1000:.0f}ms"}'
+                      for name, seconds in timings.items()),
+        )
+        return timings
+
+
+def warm_up_on_startup():
+    """Entry-point hook: warm up unless ``WARMUP_ON_STARTUP`` is off."""
+    if _setting('WARMUP_ON_STARTUP', True):
+        return warm_up()
+    return None
@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+
+class DatabaseConfig(AppConfig):
+    name = 'database'
+
+    def ready(self):
+        from .sqlite import apply_sqlite_profile
+        connection_created.connect(apply_sqlite_profile, dispatch_uid='database.apply_sqlite_profile')
+
+        from .changes import connect_signals
+        connect_signals()
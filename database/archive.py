@@ -0,0 +1,202 @@
+"""Hot/cold archiving of closed claims.
+
+Claims in a final status (``ARCHIVE_STATUSES``) discharged more than
+``ARCHIVE_AFTER_DAYS`` ago are moved, with their detail, flags and notes, into
+the ``Archived*`` tables in batches (CPT code links included), so the queries behind the dashboard only
+touch open work. ``ArchiveRollup`` keeps per insurer/status totals of what was
+moved, which the statistics in ``backend.stats`` add back in. Rows keep their
+ids, so ``unarchive_claims()`` restores them exactly.
+
+With sharded claims (see database/shards.py) every shard has its own archive
+tables and rollups; archiving and restoring run on the shard selected with
+``use_shard()``, one shard at a time.
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import changes, shards
+from .models import (
+    ArchivedClaim, ArchivedClaimCptCode, ArchivedClaimDetail, ArchivedFlag, ArchivedNote, ArchiveRollup,
+    Claim, ClaimChange, ClaimCptCode, ClaimDetail, Flag, Note,
+)
+
+CLAIM_FIELDS = ['id', 'patient_name', 'billed_amount', 'paid_amount', 'status', 'insurer_name', 'discharge_date', 'created_at']
+DETAIL_FIELDS = ['id', 'claim_id', 'denial_reason_id', 'cpt_codes']
+FLAG_FIELDS = ['id', 'claim_id', 'created_by_id', 'created_at']
+NOTE_FIELDS = ['id', 'claim_id', 'text', 'created_by_id', 'created_at']
+CPT_LINK_FIELDS = ['claim_id', 'code_id']
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def archive_cutoff(days=None):
+    """Discharge date before which closed claims are archived."""
+    if days is None:
+        days = _setting('ARCHIVE_AFTER_DAYS', 730)
+    return timezone.localdate() - timedelta(days=days)
+
+
+def archive_candidates(before=None, statuses=None):
+    """Live claims that are eligible for archiving."""
+    if statuses is None:
+        statuses = _setting('ARCHIVE_STATUSES', ['Paid', 'Denied'])
+    return Claim.objects.filter(discharge_date__lt=before or archive_cutoff(), status__in=statuses)
+
+
+def claim_querysets(include_archived=False, **filters):
+    """Querysets over live claims, followed by archived ones when asked for.
+
+    Both models share their columns and related names, so the same filters,
+    ``select_related('detail__denial_reason')`` and ``prefetch_related('flags', 'notes')``
+    apply to every queryset returned. With sharded claims there is a pair
+    per shard, each pinned to its database.
+    """
+    models = [Claim, ArchivedClaim] if include_archived else [Claim]
+    return [
+        model.objects.using(alias).filter(**filters)
+        for alias in shards.claim_databases() for model in models
+    ]
+
+
+def _batches(ids, size):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _update_rollups(claims, flags, notes, sign):
+    """Add (sign=1) or subtract (sign=-1) claims and their annotations from the rollups."""
+    flag_counts = Counter(flag['claim_id'] for flag in flags)
+    note_counts = Counter(note['claim_id'] for note in notes)
+    groups = defaultdict(Counter)
+    for claim in claims:
+        totals = groups[claim['insurer_name'], claim['status']]
+        totals['claim_count'] += 1
+        totals['billed_total'] += claim['billed_amount']
+        totals['paid_total'] += claim['paid_amount']
+        totals['underpayment_total'] += max(claim['billed_amount'] - claim['paid_amount'], Decimal('0'))
+        totals['flag_count'] += flag_counts[claim['id']]
+        totals['note_count'] += note_counts[claim['id']]
+        totals['flagged_claim_count'] += 1 if flag_counts[claim['id']] else 0
+        totals['noted_claim_count'] += 1 if note_counts[claim['id']] else 0
+
+    for (insurer_name, status), totals in groups.items():
+        rollup, _ = ArchiveRollup.objects.get_or_create(insurer_name=insurer_name, status=status)
+        ArchiveRollup.objects.filter(pk=rollup.pk).update(**{
+            field: F(field) + sign * value for field, value in totals.items()
+        })
+    if sign < 0:
+        ArchiveRollup.objects.filter(claim_count__lte=0).delete()
+
+
+def _record_moves(claims, details, action):
+    """Log claims and details leaving (archive) or re-entering (restore) the live tables."""
+    side = 'old' if action == changes.ARCHIVE else 'new'
+    changes.record_many([
+        changes.change(kind, row[id_field], action, source='archive', **{side: changes.tracked_values(kind, row)})
+        for kind, rows, id_field in ((ClaimChange.CLAIM, claims, 'id'), (ClaimChange.DETAIL, details, 'claim_id'))
+        for row in rows
+    ])
+
+
+def _archive_batch(queryset, ids):
+    # Re-apply the criteria under the lock: a claim may have changed since it was listed
+    claims = list(queryset.filter(id__in=ids).select_for_update().values(*CLAIM_FIELDS))
+    ids = [claim['id'] for claim in claims]
+    if not ids:
+        return 0
+    details = list(ClaimDetail.objects.filter(claim_id__in=ids).values(*DETAIL_FIELDS))
+    flags = list(Flag.objects.filter(claim_id__in=ids).values(*FLAG_FIELDS))
+    notes = list(Note.objects.filter(claim_id__in=ids).values(*NOTE_FIELDS))
+    cpt_links = list(ClaimCptCode.objects.filter(claim_id__in=ids).values(*CPT_LINK_FIELDS))
+
+    archived_at = timezone.now()
+    ArchivedClaim.objects.bulk_create(ArchivedClaim(archived_at=archived_at, **claim) for claim in claims)
+    ArchivedClaimDetail.objects.bulk_create(ArchivedClaimDetail(**detail) for detail in details)
+    ArchivedFlag.objects.bulk_create(ArchivedFlag(**flag) for flag in flags)
+    ArchivedNote.objects.bulk_create(ArchivedNote(**note) for note in notes)
+    ArchivedClaimCptCode.objects.bulk_create(ArchivedClaimCptCode(**link) for link in cpt_links)
+    _update_rollups(claims, flags, notes, sign=1)
+    _record_moves(claims, details, changes.ARCHIVE)
+
+    with changes.recording_disabled():
+        Note.objects.filter(claim_id__in=ids).delete()
+        Flag.objects.filter(claim_id__in=ids).delete()
+        ClaimCptCode.objects.filter(claim_id__in=ids).delete()
+        ClaimDetail.objects.filter(claim_id__in=ids).delete()
+        Claim.objects.filter(id__in=ids).delete()
+    return len(ids)
+
+
+def archive_claims(before=None, statuses=None, batch_size=None, limit=None, progress=None):
+    """Move eligible claims into the archive tables, one transaction per batch.
+
+    ``progress`` is called with the running total after each batch. Returns
+    the number of claims archived.
+    """
+    batch_size = batch_size or _setting('ARCHIVE_BATCH_SIZE', 500)
+    queryset = archive_candidates(before, statuses)
+    ids = list(queryset.order_by('id').values_list('id', flat=True)[:limit])
+    archived = 0
+    for batch in _batches(ids, batch_size):
+        with transaction.atomic(using=shards.write_alias()):
+            archived += _archive_batch(queryset, batch)
+        if progress:
+            progress(archived)
+    return archived
+
+
+def _restore_annotations(model, rows):
+    """bulk_create flags/notes keeping their original created_at (auto_now_add resets it)."""
+    objs = model.objects.bulk_create([model(**row) for row in rows])
+    for obj, row in zip(objs, rows):
+        obj.created_at = row['created_at']
+    model.objects.bulk_update(objs, ['created_at'], batch_size=500)
+
+
+def _unarchive_batch(ids):
+    claims = list(ArchivedClaim.objects.filter(id__in=ids).values(*CLAIM_FIELDS))
+    ids = [claim['id'] for claim in claims]
+    if not ids:
+        return 0
+    details = list(ArchivedClaimDetail.objects.filter(claim_id__in=ids).values(*DETAIL_FIELDS))
+    flags = list(ArchivedFlag.objects.filter(claim_id__in=ids).values(*FLAG_FIELDS))
+    notes = list(ArchivedNote.objects.filter(claim_id__in=ids).values(*NOTE_FIELDS))
+    cpt_links = list(ArchivedClaimCptCode.objects.filter(claim_id__in=ids).values(*CPT_LINK_FIELDS))
+
+    Claim.objects.bulk_create(Claim(**claim) for claim in claims)
+    ClaimDetail.objects.bulk_create(ClaimDetail(**detail) for detail in details)
+    ClaimCptCode.objects.bulk_create(ClaimCptCode(**link) for link in cpt_links)
+    _restore_annotations(Flag, flags)
+    _restore_annotations(Note, notes)
+    _update_rollups(claims, flags, notes, sign=-1)
+    _record_moves(claims, details, changes.RESTORE)
+
+    ArchivedNote.objects.filter(claim_id__in=ids).delete()
+    ArchivedFlag.objects.filter(claim_id__in=ids).delete()
+    ArchivedClaimCptCode.objects.filter(claim_id__in=ids).delete()
+    ArchivedClaimDetail.objects.filter(claim_id__in=ids).delete()
+    ArchivedClaim.objects.filter(id__in=ids).delete()
+    return len(ids)
+
+
+def unarchive_claims(ids, batch_size=None, progress=None):
+    """Move archived claims (and their detail, flags and notes) back to the live tables.
+
+    Ids that are not archived are ignored. Returns the number of claims restored.
+    """
+    batch_size = batch_size or _setting('ARCHIVE_BATCH_SIZE', 500)
+    restored = 0
+    for batch in _batches(sorted(set(ids)), batch_size):
+        with transaction.atomic(using=shards.write_alias()):
+            restored += _unarchive_batch(batch)
+        if progress:
+            progress(restored)
+    return restored
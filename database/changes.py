@@ -0,0 +1,429 @@
+"""Append-only change log for claims and claim details.
+
+Every insert, update and delete of a ``Claim`` or ``ClaimDetail`` appends a
+``ClaimChange`` row whose id is a monotonically increasing sequence number,
+with old/new values of the tracked fields. Instance saves and deletes (the
+importer, the admin, views) are captured by signal handlers; bulk paths
+(archiving, synthetic seeding) call ``record_many()`` themselves.
+
+Derived structures (stats, caches, search indexes, rollups) follow the log
+with a ``ChangeConsumer``: a named cursor that hands out changes after its
+position and advances in the same transaction as the consumer's own writes.
+Consumers read by sequence number, so numbers must follow commit order.
+SQLite has a single writer; on PostgreSQL a transaction locks the log table
+when it records its first change and keeps the lock until it commits (see
+``_in_commit_order()``). Other databases are refused.
+
+``compact_claim_changes`` trims the log: changes every consumer has read are
+deleted after ``CLAIM_CHANGE_RETENTION_DAYS``, and runs of changes to the same
+claim that no consumer has read yet are collapsed into one net change.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.db import DEFAULT_DB_ALIAS, NotSupportedError, connections, router, transaction
+from django.db.models import Max, Min
+from django.db.models.signals import post_delete, post_save
+
+from . import denials, shards
+from .models import ChangeCursor, Claim, ClaimChange, ClaimDetail, Flag, Note
+
+TRACKED_FIELDS = {
+    ClaimChange.CLAIM: ('patient_name', 'billed_amount', 'paid_amount', 'status', 'insurer_name', 'discharge_date'),
+    ClaimChange.DETAIL: ('denial_reason', 'cpt_codes'),
+}
+
+MODELS = {ClaimChange.CLAIM: Claim, ClaimChange.DETAIL: ClaimDetail}
+
+INSERT = 'insert'
+UPDATE = 'update'
+DELETE = 'delete'
+ARCHIVE = 'archive'
+RESTORE = 'restore'
+
+_source = ContextVar('claim_change_source', default='app')
+_recording = ContextVar('claim_change_recording', default=True)
+# Changes held back by buffered(), or None to write each one as it is recorded
+_pending = ContextVar('claim_change_pending', default=None)
+
+
+@contextmanager
+def change_source(source):
+    """Tag changes recorded inside the block with ``source`` (e.g. 'import')."""
+    token = _source.set(source)
+    try:
+        yield
+    finally:
+        _source.reset(token)
+
+
+@contextmanager
+def recording_disabled():
+    """Skip the signal handlers inside the block; the caller records its changes itself."""
+    token = _recording.set(False)
+    try:
+        yield
+    finally:
+        _recording.reset(token)
+
+
+@contextmanager
+def buffered():
+    """Hold changes recorded inside the block in memory until ``flush()`` or the end of the block.
+
+    For writers whose claims live on a shard: the log stays on ``default``, and
+    saving each change there as its own transaction makes parallel shard
+    loaders queue for its write lock on every row.
+    """
+    token = _pending.set([])
+    try:
+        yield
+        flush()
+    finally:
+        _pending.reset(token)
+
+
+def flush():
+    """Write the changes buffered() is holding (a no-op outside it)."""
+    pending = _pending.get()
+    if pending:
+        record_many(pending)
+        pending.clear()
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        # Normalized so 100, 100.0 and 100.00 compare equal
+        return format(value.normalize(), 'f')
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _raw_value(values, field):
+    if not isinstance(values, dict):
+        return getattr(values, field.attname)
+    return values[field.attname] if field.attname in values else values.get(field.name)
+
+
+def tracked_values(kind, values):
+    """JSON-ready tracked field values from an instance or a ``values()`` dict.
+
+    The denial reason foreign key is logged as its text, so the log reads the
+    same as before reasons were moved into a lookup table.
+    """
+    meta = MODELS[kind]._meta
+    tracked = {}
+    for name in TRACKED_FIELDS[kind]:
+        field = meta.get_field(name)
+        value = _raw_value(values, field)
+        if field.is_relation:
+            tracked[name] = denials.reason_text(value)
+        else:
+            # to_python() so values assigned as int/str compare equal to the loaded ones
+            tracked[name] = _json_value(field.to_python(value))
+    return tracked
+
+
+def diff(old, new):
+    """{field: [old, new]} for the fields whose value differs (None stands for absent)."""
+    fields = (old or {}).keys() | (new or {}).keys()
+    changes = {}
+    for field in sorted(fields):
+        before = (old or {}).get(field)
+        after = (new or {}).get(field)
+        if before != after:
+            changes[field] = [before, after]
+    return changes
+
+
+def change(kind, claim_id, action, old=None, new=None, source=None):
+    """Build an unsaved ClaimChange between two tracked_values() snapshots."""
+    return ClaimChange(
+        claim_id=claim_id, kind=kind, action=action, changes=diff(old, new), source=source or _source.get(),
+    )
+
+
+@contextmanager
+def _in_commit_order():
+    """Hold the change log's write lock around writing changes, so sequence numbers follow commit order.
+
+    Otherwise a change could commit after one with a higher number that a
+    consumer has already read past, and it would never be read. SQLite has a
+    single writer already. On PostgreSQL the table lock lasts until the
+    outermost transaction commits; it still lets consumers read.
+    """
+    connection = connections[router.db_for_write(ClaimChange)]
+    if connection.vendor == 'sqlite':
+        yield
+        return
+    if connection.vendor != 'postgresql':
+        raise NotSupportedError(f'The claim change log needs SQLite or PostgreSQL, not {connection.vendor}')
+    with transaction.atomic(using=connection.alias):
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {connection.ops.quote_name(ClaimChange._meta.db_table)} IN EXCLUSIVE MODE')
+        yield
+
+
+def record(kind, claim_id, action, old=None, new=None, source=None):
+    claim_change = change(kind, claim_id, action, old, new, source)
+    pending = _pending.get()
+    if pending is None:
+        with _in_commit_order():
+            claim_change.save()
+    else:
+        pending.append(claim_change)
+
+
+def record_many(changes):
+    """Append prebuilt changes in one statement (for bulk inserts and moves)."""
+    with _in_commit_order():
+        ClaimChange.objects.bulk_create(changes, batch_size=1000)
+
+
+def latest_sequence():
+    return ClaimChange.objects.aggregate(latest=Max('id'))['latest'] or 0
+
+
+def changes_after(position, limit=500, kinds=None):
+    """Changes with a sequence number above ``position``, oldest first."""
+    queryset = ClaimChange.objects.filter(id__gt=position).order_by('id')
+    if kinds:
+        queryset = queryset.filter(kind__in=kinds)
+    return list(queryset[:limit])
+
+
+class ChangeConsumer:
+    """A named cursor over the change log for one derived structure.
+
+    ``consume(handler)`` passes batches of new changes to ``handler`` and
+    advances the cursor in the same transaction, so a handler that writes
+    to this database applies each change exactly once.
+    """
+
+    def __init__(self, name, kinds=None):
+        self.name = name
+        self.kinds = kinds
+
+    @property
+    def position(self):
+        return ChangeCursor.objects.filter(name=self.name).values_list('position', flat=True).first() or 0
+
+    def pending(self, limit=500):
+        return changes_after(self.position, limit, self.kinds)
+
+    def lag(self):
+        """Number of changes this consumer has not read yet."""
+        queryset = ClaimChange.objects.filter(id__gt=self.position)
+        if self.kinds:
+            queryset = queryset.filter(kind__in=self.kinds)
+        return queryset.count()
+
+    def advance(self, position):
+        """Move the cursor forward to ``position`` (it never moves back)."""
+        cursor, _ = ChangeCursor.objects.get_or_create(name=self.name)
+        if position > cursor.position:
+            cursor.position = position
+            cursor.save(update_fields=['position', 'updated_at'])
+
+    def reset(self, position=0):
+        ChangeCursor.objects.update_or_create(name=self.name, defaults={'position': position})
+
+    def consume(self, handler, batch_size=500, max_batches=None):
+        """Feed pending changes to ``handler`` in batches; returns how many were handled."""
+        handled = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            with transaction.atomic():
+                cursor, _ = ChangeCursor.objects.select_for_update().get_or_create(name=self.name)
+                batch = changes_after(cursor.position, batch_size, self.kinds)
+                if not batch:
+                    break
+                handler(batch)
+                cursor.position = batch[-1].id
+                cursor.save(update_fields=['position', 'updated_at'])
+            handled += len(batch)
+            batches += 1
+        return handled
+
+
+class ActivityCursor:
+    """Where a consumer has read the flag and note tables of every claim database.
+
+    Flags and notes are not in the change log. Consumers whose output depends on
+    them follow both tables by id as well, with one ``ChangeCursor`` per table
+    and database named ``<consumer>:<table>:<alias>``. Those positions are flag
+    and note ids, so they never count towards the change log's retention
+    (see ``log_cursors()``).
+    """
+
+    MODELS = (Flag, Note)
+
+    def __init__(self, name):
+        self.name = name
+
+    def _cursor_name(self, model, alias):
+        return f'{self.name}:{model._meta.model_name}:{alias or DEFAULT_DB_ALIAS}'
+
+    def latest(self):
+        """{cursor name: highest id now} for every table, to ``save()`` after a full rebuild."""
+        return {
+            self._cursor_name(model, alias):
+                model.objects.using(alias).order_by('-id').values_list('id', flat=True).first() or 0
+            for alias in shards.claim_databases()
+            for model in self.MODELS
+        }
+
+    def claims_since(self):
+        """(ids of claims flagged or noted since the saved positions, the positions to ``save()`` next)."""
+        claim_ids = set()
+        positions = {}
+        for alias in shards.claim_databases():
+            for model in self.MODELS:
+                name = self._cursor_name(model, alias)
+                seen = ChangeCursor.objects.filter(name=name).values_list('position', flat=True).first() or 0
+                rows = list(model.objects.using(alias).filter(id__gt=seen).values_list('id', 'claim_id'))
+                if rows:
+                    claim_ids.update(claim_id for _, claim_id in rows)
+                    positions[name] = max(row_id for row_id, _ in rows)
+        return claim_ids, positions
+
+    def save(self, positions):
+        for name, position in positions.items():
+            ChangeCursor.objects.update_or_create(name=name, defaults={'position': position})
+
+
+def log_cursors():
+    """``ChangeCursor`` rows of change log consumers.
+
+    Activity cursors (``ActivityCursor``) share the table, but their positions
+    are flag and note ids, not sequence numbers, so they are left out.
+    """
+    return ChangeCursor.objects.exclude(name__contains=':')
+
+
+def activity_cursors():
+    """(cursor name, position, highest id of its table) for every ``ActivityCursor`` position."""
+    latest = {
+        f'{model._meta.model_name}:{alias or DEFAULT_DB_ALIAS}':
+            model.objects.using(alias).order_by('-id').values_list('id', flat=True).first() or 0
+        for alias in shards.claim_databases()
+        for model in ActivityCursor.MODELS
+    }
+    return [
+        (cursor.name, cursor.position, latest.get(cursor.name.split(':', 1)[-1]))
+        for cursor in ChangeCursor.objects.filter(name__contains=':').order_by('name')
+    ]
+
+
+def consumer_bounds():
+    """(lowest, highest) change log consumer positions, or (None, None) without consumers."""
+    bounds = log_cursors().aggregate(low=Min('position'), high=Max('position'))
+    return bounds['low'], bounds['high']
+
+
+def prune(before):
+    """Delete changes older than ``before`` that every consumer has read. Returns the count."""
+    low, _ = consumer_bounds()
+    queryset = ClaimChange.objects.filter(created_at__lt=before)
+    if low is not None:
+        queryset = queryset.filter(id__lte=low)
+    deleted, _ = queryset.delete()
+    return deleted
+
+
+def _net_action(first, last):
+    """Single action equivalent to a run of inserts/updates/deletes (None if it cancels out)."""
+    if first == INSERT:
+        return None if last == DELETE else INSERT
+    return DELETE if last == DELETE else UPDATE
+
+
+def compact(before, batch_size=1000):
+    """Collapse unread runs of changes to the same claim/kind older than ``before``.
+
+    Only changes no consumer has read are touched, so no consumer sees part of
+    a run twice. Each run keeps its last sequence number and becomes a single
+    change from the first old values to the last new ones. An insert followed
+    by a delete, or updates that cancel out, disappear. Runs that include an
+    archive or restore are kept as they are. Returns the number of rows removed.
+    """
+    _, high = consumer_bounds()
+    queryset = ClaimChange.objects.filter(created_at__lt=before, id__gt=high or 0).order_by('id')
+    runs = {}
+    for entry in queryset.iterator(chunk_size=batch_size):
+        runs.setdefault((entry.kind, entry.claim_id), []).append(entry)
+
+    removed = 0
+    with transaction.atomic():
+        for run in runs.values():
+            if len(run) == 1 or any(entry.action in (ARCHIVE, RESTORE) for entry in run):
+                continue
+            first, last = run[0], run[-1]
+            old = {field: values[0] for entry in reversed(run) for field, values in entry.changes.items()}
+            new = {field: values[1] for entry in run for field, values in entry.changes.items()}
+            action = _net_action(first.action, last.action)
+            net_changes = diff(old, new)
+            ClaimChange.objects.filter(id__in=[entry.id for entry in run[:-1]]).delete()
+            removed += len(run) - 1
+            if action is None or (action == UPDATE and not net_changes):
+                last.delete()
+                removed += 1
+                continue
+            last.action = action
+            last.changes = net_changes
+            last.save(update_fields=['action', 'changes'])
+    return removed
+
+
+def _kind(sender):
+    return ClaimChange.CLAIM if sender is Claim else ClaimChange.DETAIL
+
+
+def _claim_id(instance):
+    return instance.id if isinstance(instance, Claim) else instance.claim_id
+
+
+def _loaded(kind, instance):
+    loaded = getattr(instance, '_loaded_values', None)
+    if loaded is None:
+        return None
+    meta = MODELS[kind]._meta
+    return {
+        field: value for field, value in tracked_values(kind, loaded).items()
+        if meta.get_field(field).attname in loaded
+    }
+
+
+def _on_save(sender, instance, created, raw=False, **kwargs):
+    if raw or not _recording.get():
+        return
+    kind = _kind(sender)
+    new = tracked_values(kind, instance)
+    if created:
+        record(kind, _claim_id(instance), INSERT, new=new)
+    else:
+        old = _loaded(kind, instance)
+        if old is None or diff(old, new):
+            # Without a loaded snapshot the old values are unknown and recorded as null
+            record(kind, _claim_id(instance), UPDATE, old=old, new=new)
+    # The next save of this instance diffs against what was just written
+    instance._loaded_values = {
+        field.attname: getattr(instance, field.attname)
+        for field in map(MODELS[kind]._meta.get_field, TRACKED_FIELDS[kind])
+    }
+
+
+def _on_delete(sender, instance, **kwargs):
+    if not _recording.get():
+        return
+    kind = _kind(sender)
+    record(kind, _claim_id(instance), DELETE, old=_loaded(kind, instance) or tracked_values(kind, instance))
+
+
+def connect_signals():
+    for model in (Claim, ClaimDetail):
+        post_save.connect(_on_save, sender=model, dispatch_uid=f'database.changes.save.{model.__name__}')
+        post_delete.connect(_on_delete, sender=model, dispatch_uid=f'database.changes.delete.{model.__name__}')
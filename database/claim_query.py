@@ -0,0 +1,189 @@
+"""Server-side sorting and filtering of the dashboard claim table.
+
+``ClaimQuery.from_params(request.GET)`` reads the table's query string:
+
+- ``sort``: one of ``SORTS``, prefixed with ``-`` for descending (default ``id``)
+- ``billed_min``/``billed_max``, ``paid_min``/``paid_max``: inclusive amount ranges
+- ``discharged_from``/``discharged_to``: inclusive discharge date range (YYYY-MM-DD)
+- ``flagged=1``/``has_notes=1``: only claims with a flag / a note
+- ``status``, ``insurer`` and ``cpt``: the existing substring and CPT code filters
+
+Every sort column has an index on the live and archived claim tables (see
+``ClaimFields.Meta``), so a page is read by walking that index instead of
+sorting the whole table, and range filters on the sort column narrow the walk.
+The flagged and has-notes filters are driven from the flag/note ``claim_id``
+indexes. ``manage.py check_query_plans`` runs ``EXPLAIN QUERY PLAN`` over every
+supported sort and filter combination and fails if any of them scans a table.
+"""
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from operator import attrgetter
+
+from django.db.models import F
+
+from . import archive, cpt
+from .models import UNDERPAYMENT_SORT
+
+DEFAULT_SORT = 'id'
+
+# ?sort= value -> (ordering expression, value of a loaded claim it orders by)
+SORTS = {
+    'id': (F('id'), attrgetter('id')),
+    'discharge_date': (F('discharge_date'), attrgetter('discharge_date')),
+    'billed': (F('billed_amount'), attrgetter('billed_amount')),
+    'paid': (F('paid_amount'), attrgetter('paid_amount')),
+    # Claims paid in full or more all show an underpayment of 0 and sort
+    # among themselves by overpayment
+    'underpayment': (UNDERPAYMENT_SORT, lambda claim: claim.billed_amount - claim.paid_amount),
+    'patient_name': (F('patient_name'), attrgetter('patient_name')),
+    # Recovery priority (database/priority.py); descending is the work queue
+    'priority': (F('priority_score'), attrgetter('priority_score')),
+}
+
+SORT_LABELS = {
+    'id': 'Claim ID',
+    'discharge_date': 'Discharge Date',
+    'billed': 'Billed Amount',
+    'paid': 'Paid Amount',
+    'underpayment': 'Underpayment',
+    'patient_name': 'Patient Name',
+    'priority': 'Recovery Priority',
+}
+
+# ?param= -> (lookup, parser)
+RANGE_FILTERS = {
+    'billed_min': ('billed_amount__gte', Decimal),
+    'billed_max': ('billed_amount__lte', Decimal),
+    'paid_min': ('paid_amount__gte', Decimal),
+    'paid_max': ('paid_amount__lte', Decimal),
+    'discharged_from': ('discharge_date__gte', date.fromisoformat),
+    'discharged_to': ('discharge_date__lte', date.fromisoformat),
+}
+
+# ?param=1 -> related name of the rows a claim must have
+PRESENCE_FILTERS = {
+    'flagged': 'flags',
+    'has_notes': 'notes',
+}
+
+
+def _parse_range(name, value):
+    lookup, parse = RANGE_FILTERS[name]
+    try:
+        parsed = parse(value)
+    except (InvalidOperation, ValueError):
+        raise ValueError(f'{name} must be a {"date (YYYY-MM-DD)" if parse is date.fromisoformat else "number"}')
+    if isinstance(parsed, Decimal) and not parsed.is_finite():
+        raise ValueError(f'{name} must be a number')
+    return parsed
+
+
+class ClaimQuery:
+    """Filters and sort order for a listing of claims, live and optionally archived."""
+
+    def __init__(self, status='', insurer='', cpt_code='', ranges=None, flagged=False, has_notes=False,
+                 sort=DEFAULT_SORT, descending=False):
+        if sort not in SORTS:
+            raise ValueError(f'sort must be one of: {", ".join(SORTS)}')
+        self.status = status
+        self.insurer = insurer
+        self.cpt_code = cpt_code.strip()
+        self.ranges = dict(ranges or {})
+        self.flagged = flagged
+        self.has_notes = has_notes
+        self.sort = sort
+        self.descending = descending
+
+    @classmethod
+    def from_params(cls, params, strict=True):
+        """Build from a query dict. Invalid values raise ValueError, or are dropped when not ``strict``."""
+        sort = params.get('sort') or DEFAULT_SORT
+        descending = sort.startswith('-')
+        sort = sort.lstrip('-')
+        if sort not in SORTS:
+            if strict:
+                raise ValueError(f'sort must be one of: {", ".join(SORTS)}')
+            sort, descending = DEFAULT_SORT, False
+        ranges = {}
+        for name in RANGE_FILTERS:
+            value = (params.get(name) or '').strip()
+            if not value:
+                continue
+            try:
+                ranges[name] = _parse_range(name, value)
+            except ValueError:
+                if strict:
+                    raise
+        return cls(
+            status=params.get('status') or '',
+            insurer=params.get('insurer') or '',
+            cpt_code=params.get('cpt') or '',
+            ranges=ranges,
+            flagged=params.get('flagged') == '1',
+            has_notes=params.get('has_notes') == '1',
+            sort=sort,
+            descending=descending,
+        )
+
+    def params(self):
+        """The sort and range/presence filters as query parameters (defaults omitted).
+
+        ``status``, ``insurer`` and ``cpt`` are left out: the dashboard sends
+        those from its own controls.
+        """
+        params = {name: value.isoformat() if isinstance(value, date) else str(value)
+                  for name, value in self.ranges.items()}
+        for name in PRESENCE_FILTERS:
+            if getattr(self, name):
+                params[name] = '1'
+        if self.sort != DEFAULT_SORT or self.descending:
+            params['sort'] = f'{"-" if self.descending else ""}{self.sort}'
+        return params
+
+    def spec(self):
+        """Every filter as query parameters, without the sort order: what a saved filter stores."""
+        spec = {name: value for name, value in self.params().items() if name != 'sort'}
+        for name, value in (('status', self.status), ('insurer', self.insurer), ('cpt', self.cpt_code)):
+            if value:
+                spec[name] = value
+        return spec
+
+    def filters(self):
+        """Filter kwargs shared by the live and archived claim models."""
+        filters = {}
+        if self.status:
+            filters['status__icontains'] = self.status
+        if self.insurer:
+            filters['insurer_name__icontains'] = self.insurer
+        if self.cpt_code:
+            # Exact code match through the (code, claim) index, not a LIKE over cpt_codes
+            filters.update(cpt.claim_code_filter(self.cpt_code))
+        for name, value in self.ranges.items():
+            filters[RANGE_FILTERS[name][0]] = value
+        return filters
+
+    def ordering(self):
+        expression = SORTS[self.sort][0]
+        if self.sort == 'id':
+            return [expression.desc() if self.descending else expression.asc()]
+        # Claim id breaks ties; the index already holds entries in that order
+        if self.descending:
+            return [expression.desc(), F('id').desc()]
+        return [expression.asc(), F('id').asc()]
+
+    def sort_key(self, claim):
+        """Merge key of a loaded claim that agrees with ``ordering()`` (reverse it when descending)."""
+        return SORTS[self.sort][1](claim), claim.id
+
+    def querysets(self, include_archived=False):
+        """Ordered querysets over live claims, followed by archived ones when asked for."""
+        querysets = []
+        for queryset in archive.claim_querysets(include_archived, **self.filters()):
+            for name, related_name in PRESENCE_FILTERS.items():
+                if getattr(self, name):
+                    # IN (SELECT claim_id ...) reads the flag/note index once, and
+                    # unlike a join it doesn't repeat claims with several rows
+                    related_model = queryset.model._meta.get_field(related_name).related_model
+                    queryset = queryset.filter(id__in=related_model.objects.values('claim_id'))
+            querysets.append(queryset.order_by(*self.ordering()))
+        return querysets
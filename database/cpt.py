@@ -0,0 +1,77 @@
+"""CPT code catalog and claim/code index.
+
+``ClaimDetail.cpt_codes`` keeps the comma-joined codes as imported; each code
+is also stored once in ``CptCode`` and linked to its claims through
+``ClaimCptCode``, indexed on (code, claim). Looking up the claims that billed
+a code, or totals per code (``backend.stats.cpt_code_stats()``), then uses the
+index instead of a ``LIKE`` scan that would also match longer codes
+(``99204`` inside ``992040``).
+
+The importer and synthetic seeding keep the links in step in bulk with
+``sync_claim_codes()``, archiving moves them with their claims, and ``manage.py rebuild_cpt_index`` rebuilds them
+from the detail rows. With sharded claims the catalog lives on the default
+database and each code is copied into the shards whose links use it.
+"""
+from . import shards
+from .models import ClaimCptCode, CptCode
+
+# Largest batch of claims whose links are replaced in one round of queries
+SYNC_BATCH_SIZE = 500
+
+
+def parse_cpt_codes(value):
+    """Distinct codes in a comma-joined ``cpt_codes`` value, in order of appearance."""
+    codes = (code.strip().upper() for code in (value or '').split(','))
+    return list(dict.fromkeys(code for code in codes if code))
+
+
+class CodeCatalog:
+    """In-memory code -> id map that creates unknown codes in bulk.
+
+    One instance lives for the length of an import, so each code costs one
+    lookup the first time it is seen and none after that.
+    """
+
+    def __init__(self):
+        self._ids = None
+        self._copied = {}
+
+    def ids(self, codes):
+        if self._ids is None:
+            self._ids = dict(CptCode.objects.values_list('code', 'id'))
+        unknown = {code for code in codes if code not in self._ids}
+        if unknown:
+            CptCode.objects.bulk_create([CptCode(code=code) for code in sorted(unknown)], ignore_conflicts=True)
+            self._ids.update(CptCode.objects.filter(code__in=unknown).values_list('code', 'id'))
+        ids = {code: self._ids[code] for code in codes}
+        shards.copy_lookups(CptCode, {code_id: code for code, code_id in ids.items()}, 'code', self._copied)
+        return ids
+
+
+def sync_claim_codes(cpt_codes_by_claim, catalog=None, model=ClaimCptCode):
+    """Replace the code links of the given claims ({claim_id: cpt_codes string}).
+
+    Claims mapped to an empty value lose their links. ``model`` is
+    ``ArchivedClaimCptCode`` for archived claims. Returns the number of links
+    written.
+    """
+    catalog = catalog or CodeCatalog()
+    items = list(cpt_codes_by_claim.items())
+    written = 0
+    for start in range(0, len(items), SYNC_BATCH_SIZE):
+        batch = items[start:start + SYNC_BATCH_SIZE]
+        parsed = {claim_id: parse_cpt_codes(value) for claim_id, value in batch}
+        code_ids = catalog.ids({code for codes in parsed.values() for code in codes})
+        model.objects.filter(claim_id__in=parsed).delete()
+        links = [
+            model(claim_id=claim_id, code_id=code_ids[code])
+            for claim_id, codes in parsed.items() for code in codes
+        ]
+        model.objects.bulk_create(links)
+        written += len(links)
+    return written
+
+
+def claim_code_filter(code):
+    """Filter kwargs selecting claims (live or archived) that billed ``code``."""
+    return {'cpt_links__code__code': code.strip().upper()}
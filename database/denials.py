@@ -0,0 +1,57 @@
+"""Dictionary-encoded denial reasons.
+
+Claim details cite the same couple of dozen denial sentences over and over, so
+each sentence is stored once in ``DenialReason`` and details reference it by
+id. Storage per detail drops to an integer and grouping by reason is an
+integer GROUP BY. Writers resolve text to ids through a ``ReasonCatalog``;
+``reason_text()`` maps ids back for the change log.
+
+Reasons are created on the default database; with sharded claims the catalog
+also copies each reason it hands out into the shard being written.
+"""
+from . import shards
+from .models import DenialReason
+
+# id -> text for every reason seen by this process; reasons are never edited or deleted
+_texts = {}
+
+
+def normalize(text):
+    """Reason text as stored, or '' for no reason (the import files use 'N/A')."""
+    text = (text or '').strip()
+    return '' if text == 'N/A' else text
+
+
+class ReasonCatalog:
+    """In-memory text -> id map that creates unseen reasons on first use.
+
+    One instance lives for the length of an import or seeding run, so a
+    reason costs one query the first time it appears and none after that.
+    """
+
+    def __init__(self):
+        self._ids = None
+        self._copied = {}
+
+    def id_for(self, text):
+        """Id of the reason ``text``, or None when there is no reason."""
+        text = normalize(text)
+        if not text:
+            return None
+        if self._ids is None:
+            self._ids = dict(DenialReason.objects.values_list('text', 'id'))
+        if text not in self._ids:
+            reason, _ = DenialReason.objects.get_or_create(text=text)
+            self._ids[text] = reason.id
+            _texts[reason.id] = text
+        shards.copy_lookups(DenialReason, {self._ids[text]: text}, 'text', self._copied)
+        return self._ids[text]
+
+
+def reason_text(reason_id):
+    """Text of a reason id ('' for None)."""
+    if reason_id is None:
+        return ''
+    if reason_id not in _texts:
+        _texts.update(DenialReason.objects.values_list('id', 'text'))
+    return _texts.get(reason_id, '')
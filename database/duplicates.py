@@ -0,0 +1,417 @@
+"""Duplicate-claim detection with blocking keys.
+
+A payer resubmission arrives as a new claim id with the same patient,
+discharge date and amounts as the original. Comparing every pair of claims is
+quadratic, so each live claim gets a few blocking keys (``DuplicateKey``) and
+only claims that share a key are compared:
+
+- name: the normalized patient name (case, punctuation and word order
+  ignored) plus the discharge date
+- amount: the discharge date, the billed amount's bucket (buckets are
+  ``DUPLICATE_AMOUNT_BUCKET`` wide, relative to the amount) and a hash of the
+  claim's set of CPT codes, which catches resubmissions with the name
+  misspelled. Each claim gets a key on two bucket grids offset by half a
+  bucket, so amounts within half a bucket of each other always share one.
+
+Pairs scoring at least ``DUPLICATE_MIN_SIMILARITY`` (a weighted mix of name,
+billed, paid and CPT code similarity, ``DUPLICATE_WEIGHTS``) are stored as
+``DuplicatePair`` rows, and the claims they connect as ``DuplicateGroup``
+rows, on the claims' shard. Resubmissions come from the same payer, so they
+land on the same shard as the original and shards are checked separately.
+Blocks larger than ``DUPLICATE_MAX_BLOCK_SIZE`` (a placeholder patient name,
+say) are skipped rather than compared pair by pair.
+
+``detect_changed()`` follows the claim change log with the ``duplicates``
+consumer: it rebuilds the keys of the claims that changed and compares them
+with the rest of their blocks only. ``load_claims`` runs it after every
+import, so keys are built as claims come in. ``detect_all()`` rebuilds
+everything in one pass over the claims and one over the key index.
+"""
+import hashlib
+import math
+import re
+import zlib
+from collections import defaultdict
+from decimal import Decimal
+from difflib import SequenceMatcher
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Count, F, Sum, Window
+
+from . import changes, cpt, shards
+from .models import ChangeCursor, Claim, DuplicateGroup, DuplicateKey, DuplicatePair
+
+CONSUMER = 'duplicates'
+
+# A resubmission of a denied or underpaid claim is usually paid differently
+# from the original, so the paid amount counts for little
+DEFAULT_WEIGHTS = {
+    'name': 0.45,
+    'billed': 0.35,
+    'paid': 0.05,
+    'cpt_codes': 0.15,
+}
+
+CLAIM_COLUMNS = ['id', 'patient_name', 'discharge_date', 'billed_amount', 'paid_amount', 'detail__cpt_codes']
+
+_NON_WORD = re.compile(r'[^\w]+')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def normalize_name(name):
+    """Patient name with case, punctuation and word order ignored: "Smith, John" == "JOHN SMITH"."""
+    return ' '.join(sorted(_NON_WORD.sub(' ', (name or '').casefold()).split()))
+
+
+def _key(*parts):
+    """Signed 64-bit hash of the parts, to fit a BigIntegerField."""
+    digest = hashlib.blake2b('|'.join(map(str, parts)).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+class Fingerprint:
+    """What two claims are compared on, read from one row of ``CLAIM_COLUMNS``."""
+
+    __slots__ = ('claim_id', 'name', 'discharge_date', 'billed', 'paid', 'codes')
+
+    def __init__(self, claim_id, patient_name, discharge_date, billed, paid, cpt_codes):
+        self.claim_id = claim_id
+        self.name = normalize_name(patient_name)
+        self.discharge_date = discharge_date
+        self.billed = float(billed)
+        self.paid = float(paid)
+        self.codes = frozenset(cpt.parse_cpt_codes(cpt_codes))
+
+
+def _amount_similarity(a, b):
+    larger = max(abs(a), abs(b))
+    return 1.0 - abs(a - b) / larger if larger else 1.0
+
+
+class Matcher:
+    """Blocking keys and pair similarity for one snapshot of the settings."""
+
+    def __init__(self):
+        self.weights = {**DEFAULT_WEIGHTS, **_setting('DUPLICATE_WEIGHTS', {})}
+        self.total_weight = sum(self.weights.values())
+        self.threshold = _setting('DUPLICATE_MIN_SIMILARITY', 0.9)
+        self.bucket_base = math.log1p(_setting('DUPLICATE_AMOUNT_BUCKET', 0.05))
+        self.max_block_size = _setting('DUPLICATE_MAX_BLOCK_SIZE', 200)
+
+    def amount_buckets(self, amount):
+        """The amount's bucket on each of the two grids."""
+        position = math.log(amount) / self.bucket_base if amount >= 1 else 0.0
+        return int(position), int(position + 0.5)
+
+    def keys(self, fingerprint):
+        # str(): dates come back from a plain SQLite cursor as text
+        day = str(fingerprint.discharge_date)
+        codes = zlib.crc32(','.join(sorted(fingerprint.codes)).encode('utf-8'))
+        bucket, offset_bucket = self.amount_buckets(fingerprint.billed)
+        return {
+            _key('name', fingerprint.name, day),
+            _key('amount', day, bucket, codes),
+            _key('amount-offset', day, offset_bucket, codes),
+        }
+
+    def similarity(self, a, b):
+        """Weighted similarity of two fingerprints, 0-1; 0 when it can't reach the threshold.
+
+        The name ratio is the expensive part, so it is only worked out when the
+        cheap components leave the pair able to reach the threshold.
+        """
+        weights = self.weights
+        union = a.codes | b.codes
+        score = (
+            weights['billed'] * _amount_similarity(a.billed, b.billed)
+            + weights['paid'] * _amount_similarity(a.paid, b.paid)
+            + weights['cpt_codes'] * (len(a.codes & b.codes) / len(union) if union else 1.0)
+        )
+        if (score + weights['name']) / self.total_weight < self.threshold:
+            return 0.0
+        if a.name != b.name:
+            score += weights['name'] * SequenceMatcher(None, a.name, b.name).ratio()
+        else:
+            score += weights['name']
+        score /= self.total_weight
+        return round(score, 4) if score >= self.threshold else 0.0
+
+    def compare(self, block, found, only=None):
+        """Add every pair of fingerprints in ``block`` that scores high enough to ``found``.
+
+        With ``only``, pairs in which neither claim id is in ``only`` are skipped.
+        """
+        for i, a in enumerate(block):
+            for b in block[i + 1:]:
+                if only is not None and a.claim_id not in only and b.claim_id not in only:
+                    continue
+                pair = (a.claim_id, b.claim_id) if a.claim_id < b.claim_id else (b.claim_id, a.claim_id)
+                if pair in found:
+                    continue
+                score = self.similarity(a, b)
+                if score:
+                    found[pair] = score
+
+
+def _fetch(queryset):
+    """Rows of a ``values_list()`` queryset, fetched on a plain cursor.
+
+    Django's per-row converters cost more than the query at a million claims
+    (see import_diff.scan_table()).
+    """
+    sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def fingerprints(claim_ids, batch_size):
+    """{claim id: Fingerprint} of the live claims among ``claim_ids`` in the current database."""
+    claim_ids = sorted(claim_ids)
+    result = {}
+    for start in range(0, len(claim_ids), batch_size):
+        queryset = Claim.objects.filter(id__in=claim_ids[start:start + batch_size]).values_list(*CLAIM_COLUMNS)
+        for row in _fetch(queryset):
+            result[row[0]] = Fingerprint(*row)
+    return result
+
+
+def _insert_keys(rows):
+    """Insert (key, claim id) rows with one executemany in one transaction.
+
+    Building a model instance per key for bulk_create() costs more than the
+    insert when every claim is keyed.
+    """
+    alias = router.db_for_write(DuplicateKey)
+    connection = connections[alias]
+    table = connection.ops.quote_name(DuplicateKey._meta.db_table)
+    columns = ', '.join(connection.ops.quote_name(column) for column in ('key', 'claim_id'))
+    with transaction.atomic(using=alias), connection.cursor() as cursor:
+        cursor.executemany(f'INSERT INTO {table} ({columns}) VALUES (%s, %s)', rows)
+
+
+def shared_keys(max_block_size):
+    """Keys shared by more than one claim and at most ``max_block_size``, as a subquery."""
+    return (
+        DuplicateKey.objects.order_by().values('key').annotate(size=Count('id'))
+        .filter(size__gt=1, size__lte=max_block_size).values('key')
+    )
+
+
+def _block_rows(keys):
+    """(key, *CLAIM_COLUMNS) of the live claims holding ``keys``, ordered by key."""
+    return (
+        DuplicateKey.objects.filter(key__in=keys).order_by('key', 'claim_id')
+        .values_list('key', 'claim_id', *(f'claim__{column}' for column in CLAIM_COLUMNS[1:]))
+    )
+
+
+def _write_pairs(found, batch_size):
+    DuplicatePair.objects.bulk_create(
+        [
+            DuplicatePair(claim_id=claim_id, other_claim_id=other_id, similarity=score)
+            for (first, second), score in found.items()
+            for claim_id, other_id in ((first, second), (second, first))
+        ],
+        batch_size=batch_size,
+    )
+
+
+def regroup(batch_size=None):
+    """Rebuild the current database's ``DuplicateGroup`` rows from its pairs; returns the number of groups."""
+    batch_size = batch_size or _setting('DUPLICATE_BATCH_SIZE', 1000)
+    parent = {}
+
+    def root(claim_id):
+        while parent[claim_id] != claim_id:
+            parent[claim_id] = parent[parent[claim_id]]
+            claim_id = parent[claim_id]
+        return claim_id
+
+    best = {}
+    for claim_id, other_id, score in (
+        DuplicatePair.objects.filter(claim_id__lt=F('other_claim_id'))
+        .values_list('claim_id', 'other_claim_id', 'similarity').iterator(chunk_size=batch_size)
+    ):
+        parent.setdefault(claim_id, claim_id)
+        parent.setdefault(other_id, other_id)
+        first, second = root(claim_id), root(other_id)
+        if first != second:
+            parent[max(first, second)] = min(first, second)
+        best[claim_id] = max(best.get(claim_id, 0.0), score)
+        best[other_id] = max(best.get(other_id, 0.0), score)
+
+    members = defaultdict(list)
+    for claim_id in parent:
+        members[root(claim_id)].append(claim_id)
+    claim_ids = sorted(parent)
+    claims = {}
+    for start in range(0, len(claim_ids), batch_size):
+        claims.update(
+            (row[0], row) for row in Claim.objects.filter(id__in=claim_ids[start:start + batch_size])
+            .values_list('id', 'patient_name', 'discharge_date', 'billed_amount')
+        )
+
+    groups = []
+    for ids in members.values():
+        rows = [claims[claim_id] for claim_id in sorted(ids) if claim_id in claims]
+        if len(rows) < 2:
+            continue
+        billed = [row[3] for row in rows]
+        groups.append(DuplicateGroup(
+            claim_ids=[row[0] for row in rows],
+            size=len(rows),
+            score=max(best[row[0]] for row in rows),
+            patient_name=rows[0][1],
+            discharge_date=rows[0][2],
+            billed_amount=sum(billed, Decimal(0)),
+            excess_billed=sum(billed, Decimal(0)) - max(billed),
+        ))
+    with transaction.atomic(using=shards.write_alias()):
+        DuplicateGroup.objects.all().delete()
+        DuplicateGroup.objects.bulk_create(groups, batch_size=batch_size)
+    return len(groups)
+
+
+def _rebuild_here(matcher, batch_size, progress):
+    """detect_all() on the current database; returns (claims keyed, pairs found, groups)."""
+    with transaction.atomic(using=shards.write_alias()):
+        DuplicatePair.objects.all().delete()
+        DuplicateKey.objects.all().delete()
+
+    # Pass 1: key every live claim, walking the claims by id; keys are written
+    # ten batches per transaction
+    keyed = 0
+    last_id = 0
+    pending = []
+    while True:
+        rows = _fetch(Claim.objects.filter(id__gt=last_id).order_by('id').values_list(*CLAIM_COLUMNS)[:batch_size])
+        pending.extend((key, row[0]) for row in rows for key in matcher.keys(Fingerprint(*row)))
+        if pending and (not rows or len(pending) >= batch_size * 10):
+            _insert_keys(pending)
+            pending = []
+        if not rows:
+            break
+        keyed += len(rows)
+        last_id = rows[-1][0]
+        if progress:
+            progress('keyed', keyed)
+
+    # Pass 2: one scan of the keys shared by 2 to DUPLICATE_MAX_BLOCK_SIZE
+    # claims, joined to their claims in key order, so consecutive rows with
+    # the same key are a block
+    found = {}
+    block = []
+    current_key = None
+    for key, *row in _block_rows(shared_keys(matcher.max_block_size)).iterator(chunk_size=batch_size):
+        if key != current_key:
+            matcher.compare(block, found)
+            block = []
+            current_key = key
+        block.append(Fingerprint(*row))
+    matcher.compare(block, found)
+
+    _write_pairs(found, batch_size)
+    if progress:
+        progress('compared', len(found))
+    return keyed, len(found), regroup(batch_size)
+
+
+def _add_up(results):
+    return tuple(map(sum, zip(*results))) if results else (0, 0, 0)
+
+
+def detect_all(batch_size=None, progress=None):
+    """Rebuild every key, pair and group and mark the change log as read; returns (claims keyed, pairs, groups).
+
+    ``progress(stage, count)`` is called as claims are keyed and when the
+    comparisons are done.
+    """
+    batch_size = batch_size or _setting('DUPLICATE_BATCH_SIZE', 1000)
+    position = changes.latest_sequence()
+    result = _add_up(shards.fan_out(_rebuild_here, Matcher(), batch_size, progress))
+    changes.ChangeConsumer(CONSUMER).reset(position)
+    return result
+
+
+def _update_here(matcher, claim_ids, batch_size):
+    """Re-key ``claim_ids`` on the current database and compare them with their blocks; returns pairs found."""
+    claim_ids = sorted(claim_ids)
+    live = fingerprints(claim_ids, batch_size)
+    keys = {claim_id: matcher.keys(fingerprint) for claim_id, fingerprint in live.items()}
+    with transaction.atomic(using=shards.write_alias()):
+        for start in range(0, len(claim_ids), batch_size):
+            batch = claim_ids[start:start + batch_size]
+            DuplicateKey.objects.filter(claim_id__in=batch).delete()
+            DuplicatePair.objects.filter(claim_id__in=batch).delete()
+            DuplicatePair.objects.filter(other_claim_id__in=batch).delete()
+        _insert_keys([(key, claim_id) for claim_id, claim_keys in keys.items() for key in claim_keys])
+
+        blocks = defaultdict(list)
+        all_keys = sorted({key for claim_keys in keys.values() for key in claim_keys})
+        for start in range(0, len(all_keys), batch_size):
+            for key, *row in _block_rows(all_keys[start:start + batch_size]):
+                blocks[key].append(Fingerprint(*row))
+
+        found = {}
+        for block in blocks.values():
+            if len(block) <= matcher.max_block_size:
+                matcher.compare(block, found, only=live)
+        _write_pairs(found, batch_size)
+    return len(found)
+
+
+def detect_changed(batch_size=None):
+    """Re-check the claims changed since the last run against their blocks; returns (claims checked, pairs, groups).
+
+    Groups are then rebuilt from the pairs. The first run, when the consumer
+    has no cursor yet, runs ``detect_all()``.
+    """
+    if not ChangeCursor.objects.filter(name=CONSUMER).exists():
+        return detect_all(batch_size)
+    batch_size = batch_size or _setting('DUPLICATE_BATCH_SIZE', 1000)
+    matcher = Matcher()
+    totals = [0, 0]
+
+    def update(batch):
+        claim_ids = {change.claim_id for change in batch}
+        totals[0] += len(claim_ids)
+        totals[1] += sum(shards.fan_out(_update_here, matcher, claim_ids, batch_size))
+    if not changes.ChangeConsumer(CONSUMER).consume(update, batch_size=batch_size):
+        return 0, 0, 0
+    groups = sum(shards.fan_out(regroup, batch_size))
+    return totals[0], totals[1], groups
+
+
+def candidates(claim):
+    """Pairs of ``claim`` with the live claims that may be its duplicates, most similar first.
+
+    One query, on the database ``claim`` was read from; ``other_claim`` is joined in.
+    """
+    return (
+        DuplicatePair.objects.using(claim._state.db).filter(claim_id=claim.pk)
+        .select_related('other_claim').order_by('-similarity', 'other_claim_id')
+    )
+
+
+def top_groups(limit):
+    """The ``limit`` highest-scoring groups on the current database, each with the database's totals.
+
+    The totals ride along as window aggregates, so it is a single query.
+    """
+    return (
+        DuplicateGroup.objects.annotate(
+            group_count=Window(Count('id')),
+            claim_count=Window(Sum('size')),
+            excess_total=Window(Sum('excess_billed')),
+        )
+        .order_by('-score', 'id')
+        .values(
+            'claim_ids', 'size', 'score', 'patient_name', 'discharge_date', 'billed_amount', 'excess_billed',
+            'group_count', 'claim_count', 'excess_total',
+        )[:limit]
+    )
@@ -0,0 +1,398 @@
+"""Bulk diff of a claim list file against the current claims, for import previews.
+
+Both sides are reduced to parallel arrays sorted by claim id: the id and a hash
+of the row's columns, plus the byte offset of each line for the file. The
+database normalizes amounts to cents and dates to text in the query, so its
+rows hash like parsed file rows without per-row model conversion. Merge walks
+against the live and archive tables then classify every claim as new, changed
+or unchanged, and find claims that are missing from the file. Field-level
+changes are only worked out for the rows a preview page shows, by re-reading
+those lines and claims.
+
+Archived claims count as existing: importing one restores and updates it
+(see database/archive.py), so they are diffed like live claims. With sharded
+claims each shard's table is scanned and the sorted arrays are merged.
+"""
+import csv
+import heapq
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from array import array
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import BigIntegerField, CharField, F
+from django.db.models.functions import Cast, Round
+
+from . import shards
+from .models import ArchivedClaim, Claim
+
+COLUMNS = ('patient_name', 'billed_amount', 'paid_amount', 'status', 'insurer_name', 'discharge_date')
+AMOUNT_COLUMNS = ('billed_amount', 'paid_amount')
+CATEGORIES = ('new', 'changed', 'missing', 'restored')
+MAX_ERROR_SAMPLES = 20
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _cents(value):
+    return round(float(value) * 100)
+
+
+def _row_key(values):
+    """Comparable form of a row's columns; amounts compare in cents so 100, 100.0 and 100.00 match."""
+    name, billed, paid, status, insurer, discharged = values
+    return (name, _cents(billed), _cents(paid), status, insurer, str(discharged))
+
+
+def _display(column, value):
+    if column in AMOUNT_COLUMNS:
+        return f'{Decimal(str(value)):.2f}'
+    return str(value)
+
+
+class ImportDiff:
+    """Claims a list file would add or change, as id arrays plus per-category counts."""
+
+    def __init__(self, path):
+        self.path = path
+        self.new = array('q')
+        self.changed = array('q')
+        self.missing = array('q')
+        self.restored = array('q')
+        self.unchanged = 0
+        self.file_rows = 0
+        self.duplicates = 0
+        self.errors = []
+        self.error_count = 0
+        self.seconds = 0.0
+        # Byte offset of the line each new/changed id was read from
+        self.offsets = {}
+
+    def summary(self):
+        return {
+            'file_rows': self.file_rows,
+            'new': len(self.new),
+            'changed': len(self.changed),
+            'unchanged': self.unchanged,
+            'missing': len(self.missing),
+            'restored': len(self.restored),
+            'duplicates': self.duplicates,
+            'errors': self.error_count,
+            'error_samples': self.errors,
+            'seconds': round(self.seconds, 2),
+        }
+
+    def read_lines(self, ids):
+        """File values of the given new/changed ids, keyed by id."""
+        rows = {}
+        with open(self.path, 'rb') as f:
+            columns = _header_columns(f.readline())
+            for claim_id in ids:
+                f.seek(self.offsets[claim_id])
+                fields = _split(f.readline().decode('utf-8').rstrip('\r\n'))
+                rows[claim_id] = {column: fields[columns[column]] for column in COLUMNS}
+        return rows
+
+    def page(self, category, page=1, per_page=50):
+        """One page of a category with field-level changes, for the upload preview."""
+        ids = getattr(self, category)
+        start = (page - 1) * per_page
+        page_ids = list(ids[start:start + per_page])
+        current = _current_rows(page_ids) if category != 'new' else {}
+        incoming = self.read_lines(page_ids) if category in ('new', 'changed') else {}
+        rows = []
+        for claim_id in page_ids:
+            old = current.get(claim_id, {})
+            new = incoming.get(claim_id, {})
+            row = {'id': claim_id, 'archived': old.get('archived', False)}
+            if category == 'changed':
+                old_key = _row_key([old[column] for column in COLUMNS])
+                new_key = _row_key([new[column] for column in COLUMNS])
+                row['changes'] = {
+                    column: [_display(column, old[column]), _display(column, new[column])]
+                    for index, column in enumerate(COLUMNS) if old_key[index] != new_key[index]
+                }
+            else:
+                values = new if category == 'new' else old
+                row['values'] = {column: _display(column, values[column]) for column in COLUMNS}
+            rows.append(row)
+        return {
+            'category': category,
+            'page': page,
+            'per_page': per_page,
+            'total': len(ids),
+            'has_more': start + per_page < len(ids),
+            'rows': rows,
+        }
+
+    def save(self, directory):
+        with open(os.path.join(directory, 'diff.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'path': self.path,
+                'unchanged': self.unchanged,
+                'file_rows': self.file_rows,
+                'duplicates': self.duplicates,
+                'errors': self.errors,
+                'error_count': self.error_count,
+                'seconds': self.seconds,
+            }, f)
+        for name in ('new', 'changed', 'missing', 'restored'):
+            with open(os.path.join(directory, f'{name}.bin'), 'wb') as f:
+                getattr(self, name).tofile(f)
+        offsets = array('q')
+        for claim_id in self.new + self.changed:
+            offsets.extend((claim_id, self.offsets[claim_id]))
+        with open(os.path.join(directory, 'offsets.bin'), 'wb') as f:
+            offsets.tofile(f)
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, 'diff.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        diff = cls(meta['path'])
+        diff.unchanged = meta['unchanged']
+        diff.file_rows = meta['file_rows']
+        diff.duplicates = meta['duplicates']
+        diff.errors = meta['errors']
+        diff.error_count = meta['error_count']
+        diff.seconds = meta['seconds']
+        for name in ('new', 'changed', 'missing', 'restored', 'offsets'):
+            values = array('q')
+            path = os.path.join(directory, f'{name}.bin')
+            with open(path, 'rb') as f:
+                values.frombytes(f.read())
+            if name == 'offsets':
+                diff.offsets = dict(zip(values[::2], values[1::2]))
+            else:
+                setattr(diff, name, values)
+        return diff
+
+
+def _header_columns(header):
+    names = header.decode('utf-8').strip().split('|')
+    missing = {'id', *COLUMNS} - set(names)
+    if missing:
+        raise ValueError(f'Claim list file is missing columns: {", ".join(sorted(missing))}')
+    return {name: index for index, name in enumerate(names)}
+
+
+def _split(text):
+    # Quoted fields are rare; only they need the csv module
+    if '"' in text:
+        return next(csv.reader([text], delimiter='|'))
+    return text.split('|')
+
+
+def scan_file(path, diff):
+    """Sorted (ids, hashes, offsets) arrays for a claim list file; the last row wins for a repeated id."""
+    ids = array('q')
+    hashes = array('q')
+    offsets = array('q')
+    # The loop runs once per row of million-row files, so it is kept flat
+    # and its lookups bound to locals
+    add_id, add_hash, add_offset = ids.append, hashes.append, offsets.append
+    parse_date = date.fromisoformat
+    with open(path, 'rb') as f:
+        header = f.readline()
+        columns = _header_columns(header)
+        i_id, i_name, i_billed, i_paid, i_status, i_insurer, i_date = (
+            columns[column] for column in ('id', *COLUMNS)
+        )
+        offset = len(header)
+        line_number = 1
+        for line in f:
+            line_number += 1
+            line_offset = offset
+            offset += len(line)
+            text = line.decode('utf-8').rstrip('\r\n')
+            if not text:
+                continue
+            fields = _split(text)
+            try:
+                claim_id = int(fields[i_id])
+                discharged = fields[i_date]
+                parse_date(discharged)
+                row_hash = hash((
+                    fields[i_name], round(float(fields[i_billed]) * 100), round(float(fields[i_paid]) * 100),
+                    fields[i_status], fields[i_insurer], discharged,
+                ))
+            except (ValueError, IndexError):
+                diff.error_count += 1
+                if len(diff.errors) < MAX_ERROR_SAMPLES:
+                    diff.errors.append(f'Row {line_number}: {text[:120]}')
+                continue
+            add_id(claim_id)
+            add_hash(row_hash)
+            add_offset(line_offset)
+    diff.file_rows = len(ids)
+
+    if any(a >= b for a, b in zip(ids, ids[1:])):
+        # Stable sort keeps repeated ids in file order, so the last one wins below
+        order = sorted(range(len(ids)), key=ids.__getitem__)
+        order = [i for n, i in enumerate(order) if n + 1 == len(order) or ids[i] != ids[order[n + 1]]]
+        diff.duplicates = len(ids) - len(order)
+        ids = array('q', (ids[i] for i in order))
+        hashes = array('q', (hashes[i] for i in order))
+        offsets = array('q', (offsets[i] for i in order))
+    return ids, hashes, offsets
+
+
+def _fingerprint_queryset(model):
+    """Rows of ``model`` in id order, normalized by the database the way scan_file() normalizes the file."""
+    return model.objects.order_by('id').annotate(
+        billed_cents=Cast(Round(F('billed_amount') * 100), BigIntegerField()),
+        paid_cents=Cast(Round(F('paid_amount') * 100), BigIntegerField()),
+        discharged=Cast('discharge_date', CharField()),
+    ).values_list('id', 'patient_name', 'billed_cents', 'paid_cents', 'status', 'insurer_name', 'discharged')
+
+
+def scan_table(model, using=None, min_id=None, max_id=None):
+    """Sorted (ids, hashes) arrays for a claim table.
+
+    Runs the compiled query on a plain cursor: Django's per-row converters
+    cost more than the scan itself at a million rows.
+    """
+    queryset = _fingerprint_queryset(model)
+    if min_id is not None:
+        queryset = queryset.filter(id__gte=min_id, id__lte=max_id)
+    using = using or router.db_for_read(model)
+    sql, params = queryset.query.get_compiler(using).as_sql()
+    ids = array('q')
+    hashes = array('q')
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, params)
+        while rows := cursor.fetchmany(10000):
+            ids.extend([row[0] for row in rows])
+            hashes.extend([hash(row[1:]) for row in rows])
+    return ids, hashes
+
+
+def scan_tables(model, using=None, min_id=None, max_id=None):
+    """scan_table() of every shard merged into one pair of id-sorted arrays (just ``using`` when given)."""
+    if using is not None or not shards.is_sharded():
+        return scan_table(model, using, min_id, max_id)
+    scans = [scan_table(model, alias, min_id, max_id) for alias in shards.shard_aliases()]
+    ids = array('q')
+    hashes = array('q')
+    for claim_id, row_hash in heapq.merge(*(zip(*scan) for scan in scans)):
+        ids.append(claim_id)
+        hashes.append(row_hash)
+    return ids, hashes
+
+
+def _current_rows(ids):
+    current = {}
+    for model, archived in ((Claim, False), (ArchivedClaim, True)):
+        rows = (
+            row for alias in shards.claim_databases()
+            for row in model.objects.using(alias).filter(id__in=ids).values('id', *COLUMNS)
+        )
+        for row in rows:
+            row['archived'] = archived
+            current[row['id']] = row
+    return current
+
+
+UNSEEN, UNCHANGED, CHANGED = 0, 1, 2
+
+
+def _match(ids, hashes, db_ids, db_hashes, states, missing=None):
+    """Mark file rows found in a table as UNCHANGED/CHANGED; returns the indexes matched.
+
+    Table ids absent from the file are appended to ``missing`` when given.
+    """
+    matched = []
+    i = 0
+    count = len(ids)
+    for db_id, db_hash in zip(db_ids, db_hashes):
+        while i < count and ids[i] < db_id:
+            i += 1
+        if i < count and ids[i] == db_id:
+            states[i] = UNCHANGED if hashes[i] == db_hash else CHANGED
+            matched.append(i)
+            i += 1
+        elif missing is not None:
+            missing.append(db_id)
+    return matched
+
+
+def diff_claim_file(path, include_missing=True, using=None):
+    """Classify every claim in ``path`` against the database.
+
+    With ``include_missing`` the whole table is read to find claims the file
+    does not mention; otherwise only the id range the file covers is read.
+    """
+    started = time.perf_counter()
+    diff = ImportDiff(path)
+    ids, hashes, offsets = scan_file(path, diff)
+    if not ids:
+        diff.seconds = time.perf_counter() - started
+        return diff
+    id_range = (None, None) if include_missing else (ids[0], ids[-1])
+    live_ids, live_hashes = scan_tables(Claim, using, *id_range)
+    archived_ids, archived_hashes = scan_tables(ArchivedClaim, using, *id_range)
+
+    states = bytearray(len(ids))
+    _match(ids, hashes, live_ids, live_hashes, states, diff.missing if include_missing else None)
+    for i in _match(ids, hashes, archived_ids, archived_hashes, states):
+        diff.restored.append(ids[i])
+    for i, state in enumerate(states):
+        if state == UNCHANGED:
+            diff.unchanged += 1
+        elif state == UNSEEN:
+            diff.new.append(ids[i])
+            diff.offsets[ids[i]] = offsets[i]
+        else:
+            diff.changed.append(ids[i])
+            diff.offsets[ids[i]] = offsets[i]
+    diff.seconds = time.perf_counter() - started
+    return diff
+
+
+# Uploaded files and their diffs are kept on disk between preview requests
+def preview_root():
+    return _setting('IMPORT_PREVIEW_DIR', os.path.join(tempfile.gettempdir(), 'erisa-import-previews'))
+
+
+def _prune_previews(root, max_age):
+    cutoff = time.time() - max_age
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def create_preview(chunks):
+    """Store an uploaded claim list (an iterable of byte chunks), diff it and return ``(token, diff)``."""
+    root = preview_root()
+    os.makedirs(root, exist_ok=True)
+    _prune_previews(root, _setting('IMPORT_PREVIEW_TTL_SECONDS', 3600))
+    token = uuid.uuid4().hex
+    directory = os.path.join(root, token)
+    os.makedirs(directory)
+    path = os.path.join(directory, 'claim_list.csv')
+    with open(path, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+    diff = diff_claim_file(path)
+    diff.save(directory)
+    return token, diff
+
+
+def load_preview(token):
+    """The saved diff for a preview token, or None if it expired or never existed."""
+    if not token.isalnum():
+        return None
+    directory = os.path.join(preview_root(), token)
+    if not os.path.exists(os.path.join(directory, 'diff.json')):
+        return None
+    return ImportDiff.load(directory)
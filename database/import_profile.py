@@ -0,0 +1,308 @@
+"""Where a claims import spends its time (``load_claims --profile``).
+
+An import is split into stages (``stats``, ``claims``, ``details``,
+``publish``, ``hooks``; ``load`` around the shard workers when sharded), and
+the row loops of the claim and detail stages into phases. Each row calls
+``lap(phase)`` once a phase is over: ``decode`` (reading and splitting the
+CSV line), ``parse`` (ints, Decimals, dates), ``lookup`` (the existence
+queries) and ``write``. Once per chunk of claims comes ``restore`` (archived
+claims among them back to the live table), and at each chunk boundary
+``flush`` (change log and CPT index), ``commit``, ``pause`` and ``begin``.
+The time, queries and peak traced memory since the previous lap go to that
+phase. ``ChunkedTransaction`` closes a batch at every commit, so slow
+stretches of a file show up too.
+
+Queries are counted with a wrapper on every database connection, so
+``DEBUG`` is not needed. Memory is measured with ``tracemalloc`` (one frame
+per allocation), which still slows Python allocations down a lot: compare runs
+with memory tracking only with each other, and turn it off
+(``--profile-no-memory``) when the phase timings should match a normal import.
+``ImportRun.memory_tracked`` records which kind a stored run is. Shard workers
+profile themselves and their summary is added to the main command's, one stage
+per shard (``shard`` is set on those stages).
+
+``save_run()`` keeps the summary in ``ImportRun``; the upload page lists the
+latest runs so imports of different sizes can be compared over time.
+"""
+import cProfile
+import os
+import time
+import tracemalloc
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from .models import ImportRun
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _rate(rows, seconds):
+    return round(rows / seconds, 1) if seconds else None
+
+
+def _coalesce(batches, limit):
+    """Merge neighbouring batches of the same stage until at most ``limit`` are left."""
+    while len(batches) > limit:
+        merged = []
+        for batch in batches:
+            previous = merged[-1] if merged else None
+            if previous and not previous.get('merged') and (previous['stage'], previous.get('shard')) == (
+                    batch['stage'], batch.get('shard')):
+                previous.update(
+                    rows=previous['rows'] + batch['rows'],
+                    seconds=previous['seconds'] + batch['seconds'],
+                    queries=previous['queries'] + batch['queries'],
+                    peak_memory=max(previous['peak_memory'], batch['peak_memory']),
+                    merged=True,
+                )
+            else:
+                merged.append(dict(batch, merged=False))
+        if len(merged) == len(batches):
+            break
+        batches = merged
+    for batch in batches:
+        batch.pop('merged', None)
+    return batches
+
+
+class ImportProfile:
+    """Timings of one import (or one shard worker's part of it); does nothing unless ``enabled``."""
+
+    def __init__(self, enabled=False, cprofile_path=None, track_memory=True):
+        self.enabled = enabled
+        self.cprofile_path = cprofile_path
+        # Without it, every peak_memory stays 0
+        self.track_memory = track_memory
+        self.queries = 0
+        # Queries of absorbed shard workers, which count towards the total only
+        self.worker_queries = 0
+        self.stages = []
+        self.batches = []
+        self._stage = None
+        self._profiler = None
+        self._wrappers = None
+        self._tracing = False
+        self.started_at = None
+        self._started = None
+        self._seconds = None
+        self._peak = 0
+        self._mark = self._mark_queries = 0
+        self._batch_start = self._batch_queries = self._batch_peak = 0
+
+    def start(self):
+        if not self.enabled:
+            return
+        self._wrappers = ExitStack()
+        for connection in connections.all():
+            self._wrappers.enter_context(connection.execute_wrapper(self._count))
+        if self.track_memory:
+            # Leave tracing alone if someone else (python -X tracemalloc) started it
+            self._tracing = not tracemalloc.is_tracing()
+            if self._tracing:
+                # Peaks need no tracebacks; each extra frame slows every allocation further
+                tracemalloc.start(1)
+            tracemalloc.reset_peak()
+        if self.cprofile_path:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self.started_at = timezone.now()
+        self._started = time.perf_counter()
+        self._reset_mark(self._started)
+
+    def stop(self):
+        if not self.enabled or self._started is None or self._seconds is not None:
+            return
+        self._seconds = time.perf_counter() - self._started
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(self.cprofile_path)
+        self._take_peak()
+        if self._tracing:
+            tracemalloc.stop()
+        self._wrappers.close()
+
+    def _count(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def _reset_mark(self, now):
+        self._mark = now
+        self._mark_queries = self.queries
+
+    def _take_peak(self):
+        """Traced memory peak since the last call, also counted towards the batch, stage and run."""
+        if not self.track_memory:
+            return 0
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+        self._peak = max(self._peak, peak)
+        if self._stage is not None:
+            self._stage['peak_memory'] = max(self._stage['peak_memory'], peak)
+            self._batch_peak = max(self._batch_peak, peak)
+        return peak
+
+    @contextmanager
+    def stage(self, name):
+        """Time the block as stage ``name``; laps and batches inside it belong to the stage."""
+        if not self.enabled:
+            yield
+            return
+        now = time.perf_counter()
+        stage = {'name': name, 'rows': 0, 'seconds': 0.0, 'queries': 0, 'peak_memory': 0, 'phases': {}}
+        self.stages.append(stage)
+        self._stage, started, queries = stage, now, self.queries
+        self._take_peak()
+        self._batch_start, self._batch_queries, self._batch_peak = now, self.queries, 0
+        self._reset_mark(now)
+        try:
+            yield
+        finally:
+            self._take_peak()
+            stage['seconds'] = time.perf_counter() - started
+            stage['queries'] = self.queries - queries
+            self._stage = None
+
+    def lap(self, phase):
+        """Charge everything since the previous lap (or the stage's start) to ``phase``."""
+        if self._stage is None:
+            return
+        now = time.perf_counter()
+        timing = self._stage['phases'].get(phase)
+        if timing is None:
+            timing = self._stage['phases'][phase] = {'seconds': 0.0, 'queries': 0, 'peak_memory': 0, 'calls': 0}
+        timing['seconds'] += now - self._mark
+        timing['queries'] += self.queries - self._mark_queries
+        timing['peak_memory'] = max(timing['peak_memory'], self._take_peak())
+        timing['calls'] += 1
+        self._reset_mark(now)
+
+    def batch(self, rows):
+        """Close the current batch of the stage after ``rows`` more rows."""
+        if self._stage is None or not rows:
+            return
+        now = time.perf_counter()
+        self._take_peak()
+        self.batches.append({
+            'stage': self._stage['name'],
+            'rows': rows,
+            'seconds': now - self._batch_start,
+            'queries': self.queries - self._batch_queries,
+            'peak_memory': self._batch_peak,
+        })
+        self._stage['rows'] += rows
+        self._batch_start, self._batch_queries, self._batch_peak = now, self.queries, 0
+
+    def absorb(self, summary, shard):
+        """Add a shard worker's ``summary()``: its stages and batches, tagged with ``shard``."""
+        if not self.enabled or not summary:
+            return
+        for stage in summary['stages']:
+            self.stages.append(dict(stage, shard=shard, phases={
+                phase['name']: phase for phase in stage['phases']
+            }))
+        self.batches.extend(dict(batch, shard=shard) for batch in summary['batches'])
+        self.worker_queries += summary['queries']
+        self._peak = max(self._peak, summary['peak_memory'] or 0)
+
+    def summary(self):
+        """JSON-ready totals, stages with their phases, and batches (merged down to ``IMPORT_PROFILE_MAX_BATCHES``)."""
+        stages = []
+        for stage in self.stages:
+            batches = [
+                batch for batch in self.batches
+                if (batch['stage'], batch.get('shard')) == (stage['name'], stage.get('shard'))
+            ]
+            rates = [_rate(batch['rows'], batch['seconds']) for batch in batches if batch['seconds']]
+            stages.append({
+                **{key: value for key, value in stage.items() if key != 'phases'},
+                'seconds': round(stage['seconds'], 4),
+                'rows_per_second': _rate(stage['rows'], stage['seconds']),
+                'slowest_batch_rows_per_second': min(rates, default=None),
+                'phases': [
+                    {'name': name, **timing, 'seconds': round(timing['seconds'], 4)}
+                    for name, timing in stage['phases'].items()
+                ],
+            })
+        batches = [dict(batch) for batch in _coalesce(self.batches, _setting('IMPORT_PROFILE_MAX_BATCHES', 500))]
+        for batch in batches:
+            batch['rows_per_second'] = _rate(batch['rows'], batch['seconds'])
+            batch['seconds'] = round(batch['seconds'], 4)
+        return {
+            'seconds': round(self._seconds or 0.0, 3),
+            'queries': self.queries + self.worker_queries,
+            'memory_tracked': self.track_memory,
+            'peak_memory': self._peak if self.track_memory else None,
+            'stages': stages,
+            'batches': batches,
+        }
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def save_run(profile, job_id, mode, claim_list_file, claim_detail_file, status, error=''):
+    """Store ``profile``'s summary in the import history; returns the ``ImportRun``."""
+    summary = profile.summary()
+
+    def rows(name):
+        return sum(stage['rows'] for stage in summary['stages'] if stage['name'] == name)
+
+    return ImportRun.objects.create(
+        job_id=job_id,
+        mode=mode,
+        status=status,
+        error=error[:1000],
+        claim_list_size=_size(claim_list_file),
+        claim_detail_size=_size(claim_detail_file),
+        claim_rows=rows('claims'),
+        detail_rows=rows('details'),
+        seconds=summary['seconds'],
+        queries=summary['queries'],
+        memory_tracked=summary['memory_tracked'],
+        peak_memory=summary['peak_memory'],
+        profile=summary,
+        cprofile_path=profile.cprofile_path or '',
+        started_at=profile.started_at or timezone.now(),
+    )
+
+
+def recent_runs():
+    """The latest ``IMPORT_HISTORY_SIZE`` profiled imports, newest first."""
+    return ImportRun.objects.all()[:_setting('IMPORT_HISTORY_SIZE', 20)]
+
+
+def format_summary(summary):
+    """The stages and phases of ``summary`` as an aligned text table."""
+    tracked = summary.get('memory_tracked', True)
+
+    def megabytes(value):
+        return f'{value / 1e6:>8.1f}' if tracked else f'{"-":>8}'
+
+    lines = [f'  {"stage / phase":<24} {"rows":>9} {"seconds":>9} {"rows/s":>9} {"queries":>8} {"peak MB":>8}']
+    for stage in summary['stages']:
+        name = f'{stage["shard"]} {stage["name"]}' if stage.get('shard') else stage['name']
+        rate = stage['rows_per_second']
+        lines.append(
+            f'  {name:<24} {stage["rows"] or "":>9} {stage["seconds"]:>9.3f} {rate if rate else "":>9} '
+            f'{stage["queries"]:>8} {megabytes(stage["peak_memory"])}'
+        )
+        for phase in stage['phases']:
+            lines.append(
+                f'    {phase["name"]:<22} {phase["calls"]:>9} {phase["seconds"]:>9.3f} {"":>9} '
+                f'{phase["queries"]:>8} {megabytes(phase["peak_memory"])}'
+            )
+    lines.append(
+        f'  {"total":<24} {"":>9} {summary["seconds"]:>9.3f} {"":>9} '
+        f'{summary["queries"]:>8} {megabytes(summary["peak_memory"])}'
+    )
+    title = 'Import profile:' if tracked else 'Import profile (memory not tracked):'
+    return title + '\n' + '\n'.join(lines)
@@ -0,0 +1,60 @@
+import time
+from datetime import datetime
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from backend import caching
+from database import shards
+from database.archive import archive_candidates, archive_claims, archive_cutoff
+
+
+class Command(BaseCommand):
+    help = 'Move closed claims past the archive horizon (with details, flags and notes) into the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', type=str, help='Archive claims discharged before this date (YYYY-MM-DD)')
+        parser.add_argument('--days', type=int, help='Archive claims discharged more than N days ago '
+                                                     '(default: ARCHIVE_AFTER_DAYS)')
+        parser.add_argument('--status', action='append', dest='statuses',
+                            help='Final status to archive; repeat for several (default: ARCHIVE_STATUSES)')
+        parser.add_argument('--batch-size', type=int, help='Claims moved per transaction (default: ARCHIVE_BATCH_SIZE)')
+        parser.add_argument('--limit', type=int, help='Archive at most N claims')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many claims would be archived')
+
+    def handle(self, *args, **options):
+        if options['before'] and options['days'] is not None:
+            raise CommandError('Use either --before or --days')
+        if options['before']:
+            try:
+                before = datetime.strptime(options['before'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError(f'Invalid --before date: {options["before"]}')
+        else:
+            before = archive_cutoff(options['days'])
+        statuses = options['statuses'] or getattr(settings, 'ARCHIVE_STATUSES', ['Paid', 'Denied'])
+
+        if options['dry_run']:
+            count = sum(shards.fan_out(lambda: archive_candidates(before, statuses).count()))
+            if options['limit'] is not None:
+                count = min(count, options['limit'])
+            self.stdout.write(self.style.WARNING(
+                f'DRY RUN - {count} claims ({", ".join(statuses)}) discharged before {before} would be archived'
+            ))
+            return
+
+        started = time.perf_counter()
+        archived = 0
+        # Each shard archives into its own tables; --limit applies to the total
+        for alias in shards.claim_databases():
+            limit = None if options['limit'] is None else options['limit'] - archived
+            if limit is not None and limit <= 0:
+                break
+            with shards.use_shard(alias):
+                archived += archive_claims(
+                    before, statuses, batch_size=options['batch_size'], limit=limit,
+                    progress=lambda done, total=archived: self.stdout.write(f'  {total + done} claims archived...'),
+                )
+        if archived:
+            caching.bump_version(caching.CLAIMS)
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {archived} claims discharged before {before} in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,80 @@
+import itertools
+import json
+import os
+from django.core.management.base import BaseCommand, CommandError
+from backend.loadgen import ServerProcess, format_summary, python_module_command, run_load
+from database.models import Claim
+
+
+class Command(BaseCommand):
+    help = 'Compare concurrent-request throughput of the read endpoints under WSGI (gunicorn) and ASGI (uvicorn)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Worker processes per server')
+        parser.add_argument('--threads', type=int, default=1, help='Threads per gunicorn sync worker')
+        parser.add_argument('--concurrency', type=int, default=32, help='Concurrent clients')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds of load per server')
+        parser.add_argument('--port', type=int, default=8765, help='Local port to bind')
+        parser.add_argument(
+            '--server',
+            choices=['wsgi', 'asgi', 'both'],
+            default='both',
+            help='Which entry point(s) to benchmark'
+        )
+        parser.add_argument('--json', type=str, default=None, help='Write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        claim_id = Claim.objects.order_by('id').values_list('id', flat=True).first()
+        if claim_id is None:
+            raise CommandError('No claims loaded; run load_claims or seed_claims first')
+
+        paths = [
+            ('dashboard', '/'),
+            ('load_more_claims', '/load-more/?page=2'),
+            ('claim_detail_partial', f'/{claim_id}/detail/partial/'),
+            ('report_view', '/report/'),
+        ]
+        base_url = f'http://127.0.0.1:{options["port"]}'
+        bind = f'127.0.0.1:{options["port"]}'
+        servers = {
+            'wsgi': python_module_command(
+                'gunicorn', 'erisa_recovery.wsgi:application',
+                '--bind', bind, '--workers', str(options['workers']), '--threads', str(options['threads']),
+            ),
+            'asgi': python_module_command(
+                'uvicorn', 'erisa_recovery.asgi:application',
+                '--host', '127.0.0.1', '--port', str(options['port']),
+                '--workers', str(options['workers']), '--log-level', 'warning',
+            ),
+        }
+        selected = ['wsgi', 'asgi'] if options['server'] == 'both' else [options['server']]
+        env = {'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'erisa_recovery.settings')}
+
+        results = {}
+        for name in selected:
+            self.stdout.write(f'\nBenchmarking {name.upper()} '
+                              f'({options["workers"]} workers, {options["concurrency"]} clients, {options["duration"]}s)')
+            # Each client walks the endpoint list from a different offset
+            cycles = {}
+
+            def next_request(index):
+                cycle = cycles.setdefault(index, itertools.islice(itertools.cycle(paths), index % len(paths), None))
+                label, path = next(cycle)
+                return label, 'GET', path, None, {}
+
+            with ServerProcess(servers[name], base_url, env=env):
+                result = run_load(base_url, next_request, options['concurrency'], options['duration'])
+            results[name] = result.summary()
+            self.stdout.write(format_summary(results[name]))
+
+        if len(results) == 2:
+            wsgi_rps = results['wsgi']['TOTAL']['rps']
+            asgi_rps = results['asgi']['TOTAL']['rps']
+            ratio = asgi_rps / wsgi_rps if wsgi_rps else 0
+            self.stdout.write(self.style.SUCCESS(
+                f'\nThroughput: WSGI {wsgi_rps:.1f} req/s, ASGI {asgi_rps:.1f} req/s ({ratio:.2f}x)'
+            ))
+
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
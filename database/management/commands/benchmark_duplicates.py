@@ -0,0 +1,124 @@
+import json
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from database import duplicates, shards
+from database.models import DuplicatePair
+from database.synthetic import resubmissions, seed_rows, synthetic_claims
+
+# Ids of the injected copies and of the claims imported for the incremental
+# run, clear of the originals at any dataset size
+RESUBMISSION_ID_BASE = 1_000_000_000
+IMPORT_ID_BASE = 1_500_000_000
+
+
+class Command(BaseCommand):
+    help = 'Time duplicate detection over 100k/1M synthetic claims with injected resubmissions in a test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='100000,1000000',
+                            help='Comma-separated numbers of original claims, seeded cumulatively')
+        parser.add_argument('--rate', type=float, default=0.01, help='Share of claims resubmitted as near-duplicates')
+        parser.add_argument('--import-size', type=int, default=1000,
+                            help='Claims imported after each full run to time the incremental check')
+        parser.add_argument('--max-seconds', type=float, default=300,
+                            help='Fail when a full detection run takes longer than this')
+        parser.add_argument('--test-database', default=None,
+                            help='SQLite file for the test database (default: in memory; use a file for 1M claims)')
+        parser.add_argument('--json', type=str, default=None, help='Write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        if options['test_database']:
+            connection.settings_dict['TEST']['NAME'] = options['test_database']
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+        try:
+            results = self.measure(sizes, options)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(self.format_results(results))
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+
+        failures = [
+            f'full run took {row["full_seconds"]:.0f}s at {row["claims"]} claims (limit {options["max_seconds"]:.0f}s)'
+            for row in results if row['full_seconds'] > options['max_seconds']
+        ]
+        if failures:
+            raise CommandError('Duplicate detection too slow:\n  ' + '\n  '.join(failures))
+        self.stdout.write(self.style.SUCCESS('Duplicate detection finished within the limit at every size'))
+
+    def seed(self, count, start_id, seed, rate, resubmission_id):
+        """Seed ``count`` claims plus resubmissions of about ``rate`` of them; returns the (original, copy) ids."""
+        copies = list(resubmissions(synthetic_claims(count, start_id, seed), rate, resubmission_id, seed))
+        seed_rows(synthetic_claims(count, start_id, seed), annotate_every=0)
+        seed_rows(copies, annotate_every=0)
+        return {(copy['resubmission_of'], copy['id']) for copy in copies}
+
+    def found(self, injected):
+        pairs = set()
+        for rows in shards.fan_out(lambda: list(DuplicatePair.objects.values_list('claim_id', 'other_claim_id'))):
+            pairs.update(rows)
+        return len(injected & pairs)
+
+    def measure(self, sizes, options):
+        results = []
+        injected = set()
+        seeded = 0
+        imported = 0
+        for size in sizes:
+            self.stdout.write(f'Seeding {size - seeded} claims (total {size}) with {options["rate"]:.0%} resubmitted...')
+            started = time.perf_counter()
+            injected |= self.seed(
+                size - seeded, seeded + 1, size, options['rate'], RESUBMISSION_ID_BASE + len(injected),
+            )
+            seed_seconds = time.perf_counter() - started
+            seeded = size
+
+            self.stdout.write('Full detection run...')
+            started = time.perf_counter()
+            keyed, pairs, groups = duplicates.detect_all()
+            full_seconds = time.perf_counter() - started
+
+            self.stdout.write(f'Importing {options["import_size"]} claims for the incremental check...')
+            injected |= self.seed(
+                options['import_size'], IMPORT_ID_BASE + imported, size + 1, options['rate'],
+                RESUBMISSION_ID_BASE + len(injected),
+            )
+            imported += options['import_size']
+            started = time.perf_counter()
+            checked, _, _ = duplicates.detect_changed()
+            incremental_seconds = time.perf_counter() - started
+            # Over the copies found by the full run and by the incremental one
+            recall = self.found(injected) / len(injected) if injected else 1.0
+
+            results.append({
+                'claims': keyed,
+                'seed_seconds': round(seed_seconds, 1),
+                'full_seconds': round(full_seconds, 1),
+                'pairs': pairs,
+                'groups': groups,
+                'injected': len(injected),
+                'recall': round(recall, 4),
+                'incremental_claims': checked,
+                'incremental_seconds': round(incremental_seconds, 2),
+            })
+        return results
+
+    def format_results(self, results):
+        lines = [
+            f'  {"claims":>9} {"seed s":>8} {"full s":>8} {"pairs":>8} {"groups":>8} {"recall":>7} '
+            f'{"incr. claims":>12} {"incr. s":>8}'
+        ]
+        for row in results:
+            lines.append(
+                f'  {row["claims"]:>9} {row["seed_seconds"]:>8.1f} {row["full_seconds"]:>8.1f} {row["pairs"]:>8} '
+                f'{row["groups"]:>8} {row["recall"]:>7.1%} {row["incremental_claims"]:>12} '
+                f'{row["incremental_seconds"]:>8.2f}'
+            )
+        return 'Duplicate detection:\n' + '\n'.join(lines)
@@ -0,0 +1,221 @@
+import json
+import statistics
+import time
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import (
+    CaptureQueriesContext, setup_databases, setup_test_environment, teardown_databases,
+    teardown_test_environment,
+)
+from django.urls import reverse
+from backend import caching
+from database.models import Claim
+from database.synthetic import seed_database
+
+# Maximum queries per request with a cold cache. The page groups must also
+# issue the same number of queries on every page and at every dataset size.
+# Query strings may use {claim_id} (the claim the URL kwargs get) and {ids}
+# (the first BATCH_IDS claim ids).
+ENDPOINTS = [
+    # (label, method, url name, url kwargs, query string, budget, group)
+    ('dashboard', 'GET', 'claims:dashboard', {}, '', 14, 'dashboard'),
+    ('dashboard?page=3', 'GET', 'claims:dashboard', {}, 'page=3', 14, 'dashboard'),
+    ('dashboard?view=grid', 'GET', 'claims:dashboard', {}, 'view=grid', 10, None),
+    ('load_more?page=2', 'GET', 'claims:load_more_claims', {}, 'page=2', 4, 'load_more'),
+    ('load_more?page=3', 'GET', 'claims:load_more_claims', {}, 'page=3', 4, 'load_more'),
+    ('load_more?archived=1', 'GET', 'claims:load_more_claims', {}, 'page=2&archived=1', 8, None),
+    ('claims_grid?start=0', 'GET', 'claims:claims_grid', {}, 'start=0&limit=500', 2, None),
+    ('claims_grid?start=500', 'GET', 'claims:claims_grid', {}, 'start=500&limit=500', 1, None),
+    ('claim_detail_partial', 'GET', 'claims:claim_detail_partial', {'claim_id': None}, '', 4, None),
+    ('report', 'GET', 'claims:report', {}, '', 14, None),
+    ('csv_upload', 'GET', 'claims:csv_upload', {}, '', 5, None),
+    ('flag_claim_api', 'POST', 'claims:flag_claim_api', {'pk': None}, '', 4, None),
+    ('add_note_api', 'POST', 'claims:add_note_api', {'pk': None}, '', 4, None),
+    ('claims_api?ids=1k', 'GET', 'claims:claims_api', {}, 'ids={ids}&include=detail,notes,flags', 3, None),
+    ('claims_api?cursor', 'GET', 'claims:claims_api', {}, 'cursor={claim_id}&limit=1000&include=detail,notes,flags',
+     3, None),
+]
+
+BATCH_IDS = 1000
+
+# Fixed workload timed before each check (primary key lookups and JSON encoding,
+# roughly what a view does), so timings can be compared across machines
+CALIBRATION_QUERIES = 200
+CALIBRATION_PAYLOAD = [{'id': i, 'name': f'claim {i}', 'amount': i * 1.5, 'codes': list(range(10))} for i in range(500)]
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'query_budget_baseline.json'
+
+
+class Command(BaseCommand):
+    help = 'Check per-view query budgets and timings against 1k/10k/100k synthetic claims in a test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000',
+                            help='Comma-separated dataset sizes, seeded cumulatively')
+        parser.add_argument('--repeat', type=int, default=3, help='Timed requests per endpoint (median is kept)')
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='JSON file of baseline timings')
+        parser.add_argument('--tolerance', type=float, default=1.0,
+                            help='Allowed slowdown over the calibrated baseline as a fraction (1.0 = 100%%)')
+        parser.add_argument('--min-delta-ms', type=float, default=25.0,
+                            help='Ignore slowdowns smaller than this many (calibrated) milliseconds')
+        parser.add_argument('--strict-timings', action='store_true',
+                            help='Fail on timing slowdowns instead of only reporting them')
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Write the measured timings into the baseline instead of checking them')
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        baseline_path = Path(options['baseline'])
+        if not baseline_path.exists() and not options['update_baseline']:
+            raise CommandError(
+                f'No timing baseline at {baseline_path}; run with --update-baseline on a known-good build to record one'
+            )
+        baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+        # A private cache so clearing it between requests cannot touch a shared deployment cache
+        cache_override = override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'query-budgets'},
+        })
+        cache_override.enable()
+        try:
+            calibration_ms = self.calibrate()
+            results = self.measure(sizes, options['repeat'])
+        finally:
+            cache_override.disable()
+            caching.reset()
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        failures = self.check_budgets(results, sizes)
+        if options['update_baseline']:
+            # Sizes not measured in this run keep their recorded timings
+            if baseline.get('calibration_ms'):
+                # Kept sizes were recorded against the old calibration; scale the new timings to it
+                scale = baseline['calibration_ms'] / calibration_ms
+            else:
+                baseline['calibration_ms'], scale = calibration_ms, 1.0
+            baseline.update({
+                str(size): {label: round(row['ms'] * scale, 2) for label, row in rows.items()}
+                for size, rows in results.items()
+            })
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n')
+            self.stdout.write(f'Baseline written to {baseline_path}')
+        else:
+            missing, slowdowns = self.check_timings(
+                results, baseline, calibration_ms, options['tolerance'], options['min_delta_ms'],
+            )
+            # A baseline without every entry is a setup error, not timing noise
+            failures += missing
+            if options['strict_timings']:
+                failures += slowdowns
+            elif slowdowns:
+                # Wall-clock timings vary too much between runs and machines to gate on
+                self.stdout.write(self.style.WARNING('Timing warnings:\n  ' + '\n  '.join(slowdowns)))
+
+        if failures:
+            raise CommandError('Query budget check failed:\n  ' + '\n  '.join(failures))
+        self.stdout.write(self.style.SUCCESS('All endpoints within their query budgets'))
+
+    def calibrate(self, repeat=5):
+        """Median milliseconds of the fixed calibration workload on this machine and database."""
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for claim_id in range(CALIBRATION_QUERIES):
+                Claim.objects.filter(id=claim_id).first()
+            json.loads(json.dumps(CALIBRATION_PAYLOAD))
+            timings.append(time.perf_counter() - started)
+        calibration_ms = round(statistics.median(timings) * 1000, 2)
+        self.stdout.write(f'Calibration: {calibration_ms:.2f}ms')
+        return calibration_ms
+
+    def measure(self, sizes, repeat):
+        """Seed each dataset size in turn and record query counts and median timings."""
+        client = Client()
+        results = {}
+        seeded = 0
+        for size in sizes:
+            self.stdout.write(f'Seeding {size - seeded} claims (total {size})...')
+            seed_database(size - seeded, start_id=seeded + 1, seed=size)
+            seeded = size
+            claim_id = Claim.objects.order_by('id').values_list('id', flat=True)[size // 2]
+            ids = ','.join(map(str, Claim.objects.order_by('id').values_list('id', flat=True)[:BATCH_IDS]))
+
+            rows = {}
+            for label, method, url_name, kwargs, query, budget, group in ENDPOINTS:
+                url = reverse(url_name, kwargs={key: claim_id for key in kwargs})
+                if query:
+                    url = f'{url}?{query.format(claim_id=claim_id, ids=ids)}'
+                counts = []
+                timings = []
+                for _ in range(repeat):
+                    caching.reset()
+                    caching.shared_cache().clear()
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        if method == 'POST':
+                            response = client.post(url, data={'text': 'budget check'}, content_type='application/json')
+                        else:
+                            response = client.get(url)
+                        timings.append(time.perf_counter() - started)
+                    if response.status_code >= 400:
+                        raise CommandError(f'{label} returned {response.status_code} at {size} claims')
+                    counts.append(len(queries))
+                rows[label] = {'queries': max(counts), 'ms': round(statistics.median(timings) * 1000, 2)}
+            results[size] = rows
+            self.stdout.write(self.format_rows(size, rows))
+        return results
+
+    def format_rows(self, size, rows):
+        lines = [f'  {"endpoint":<24} {"queries":>7} {"budget":>6} {"ms":>9}']
+        for label, method, url_name, kwargs, query, budget, group in ENDPOINTS:
+            row = rows[label]
+            lines.append(f'  {label:<24} {row["queries"]:>7} {budget:>6} {row["ms"]:>9.2f}')
+        return f'{size} claims:\n' + '\n'.join(lines)
+
+    def check_budgets(self, results, sizes):
+        failures = []
+        for label, method, url_name, kwargs, query, budget, group in ENDPOINTS:
+            counts = {size: results[size][label]['queries'] for size in sizes}
+            for size, count in counts.items():
+                if count > budget:
+                    failures.append(f'{label}: {count} queries at {size} claims (budget {budget})')
+            if len(set(counts.values())) > 1:
+                failures.append(f'{label}: query count grows with dataset size {counts}')
+        groups = {}
+        for label, method, url_name, kwargs, query, budget, group in ENDPOINTS:
+            if group:
+                groups.setdefault(group, []).append(label)
+        for group, labels in groups.items():
+            for size in sizes:
+                counts = {label: results[size][label]['queries'] for label in labels}
+                if len(set(counts.values())) > 1:
+                    failures.append(f'{group}: query count varies by page at {size} claims {counts}')
+        return failures
+
+    def check_timings(self, results, baseline, calibration_ms, tolerance, min_delta_ms):
+        """(missing baseline entries, slowdowns over the baseline after scaling by the two calibrations)."""
+        if not baseline.get('calibration_ms'):
+            return ['no calibration in the baseline (record one with --update-baseline)'], []
+        scale = baseline['calibration_ms'] / calibration_ms
+        missing = []
+        slowdowns = []
+        for size, rows in results.items():
+            for label, row in rows.items():
+                base = baseline.get(str(size), {}).get(label)
+                if base is None:
+                    missing.append(f'{label}: no baseline timing at {size} claims (record one with --update-baseline)')
+                    continue
+                ms = row['ms'] * scale
+                if ms > base * (1 + tolerance) and ms - base > min_delta_ms:
+                    slowdowns.append(
+                        f'{label}: {ms:.1f}ms calibrated ({row["ms"]:.1f}ms measured) at {size} claims '
+                        f'(baseline {base:.1f}ms)'
+                    )
+        return missing, slowdowns
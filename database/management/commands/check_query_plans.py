@@ -0,0 +1,121 @@
+import re
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+from django.test.utils import (
+    CaptureQueriesContext, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+from database import archive
+from database.claim_query import SORTS, ClaimQuery
+from database.synthetic import seed_database
+
+# Filter combinations checked under every sort, ascending and descending
+FILTER_SETS = [
+    {},
+    {'billed_min': '1000'},
+    {'billed_max': '5000'},
+    {'paid_min': '1000', 'paid_max': '5000'},
+    {'discharged_from': '2023-01-01'},
+    {'discharged_from': '2023-01-01', 'discharged_to': '2023-03-31'},
+    {'billed_min': '1000', 'discharged_from': '2023-01-01'},
+    {'flagged': '1'},
+    {'has_notes': '1'},
+    {'flagged': '1', 'discharged_from': '2023-01-01'},
+]
+PAGE_SIZE = 30
+ARCHIVE_BEFORE = date(2023, 1, 1)
+
+TABLE_SCAN = re.compile(r'SCAN (\S+)$')
+
+
+class Command(BaseCommand):
+    help = ('EXPLAIN every supported dashboard sort and filter combination (live and archived claims) '
+            'and fail if a query scans a whole table or sorts every row')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=10000, help='Synthetic claims to seed into the test database')
+        parser.add_argument('--analyze', action='store_true', help='Run ANALYZE first so the planner has statistics')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('check_query_plans reads SQLite EXPLAIN QUERY PLAN output')
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+        try:
+            seed_database(options['size'])
+            archive.archive_claims(before=ARCHIVE_BEFORE)
+            if options['analyze']:
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+            checked, failures = self.check_combinations(options['verbosity'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        if failures:
+            raise CommandError(f'{len(failures)} of {checked} queries need a table scan or full sort:\n  '
+                               + '\n  '.join(failures))
+        self.stdout.write(self.style.SUCCESS(f'All {checked} queries use an index'))
+
+    def check_combinations(self, verbosity):
+        self.row_counts = {}
+        checked = 0
+        failures = []
+        for sort in SORTS:
+            for direction in ('', '-'):
+                for filters in FILTER_SETS:
+                    params = {**filters, 'sort': f'{direction}{sort}'}
+                    label = '&'.join(f'{name}={value}' for name, value in params.items())
+                    for queryset in ClaimQuery.from_params(params).querysets(include_archived=True):
+                        for sql in self.page_queries(queryset):
+                            checked += 1
+                            plan = self.explain(sql)
+                            problems = self.plan_problems(plan, primary_key_walk=sort == 'id' and ' LIMIT ' in sql)
+                            if verbosity >= 2:
+                                self.stdout.write(f'{label} [{queryset.model.__name__}]\n  {sql}\n    '
+                                                  + '\n    '.join(plan))
+                            failures.extend(f'{label} [{queryset.model.__name__}]: {problem}' for problem in problems)
+        return checked, failures
+
+    def page_queries(self, queryset):
+        """SQL of every query the dashboard runs for one page of ``queryset`` and its count."""
+        with CaptureQueriesContext(connection) as queries:
+            list(queryset.select_related('detail__denial_reason').prefetch_related('flags', 'notes')[:PAGE_SIZE])
+            queryset.count()
+        return [query['sql'] for query in queries.captured_queries]
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[3] for row in cursor.fetchall()]
+
+    def table_rows(self, table):
+        """Rows in ``table``, or None when the plan names it by an alias."""
+        if table not in self.row_counts:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}')
+                    self.row_counts[table] = cursor.fetchone()[0]
+            except DatabaseError:
+                self.row_counts[table] = None
+        return self.row_counts[table]
+
+    def plan_problems(self, plan, primary_key_walk):
+        """Full table scans, and sorts of rows that no index narrowed down.
+
+        SQLite reports a walk of a table in rowid (claim id) order as a plain
+        SCAN, so that is allowed for ``ORDER BY id ... LIMIT`` page reads. With
+        statistics the planner also scans tables smaller than a page instead of
+        using their index, which is the cheaper plan and not reported.
+        """
+        problems = []
+        narrowed = any(step.startswith('SEARCH') for step in plan)
+        for step in plan:
+            match = TABLE_SCAN.match(step)
+            if match and not primary_key_walk:
+                rows = self.table_rows(match.group(1))
+                if rows is None or rows > PAGE_SIZE:
+                    problems.append(f'full scan of {match.group(1)}')
+            if step.startswith('USE TEMP B-TREE FOR ORDER BY') and not narrowed:
+                problems.append('sorts every row')
+        return problems
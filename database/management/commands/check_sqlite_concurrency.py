@@ -0,0 +1,126 @@
+import io
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from backend.loadgen import percentile
+from database.models import Claim, Note
+from database.synthetic import seed_database, synthetic_claims, write_import_files
+
+
+class Command(BaseCommand):
+    help = ('Run a claims import alongside concurrent note writers in a test database '
+            'and fail on "database is locked" errors')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--claims', type=int, default=5000, help='Synthetic claims to import')
+        parser.add_argument('--seed-claims', type=int, default=1000,
+                            help='Synthetic claims seeded before the import; writers add notes to these')
+        parser.add_argument('--writers', type=int, default=20, help='Concurrent note writers')
+        parser.add_argument('--notes-per-writer', type=int, default=25, help='Notes each writer adds')
+        parser.add_argument('--test-database', default=None,
+                            help='SQLite file for the test database (default: a temporary file)')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.stdout.write(self.style.WARNING(f'Database vendor is {connection.vendor}, not sqlite'))
+        if options['seed_claims'] < options['writers']:
+            raise CommandError('--seed-claims must be at least --writers; each writer notes its own claim')
+
+        temp_dir = tempfile.mkdtemp()
+        # A file, not the in-memory default: threads need their own connections to one WAL database
+        connection.settings_dict['TEST']['NAME'] = (
+            options['test_database'] or os.path.join(temp_dir, 'concurrency.sqlite3')
+        )
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+        try:
+            self.stdout.write(f'Seeding {options["seed_claims"]} claims...')
+            seed_database(options['seed_claims'], annotate_every=0)
+            results = self.measure(options, temp_dir)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(temp_dir)
+
+        elapsed, imported, notes_written, latencies, lock_errors, import_errors = results
+        latencies.sort()
+        self.stdout.write(
+            f'  Elapsed: {elapsed:.2f}s\n'
+            f'  Imported claims: {imported}/{options["claims"]}\n'
+            f'  Notes written: {notes_written}/{options["writers"] * options["notes_per_writer"]}\n'
+            f'  Note write latency: p50 {percentile(latencies, 50) * 1000:.1f}ms, '
+            f'p99 {percentile(latencies, 99) * 1000:.1f}ms, max {(latencies[-1] if latencies else 0) * 1000:.1f}ms\n'
+            f'  Lock errors: {len(lock_errors)}'
+        )
+
+        if import_errors:
+            raise CommandError(f'Import failed: {import_errors[0]}')
+        if lock_errors:
+            raise CommandError(f'{len(lock_errors)} writes failed with lock errors, e.g. {lock_errors[0]}')
+        self.stdout.write(self.style.SUCCESS('No lock errors'))
+
+    def measure(self, options, temp_dir):
+        """Import synthetic claims while the writers add notes; returns the counts, latencies and errors."""
+        targets = list(Claim.objects.order_by('id').values_list('id', flat=True)[:options['writers']])
+        start_id = options['seed_claims'] + 1
+        marker = 'concurrency check'
+        list_path, detail_path = write_import_files(
+            temp_dir, synthetic_claims(options['claims'], start_id, seed=start_id),
+        )
+
+        lock = threading.Lock()
+        lock_errors = []
+        latencies = []
+        import_errors = []
+
+        def run_import():
+            try:
+                call_command('load_claims', list_path, detail_path, '--mode', 'append', '--force',
+                             stdout=io.StringIO())
+            except Exception as e:
+                import_errors.append(e)
+            finally:
+                connection.close()
+
+        def run_writer(claim_id):
+            rng = random.Random(claim_id)
+            try:
+                for _ in range(options['notes_per_writer']):
+                    started = time.perf_counter()
+                    try:
+                        Note.objects.create(claim_id=claim_id, text=marker)
+                    except OperationalError as e:
+                        if 'locked' not in str(e):
+                            raise
+                        with lock:
+                            lock_errors.append(str(e))
+                    with lock:
+                        latencies.append(time.perf_counter() - started)
+                    time.sleep(rng.uniform(0, 0.02))
+            finally:
+                connection.close()
+
+        self.stdout.write(
+            f'Importing {options["claims"]} claims with {len(targets)} writers '
+            f'x {options["notes_per_writer"]} notes...'
+        )
+        started = time.perf_counter()
+        importer = threading.Thread(target=run_import)
+        importer.start()
+        writers = [threading.Thread(target=run_writer, args=(claim_id,)) for claim_id in targets]
+        for writer in writers:
+            writer.start()
+        for thread in [importer, *writers]:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        imported = Claim.objects.filter(id__gte=start_id, id__lt=start_id + options['claims']).count()
+        notes_written = Note.objects.filter(text=marker).count()
+        return elapsed, imported, notes_written, latencies, lock_errors, import_errors
@@ -0,0 +1,46 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from database import changes
+
+
+class Command(BaseCommand):
+    help = 'Delete claim changes every consumer has read past the retention window, and compact unread runs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days',
+            type=int,
+            default=None,
+            help='Keep read changes this many days (defaults to CLAIM_CHANGE_RETENTION_DAYS)'
+        )
+        parser.add_argument(
+            '--compact-after-hours',
+            type=int,
+            default=None,
+            help='Compact unread changes older than this (defaults to CLAIM_CHANGE_COMPACT_AFTER_HOURS)'
+        )
+        parser.add_argument('--no-compact', action='store_true', help='Only apply the retention window')
+
+    def handle(self, *args, **options):
+        retention_days = options['retention_days']
+        if retention_days is None:
+            retention_days = getattr(settings, 'CLAIM_CHANGE_RETENTION_DAYS', 90)
+        compact_after = options['compact_after_hours']
+        if compact_after is None:
+            compact_after = getattr(settings, 'CLAIM_CHANGE_COMPACT_AFTER_HOURS', 24)
+
+        now = timezone.now()
+        deleted = changes.prune(now - timedelta(days=retention_days))
+        compacted = 0 if options['no_compact'] else changes.compact(now - timedelta(hours=compact_after))
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} claim changes past retention, removed {compacted} by compaction'
+        ))
+
+        latest = changes.latest_sequence()
+        for cursor in changes.log_cursors().order_by('name'):
+            self.stdout.write(f'  {cursor.name}: at {cursor.position} of {latest}')
+        # Flag/note positions are ids of those tables, not sequence numbers
+        for name, position, table_latest in changes.activity_cursors():
+            self.stdout.write(f'  {name}: at {position} of {table_latest}')
@@ -0,0 +1,37 @@
+import time
+from django.core.management.base import BaseCommand
+from backend import caching
+from database import duplicates
+
+
+class Command(BaseCommand):
+    help = 'Find possible duplicate claims among the claims changed since the last run'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Rebuild every blocking key, candidate pair and group from scratch')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep checking every N seconds (0 checks once)')
+        parser.add_argument('--batch-size', type=int, help='Claims per batch (default: DUPLICATE_BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            if options['all']:
+                checked, pairs, groups = duplicates.detect_all(options['batch_size'], progress=self.progress)
+            else:
+                checked, pairs, groups = duplicates.detect_changed(options['batch_size'])
+            if checked:
+                # The report's duplicate section is cached with the claim aggregates
+                caching.bump_version(caching.CLAIMS)
+            self.stdout.write(self.style.SUCCESS(
+                f'Checked {checked} claims: {pairs} candidate pairs, {groups} duplicate groups '
+                f'in {time.perf_counter() - started:.1f}s'
+            ))
+            if options['interval'] <= 0:
+                return
+            options['all'] = False
+            time.sleep(options['interval'])
+
+    def progress(self, stage, done):
+        self.stdout.write(f'  {done} claims keyed...' if stage == 'keyed' else f'  {done} candidate pairs found')
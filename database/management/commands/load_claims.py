@@ -1,10 +1,128 @@
 import csv
+import itertools
 import os
+import queue
+import shutil
+import tempfile
+import time
+import uuid
+from contextlib import nullcontext
 from decimal import Decimal
 from datetime import datetime
+from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
-from django.db import transaction
-from database.models import Claim, ClaimDetail
+from django.db import connections, transaction
+from database import changes, cpt, denials, duplicates, import_diff, import_profile, priority, shards, worklists
+from database.archive import unarchive_claims
+from database.models import ArchivedClaim, Claim, ClaimDetail, ImportRun
+from backend import caching, events
+from backend.stats import dashboard_stats, stats_deltas
+
+# How often (in rows) import progress is pushed to live dashboards
+PROGRESS_EVERY = 500
+
+
+class MessageStream:
+    """stdout/stderr of a shard worker process: forwards writes to the main command"""
+
+    def __init__(self, messages, name):
+        self.messages = messages
+        self.name = name
+
+    def write(self, text):
+        self.messages.put((self.name, text))
+
+    def flush(self):
+        pass
+
+
+def load_shard(alias, claim_list_file, claim_detail_file, mode, atomic, chunk_size, job_id, profile, profile_output,
+               track_memory):
+    """Import one shard's part of the files; runs in a worker process of ``Command.load_sharded()``"""
+    messages = shards.worker_messages()
+    loader = Command(stdout=MessageStream(messages, 'stdout'), stderr=MessageStream(messages, 'stderr'))
+    loader.job_id = job_id
+    # Each worker writes its own cProfile dump, next to the main command's
+    loader.start_import(
+        chunk_size, database=alias, messages=messages,
+        profile=import_profile.ImportProfile(
+            profile, f'{profile_output}.{alias}' if profile_output else None, track_memory,
+        ),
+    )
+    loader.profile.start()
+    try:
+        with shards.use_shard(alias), changes.change_source('import'), changes.buffered(), \
+                transaction.atomic(using=alias) if atomic else nullcontext():
+            claims_stats = loader.load_claims(claim_list_file, mode, dry_run=False)
+            details_stats = loader.load_claim_details(claim_detail_file, mode, dry_run=False)
+        loader.profile.stop()
+        return claims_stats, details_stats, loader.changed_claim_ids, loader.profile.summary()
+    finally:
+        connections.close_all()
+        # Sent last, so the main command knows this worker's messages are all in
+        messages.put(('done', alias))
+
+
+class ChunkedTransaction:
+    """Commit every ``size`` rows so concurrent writers can take the write lock in between.
+
+    SQLite allows a single writer, so one transaction around a whole import
+    blocks analysts' flag/note writes until it finishes. Committing per chunk
+    and pausing briefly lets waiting writers (retrying under busy_timeout) in.
+    Inside an outer ``atomic()`` the chunks become savepoints and nothing is
+    released early. ``before_commit`` runs at the end of every chunk, inside
+    its transaction, to flush work batched up across the chunk's rows.
+    ``using`` is the database the chunks commit on (default unless sharded);
+    changes held by ``changes.buffered()`` are written at each chunk's end.
+    Every chunk is a batch of ``profile`` (an ``ImportProfile``), if given.
+    """
+
+    def __init__(self, size, pause=0.0, before_commit=None, using=None, profile=None):
+        self.size = max(size, 1)
+        self.pause = pause
+        self.before_commit = before_commit
+        self.using = using
+        self.profile = profile or import_profile.ImportProfile()
+        self.rows = 0
+        self._atomic = None
+
+    def __enter__(self):
+        self._begin()
+        self.profile.lap('begin')
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        suppress = self._atomic.__exit__(exc_type, exc, tb)
+        if exc_type is None:
+            self.profile.lap('commit')
+            self.profile.batch(self.rows % self.size)
+        return suppress
+
+    def tick(self):
+        """Count one row, committing and yielding the lock at each chunk boundary."""
+        self.rows += 1
+        if self.rows % self.size == 0:
+            self.flush()
+            self._atomic.__exit__(None, None, None)
+            self.profile.lap('commit')
+            if self.pause:
+                time.sleep(self.pause)
+                self.profile.lap('pause')
+            self._begin()
+            self.profile.lap('begin')
+            self.profile.batch(self.size)
+
+    def flush(self):
+        if self.before_commit:
+            self.before_commit()
+        changes.flush()
+        self.profile.lap('flush')
+
+    def _begin(self):
+        self._atomic = transaction.atomic(using=self.using)
+        self._atomic.__enter__()
 
 
 class Command(BaseCommand):
@@ -29,6 +147,41 @@ class Command(BaseCommand):
             action='store_true',
             help='Show what would be imported without actually importing'
         )
+        parser.add_argument(
+            '--job-id',
+            type=str,
+            default=None,
+            help='Identifier reported with live import progress events'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=getattr(settings, 'IMPORT_CHUNK_SIZE', 200),
+            help='Rows per transaction; the write lock is released between chunks'
+        )
+        parser.add_argument(
+            '--atomic',
+            action='store_true',
+            help='Run the whole import in one transaction (all-or-nothing, blocks other writers); '
+                 'with sharded claims, one transaction per shard'
+        )
+        parser.add_argument(
+            '--profile',
+            action='store_true',
+            help='Time each phase and batch of the import, count its queries and trace its memory '
+                 '(much slower, see --profile-no-memory); the summary is printed and kept in the import history'
+        )
+        parser.add_argument(
+            '--profile-output',
+            type=str,
+            default=None,
+            help='With --profile, also write a cProfile dump to this file (shard workers add .<shard>)'
+        )
+        parser.add_argument(
+            '--profile-no-memory',
+            action='store_true',
+            help='With --profile, do not trace memory, so phase timings match an unprofiled import'
+        )
 
     def handle(self, *args, **options):
         claim_list_file = options['claim_list_file']
@@ -36,6 +189,13 @@ class Command(BaseCommand):
         mode = options['mode']
         force = options['force']
         dry_run = options['dry_run']
+        self.job_id = options['job_id'] or uuid.uuid4().hex[:12]
+        self.profile_output = options['profile_output'] if options['profile'] else None
+        self.start_import(
+            options['chunk_size'], profile=import_profile.ImportProfile(
+                options['profile'], self.profile_output, track_memory=not options['profile_no_memory'],
+            ),
+        )
 
         # Validate file paths
         if not os.path.exists(claim_list_file):
@@ -47,6 +207,10 @@ class Command(BaseCommand):
         # Show import summary
         self.show_import_summary(claim_list_file, claim_detail_file, mode, dry_run)
         
+        if dry_run:
+            self.preview_claims(claim_list_file, mode)
+            return
+        
         # Confirm import if not forced
         if not force and not dry_run:
             if not self.confirm_import(mode):
@@ -54,16 +218,43 @@ class Command(BaseCommand):
                 return
 
         self.stdout.write('Starting to load claims data...')
+        self.profile.start()
+        with self.profile.stage('stats'):
+            stats_before = dashboard_stats() if not dry_run else None
 
+        sharded = shards.is_sharded()
         try:
-            with transaction.atomic():
-                # Load claims
-                claims_stats = self.load_claims(claim_list_file, mode, dry_run)
-                
-                # Load claim details
-                details_stats = self.load_claim_details(claim_detail_file, mode, dry_run)
+            with changes.change_source('import'), \
+                    transaction.atomic() if options['atomic'] and not sharded else nullcontext():
+                if sharded:
+                    # Every shard loads its part of both files in parallel
+                    with self.profile.stage('load'):
+                        claims_stats, details_stats = self.load_sharded(
+                            claim_list_file, claim_detail_file, mode, options['atomic'],
+                        )
+                else:
+                    # Load claims
+                    claims_stats = self.load_claims(claim_list_file, mode, dry_run)
+                    
+                    # Load claim details
+                    details_stats = self.load_claim_details(claim_detail_file, mode, dry_run)
 
                 if not dry_run:
+                    # Queued until commit when --atomic, so dashboards only see a finished import
+                    with self.profile.stage('publish'):
+                        stats_after = dashboard_stats()
+                        events.publish_stats(
+                            stats_deltas(stats_before, stats_after),
+                            values={'avg_underpayment': float(stats_after['avg_underpayment'])},
+                        )
+                        events.publish_claims(self.changed_claim_ids)
+                        caching.bump_version(caching.CLAIMS)
+                        transaction.on_commit(
+                            lambda: self.report_progress(
+                                'done', details_stats['total'], details_stats['total'], done=True,
+                            )
+                        )
+
                     self.stdout.write(
                         self.style.SUCCESS(
                             f'Successfully processed claims data:\n'
@@ -87,8 +278,213 @@ class Command(BaseCommand):
                     )
 
         except Exception as e:
+            self.report_progress('failed', 0, done=True)
+            self.save_profile(claim_list_file, claim_detail_file, mode, ImportRun.FAILED, str(e))
             raise CommandError(f'Error during import: {e}')
 
+        with self.profile.stage('hooks'):
+            if getattr(settings, 'PRIORITY_SCORE_AFTER_IMPORT', True):
+                # Post-import hook: rescore the claims this import (or anyone since the last run) changed
+                scored, written = priority.score_changed()
+                self.stdout.write(f'Recovery priority: {scored} claims scored, {written} scores changed')
+                self.profile.lap('priority')
+            # Saved-filter worklists follow the claims the import touched
+            self.stdout.write(f'Worklists: {worklists.refresh()} entries added or removed')
+            self.profile.lap('worklists')
+            if getattr(settings, 'DUPLICATE_DETECT_AFTER_IMPORT', True):
+                # Blocking keys for the imported claims, compared within their blocks only
+                checked, pairs, groups = duplicates.detect_changed()
+                if checked:
+                    caching.bump_version(caching.CLAIMS)
+                self.stdout.write(f'Duplicates: {checked} claims checked, {pairs} candidate pairs, {groups} groups')
+                self.profile.lap('duplicates')
+        self.save_profile(claim_list_file, claim_detail_file, mode, ImportRun.SUCCEEDED)
+
+    def save_profile(self, claim_list_file, claim_detail_file, mode, status, error=''):
+        """Print the profile of a --profile import and keep it in the import history"""
+        if not self.profile.enabled:
+            return
+        self.profile.stop()
+        run = import_profile.save_run(
+            self.profile, self.job_id, mode, claim_list_file, claim_detail_file, status, error,
+        )
+        self.stdout.write(import_profile.format_summary(run.profile))
+        if self.profile_output:
+            workers = f' (shard workers: {self.profile_output}.<shard>)' if shards.is_sharded() else ''
+            self.stdout.write(f'cProfile dump written to {self.profile_output}{workers}')
+
+    def start_import(self, chunk_size, database=None, messages=None, profile=None):
+        """Reset the per-import state; each shard's loader in a sharded import has its own"""
+        self.changed_claim_ids = set()
+        self.cpt_catalog = cpt.CodeCatalog()
+        self.pending_cpt_codes = {}
+        self.denial_reasons = denials.ReasonCatalog()
+        self.chunk_size = chunk_size
+        self.chunk_pause = getattr(settings, 'IMPORT_CHUNK_PAUSE_SECONDS', 0.05)
+        # Shard this loader writes to (None: not sharded), and in a shard worker
+        # the queue its output and progress go back to the main command through
+        self.database = database
+        self.messages = messages
+        self.shard_progress = {}
+        # Timings for --profile (does nothing without it)
+        self.profile = profile or import_profile.ImportProfile()
+
+    def load_sharded(self, claim_list_file, claim_detail_file, mode, atomic):
+        """Split both files by shard and load the parts in parallel, one worker process per shard"""
+        temp_dir = tempfile.mkdtemp()
+        messages = shards.worker_queue()
+        try:
+            parts = self.split_by_shard(claim_list_file, claim_detail_file, temp_dir)
+            self.profile.lap('split')
+            with shards.worker_pool(len(parts), messages) as pool:
+                futures = [
+                    pool.submit(
+                        load_shard, alias, list_path, detail_path, mode, atomic, self.chunk_size, self.job_id,
+                        self.profile.enabled, self.profile_output, self.profile.track_memory,
+                    )
+                    for alias, (list_path, detail_path) in parts.items()
+                ]
+                self.relay_messages(messages, futures)
+                results = [future.result() for future in futures]
+            self.profile.lap('workers')
+        finally:
+            shutil.rmtree(temp_dir)
+
+        for alias, (_, _, changed_claim_ids, profile) in zip(parts, results):
+            self.changed_claim_ids.update(changed_claim_ids)
+            self.profile.absorb(profile, alias)
+
+        def total(index):
+            return {key: sum(result[index][key] for result in results) for key in results[0][index]}
+        return total(0), total(1)
+
+    def relay_messages(self, messages, futures):
+        """Write the workers' output and publish their combined progress until every worker is done"""
+        finished = 0
+        while finished < len(futures):
+            try:
+                message = messages.get(timeout=1)
+            except queue.Empty:
+                # A worker that died never says it is done
+                if all(future.done() for future in futures):
+                    return
+                continue
+            kind, *values = message
+            if kind == 'done':
+                finished += 1
+            elif kind == 'progress':
+                self.report_shard_progress(*values)
+            else:
+                (self.stdout if kind == 'stdout' else self.stderr).write(values[0], ending='')
+
+    def claim_locations(self):
+        """{claim id: shard} of every live and archived claim already stored"""
+        locations = {}
+        for alias in shards.shard_aliases():
+            for model in (Claim, ArchivedClaim):
+                for claim_id in model.objects.using(alias).values_list('id', flat=True).iterator(chunk_size=10000):
+                    locations[claim_id] = alias
+        return locations
+
+    def split_by_shard(self, claim_list_file, claim_detail_file, directory):
+        """Write each shard's rows of both files to ``directory``; returns {alias: (list path, detail path)}
+
+        Stored claims stay on their shard, new ones go to their insurer's.
+        Unreadable rows go to the first shard, whose loader reports them, so
+        row numbers in warnings count rows of that shard's part.
+        """
+        aliases = shards.shard_aliases()
+        locations = self.claim_locations()
+        paths = {alias: (os.path.join(directory, f'{alias}_list.csv'), os.path.join(directory, f'{alias}_detail.csv'))
+                 for alias in aliases}
+        placements = {}
+        try:
+            with open(claim_list_file, 'r', encoding='utf-8', newline='') as file:
+                reader = csv.reader(file, delimiter='|')
+                header = next(reader, [])
+                outputs = {alias: open(paths[alias][0], 'w', encoding='utf-8', newline='') for alias in aliases}
+                try:
+                    writers = {alias: csv.writer(output, delimiter='|') for alias, output in outputs.items()}
+                    for writer in writers.values():
+                        writer.writerow(header)
+                    for row in reader:
+                        values = dict(zip(header, row))
+                        try:
+                            claim_id = int(values['id'])
+                        except (KeyError, ValueError):
+                            writers[aliases[0]].writerow(row)
+                            continue
+                        alias = placements.setdefault(
+                            claim_id, locations.get(claim_id) or shards.shard_for(values.get('insurer_name', '')),
+                        )
+                        writers[alias].writerow(row)
+                finally:
+                    for output in outputs.values():
+                        output.close()
+
+            with open(claim_detail_file, 'r', encoding='utf-8', newline='') as file:
+                outputs = {alias: open(paths[alias][1], 'w', encoding='utf-8', newline='') for alias in aliases}
+                try:
+                    writers = {alias: csv.writer(output, delimiter='|') for alias, output in outputs.items()}
+                    for row in csv.reader(file, delimiter='|'):
+                        try:
+                            claim_id = int(row[1])
+                        except (IndexError, ValueError):
+                            claim_id = None
+                        writers[placements.get(claim_id) or locations.get(claim_id) or aliases[0]].writerow(row)
+                finally:
+                    for output in outputs.values():
+                        output.close()
+        except (OSError, UnicodeDecodeError, csv.Error) as e:
+            raise CommandError(f'Error splitting import files by shard: {e}')
+        return paths
+
+    def preview_claims(self, file_path, mode, sample=10):
+        """Report what an import of the claim list would change, diffed in bulk"""
+        try:
+            diff = import_diff.diff_claim_file(file_path)
+        except (OSError, ValueError, UnicodeDecodeError) as e:
+            raise CommandError(f'Error reading claim list file: {e}')
+        summary = diff.summary()
+        skipped = ' (skipped in append mode)' if mode == 'append' else ''
+        replaced = ' (replaced in overwrite mode)' if mode == 'overwrite' else ''
+        self.stdout.write(
+            self.style.WARNING(
+                f'DRY RUN - No data was actually imported:\n'
+                f'  Claims: {summary["file_rows"]} rows compared in {summary["seconds"]}s\n'
+                f'  New: {summary["new"]}\n'
+                f'  Changed: {summary["changed"]}{skipped}{replaced}\n'
+                f'  Unchanged: {summary["unchanged"]}\n'
+                f'  Restored from archive: {summary["restored"]}\n'
+                f'  Existing claims not in file (kept): {summary["missing"]}\n'
+                f'  Repeated ids: {summary["duplicates"]}, unreadable rows: {summary["errors"]}'
+            )
+        )
+        for error in summary['error_samples']:
+            self.stdout.write(f'  Skipping {error}')
+        for row in diff.page('changed', per_page=sample)['rows']:
+            changed = ', '.join(f'{field} {old} -> {new}' for field, (old, new) in row['changes'].items())
+            self.stdout.write(f'  Claim {row["id"]}: {changed}')
+
+    def count_rows(self, file_path, has_header):
+        """Count data rows so progress events can report a total"""
+        with open(file_path, 'r', encoding='utf-8') as file:
+            rows = sum(1 for _ in file)
+        return max(rows - 1, 0) if has_header else rows
+
+    def report_progress(self, phase, processed, total=None, done=False):
+        """Push import progress to live dashboards (shard loaders report through the main command)"""
+        if self.messages is not None:
+            self.messages.put(('progress', self.database, phase, processed, total))
+            return
+        events.publish_import_progress(self.job_id, phase, processed, total=total, done=done)
+
+    def report_shard_progress(self, alias, phase, processed, total):
+        """Publish the progress of every shard in ``phase`` added up"""
+        self.shard_progress[alias, phase] = (processed, total or 0)
+        counts = [counts for (_, shard_phase), counts in self.shard_progress.items() if shard_phase == phase]
+        self.report_progress(phase, sum(done for done, _ in counts), sum(total for _, total in counts))
+
     def show_import_summary(self, claim_list_file, claim_detail_file, mode, dry_run):
         """Show summary of what will be imported"""
         self.stdout.write(f'\n📊 Import Summary:')
@@ -118,170 +514,230 @@ class Command(BaseCommand):
     def load_claims(self, file_path, mode, dry_run):
         """Load claims from CSV file with specified mode"""
         stats = {'total': 0, 'created': 0, 'updated': 0, 'skipped': 0}
+        total_rows = self.count_rows(file_path, has_header=True)
+        self.report_progress('claims', 0, total_rows)
         
         try:
             with open(file_path, 'r', encoding='utf-8') as file:
                 reader = csv.DictReader(file, delimiter='|')
                 
-                for row_num, row in enumerate(reader, start=2):
-                    try:
-                        # Parse and validate data
-                        claim_id = int(row['id'])
-                        billed_amount = Decimal(row['billed_amount'])
-                        paid_amount = Decimal(row['paid_amount'])
-                        discharge_date = datetime.strptime(row['discharge_date'], '%Y-%m-%d').date()
-                        
-                        stats['total'] += 1
+                with self.profile.stage('claims'), ChunkedTransaction(
+                    self.chunk_size, self.chunk_pause, using=self.database, profile=self.profile,
+                ) as chunk:
+                    rows = reader if dry_run else self.restore_archived(reader)
+                    for row_num, row in enumerate(rows, start=2):
+                        self.profile.lap('decode')
+                        chunk.tick()
+                        try:
+                            # Parse and validate data
+                            claim_id = int(row['id'])
+                            billed_amount = Decimal(row['billed_amount'])
+                            paid_amount = Decimal(row['paid_amount'])
+                            discharge_date = datetime.strptime(row['discharge_date'], '%Y-%m-%d').date()
+                            self.profile.lap('parse')
                         
-                        # Check if claim exists
-                        existing_claim = Claim.objects.filter(id=claim_id).first()
+                            stats['total'] += 1
+                            if stats['total'] % PROGRESS_EVERY == 0:
+                                self.report_progress('claims', stats['total'], total_rows)
                         
-                        if existing_claim:
-                            if mode == 'append':
-                                self.stdout.write(f'Skipping existing claim {claim_id} (append mode)')
-                                stats['skipped'] += 1
-                                continue
-                            elif mode == 'overwrite':
-                                if not dry_run:
-                                    existing_claim.delete()
-                                    existing_claim = None
-                                self.stdout.write(f'Will replace existing claim {claim_id}')
+                            # Check if claim exists (archived ones were restored by restore_archived())
+                            existing_claim = Claim.objects.filter(id=claim_id).first()
+                            self.profile.lap('lookup')
                         
-                        if not dry_run:
-                            # Create or update claim
-                            if existing_claim:
-                                # Update existing claim
-                                existing_claim.patient_name = row['patient_name']
-                                existing_claim.billed_amount = billed_amount
-                                existing_claim.paid_amount = paid_amount
-                                existing_claim.status = row['status']
-                                existing_claim.insurer_name = row['insurer_name']
-                                existing_claim.discharge_date = discharge_date
-                                existing_claim.save()
-                                stats['updated'] += 1
-                                self.stdout.write(f'Updated claim {claim_id}')
-                            else:
-                                # Create new claim
-                                Claim.objects.create(
-                            id=claim_id,
-                                    patient_name=row['patient_name'],
-                                    billed_amount=billed_amount,
-                                    paid_amount=paid_amount,
-                                    status=row['status'],
-                                    insurer_name=row['insurer_name'],
-                                    discharge_date=discharge_date,
-                                )
-                                stats['created'] += 1
-                            self.stdout.write(f'Created claim {claim_id}')
-                        else:
                             if existing_claim:
-                                stats['updated'] += 1
+                                if mode == 'append':
+                                    self.stdout.write(f'Skipping existing claim {claim_id} (append mode)')
+                                    stats['skipped'] += 1
+                                    continue
+                                elif mode == 'overwrite':
+                                    if not dry_run:
+                                        existing_claim.delete()
+                                        existing_claim = None
+                                    self.stdout.write(f'Will replace existing claim {claim_id}')
+                        
+                            if not dry_run:
+                                # Create or update claim
+                                if existing_claim:
+                                    # Update existing claim
+                                    existing_claim.patient_name = row['patient_name']
+                                    existing_claim.billed_amount = billed_amount
+                                    existing_claim.paid_amount = paid_amount
+                                    existing_claim.status = row['status']
+                                    existing_claim.insurer_name = row['insurer_name']
+                                    existing_claim.discharge_date = discharge_date
+                                    existing_claim.save()
+                                    self.changed_claim_ids.add(claim_id)
+                                    stats['updated'] += 1
+                                    self.stdout.write(f'Updated claim {claim_id}')
+                                else:
+                                    # Create new claim
+                                    Claim.objects.create(
+                                id=claim_id,
+                                        patient_name=row['patient_name'],
+                                        billed_amount=billed_amount,
+                                        paid_amount=paid_amount,
+                                        status=row['status'],
+                                        insurer_name=row['insurer_name'],
+                                        discharge_date=discharge_date,
+                                    )
+                                    self.changed_claim_ids.add(claim_id)
+                                    stats['created'] += 1
+                                self.stdout.write(f'Created claim {claim_id}')
                             else:
-                                stats['created'] += 1
+                                if existing_claim:
+                                    stats['updated'] += 1
+                                else:
+                                    stats['created'] += 1
+                            self.profile.lap('write')
                         
-                    except (ValueError, KeyError) as e:
-                        self.stdout.write(
-                            self.style.WARNING(
-                                f'Error processing claim at row {row_num}: {e}'
+                        except (ValueError, KeyError) as e:
+                            self.stdout.write(
+                                self.style.WARNING(
+                                    f'Error processing claim at row {row_num}: {e}'
+                                )
                             )
-                        )
-                        stats['skipped'] += 1
-                        continue
+                            stats['skipped'] += 1
+                            continue
                         
         except Exception as e:
             raise CommandError(f'Error reading claim list file: {e}')
         
         return stats
 
+    def restore_archived(self, rows):
+        """Yield the claim list ``rows``, first moving each chunk's archived claims back to the live table
+
+        Re-imported archived claims are then updated like any live claim. One
+        query per chunk finds them, instead of an unarchive attempt per new claim.
+        """
+        rows = iter(rows)
+        while True:
+            chunk = list(itertools.islice(rows, self.chunk_size))
+            if not chunk:
+                return
+            self.profile.lap('decode')
+            ids = set()
+            for row in chunk:
+                try:
+                    ids.add(int(row['id']))
+                except (KeyError, TypeError, ValueError):
+                    # Reported as unreadable when the row itself is processed
+                    continue
+            archived = list(ArchivedClaim.objects.filter(id__in=ids).values_list('id', flat=True))
+            if archived:
+                unarchive_claims(archived)
+            self.profile.lap('restore')
+            yield from chunk
+
+    def flush_cpt_codes(self):
+        """Index the CPT codes of the details written since the last flush, in bulk"""
+        if self.pending_cpt_codes:
+            cpt.sync_claim_codes(self.pending_cpt_codes, self.cpt_catalog)
+            self.pending_cpt_codes = {}
+
     def load_claim_details(self, file_path, mode, dry_run):
         """Load claim details from CSV file with specified mode"""
         stats = {'total': 0, 'created': 0, 'updated': 0, 'skipped': 0}
+        total_rows = self.count_rows(file_path, has_header=False)
+        self.report_progress('details', 0, total_rows)
         
         try:
             with open(file_path, 'r', encoding='utf-8') as file:
                 reader = csv.reader(file, delimiter='|')
                 
-                for row_num, row in enumerate(reader, start=1):
-                    try:
-                        if len(row) != 4:
-                            self.stdout.write(
-                                self.style.WARNING(
-                                    f'Invalid row format at row {row_num}: expected 4 columns, got {len(row)}'
+                with self.profile.stage('details'), ChunkedTransaction(
+                    self.chunk_size, self.chunk_pause, self.flush_cpt_codes, using=self.database, profile=self.profile,
+                ) as chunk:
+                    for row_num, row in enumerate(reader, start=1):
+                        self.profile.lap('decode')
+                        chunk.tick()
+                        try:
+                            if len(row) != 4:
+                                self.stdout.write(
+                                    self.style.WARNING(
+                                        f'Invalid row format at row {row_num}: expected 4 columns, got {len(row)}'
+                                    )
                                 )
-                            )
-                            stats['skipped'] += 1
-                            continue
+                                stats['skipped'] += 1
+                                continue
                         
-                        # Parse row data
-                        detail_id = int(row[0])
-                        claim_id = int(row[1])
-                        denial_reason = row[2]
-                        cpt_codes = row[3]
+                            # Parse row data
+                            detail_id = int(row[0])
+                            claim_id = int(row[1])
+                            cpt_codes = row[3]
+                            self.profile.lap('parse')
                         
-                        # Handle "N/A" denial reason
-                        if denial_reason == "N/A":
-                            denial_reason = ""
+                            # Reasons are stored once; "N/A" means no reason
+                            denial_reason_id = self.denial_reasons.id_for(row[2])
                         
-                        stats['total'] += 1
+                            stats['total'] += 1
+                            if stats['total'] % PROGRESS_EVERY == 0:
+                                self.report_progress('details', stats['total'], total_rows)
                         
-                        # Check if claim exists
-                        try:
-                            claim = Claim.objects.get(id=claim_id)
-                        except Claim.DoesNotExist:
-                            self.stdout.write(
-                                self.style.WARNING(
-                                    f'Claim {claim_id} not found for detail {detail_id} at row {row_num}'
+                            # Check if claim exists
+                            try:
+                                claim = Claim.objects.get(id=claim_id)
+                            except Claim.DoesNotExist:
+                                self.stdout.write(
+                                    self.style.WARNING(
+                                        f'Claim {claim_id} not found for detail {detail_id} at row {row_num}'
+                                    )
                                 )
-                            )
-                            stats['skipped'] += 1
-                            continue
-                        
-                        # Check if detail exists
-                        existing_detail = ClaimDetail.objects.filter(claim=claim).first()
-                        
-                        if existing_detail:
-                            if mode == 'append':
-                                self.stdout.write(f'Skipping existing detail for claim {claim_id} (append mode)')
                                 stats['skipped'] += 1
                                 continue
-                            elif mode == 'overwrite':
-                                if not dry_run:
-                                    existing_detail.delete()
-                                    existing_detail = None
-                                self.stdout.write(f'Will replace existing detail for claim {claim_id}')
                         
-                        if not dry_run:
-                            # Create or update claim detail
-                            if existing_detail:
-                                # Update existing detail
-                                existing_detail.denial_reason = denial_reason
-                                existing_detail.cpt_codes = cpt_codes
-                                existing_detail.save()
-                                stats['updated'] += 1
-                                self.stdout.write(f'Updated detail for claim {claim_id}')
-                            else:
-                                # Create new detail
-                                ClaimDetail.objects.create(
-                            claim=claim,
-                                    denial_reason=denial_reason,
-                                    cpt_codes=cpt_codes,
-                                )
-                                stats['created'] += 1
-                            self.stdout.write(f'Created detail for claim {claim_id}')
-                        else:
+                            # Check if detail exists
+                            existing_detail = ClaimDetail.objects.filter(claim=claim).first()
+                            self.profile.lap('lookup')
+                        
                             if existing_detail:
-                                stats['updated'] += 1
+                                if mode == 'append':
+                                    self.stdout.write(f'Skipping existing detail for claim {claim_id} (append mode)')
+                                    stats['skipped'] += 1
+                                    continue
+                                elif mode == 'overwrite':
+                                    if not dry_run:
+                                        existing_detail.delete()
+                                        existing_detail = None
+                                    self.stdout.write(f'Will replace existing detail for claim {claim_id}')
+                        
+                            if not dry_run:
+                                # Create or update claim detail
+                                if existing_detail:
+                                    # Update existing detail
+                                    existing_detail.denial_reason_id = denial_reason_id
+                                    existing_detail.cpt_codes = cpt_codes
+                                    existing_detail.save()
+                                    self.pending_cpt_codes[claim_id] = cpt_codes
+                                    self.changed_claim_ids.add(claim_id)
+                                    stats['updated'] += 1
+                                    self.stdout.write(f'Updated detail for claim {claim_id}')
+                                else:
+                                    # Create new detail
+                                    ClaimDetail.objects.create(
+                                claim=claim,
+                                        denial_reason_id=denial_reason_id,
+                                        cpt_codes=cpt_codes,
+                                    )
+                                    self.pending_cpt_codes[claim_id] = cpt_codes
+                                    self.changed_claim_ids.add(claim_id)
+                                    stats['created'] += 1
+                                self.stdout.write(f'Created detail for claim {claim_id}')
                             else:
-                                stats['created'] += 1
+                                if existing_detail:
+                                    stats['updated'] += 1
+                                else:
+                                    stats['created'] += 1
+                            self.profile.lap('write')
                         
-                    except (ValueError, IndexError) as e:
-                        self.stdout.write(
-                            self.style.WARNING(
-                                f'Error processing claim detail at row {row_num}: {e}'
+                        except (ValueError, IndexError) as e:
+                            self.stdout.write(
+                                self.style.WARNING(
+                                    f'Error processing claim detail at row {row_num}: {e}'
+                                )
                             )
-                        )
-                        stats['skipped'] += 1
-                        continue
+                            stats['skipped'] += 1
+                            continue
                         
         except Exception as e:
             raise CommandError(f'Error reading claim detail file: {e}')
@@ -0,0 +1,152 @@
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from backend.loadgen import ServerProcess, format_summary, python_module_command, run_load
+from database.synthetic import INSURERS, synthetic_claims, write_import_files
+
+# Relative weight of each kind of request in the traffic mix
+REQUEST_MIX = [
+    ('dashboard', 20),
+    ('dashboard_filtered', 10),
+    ('load_more_filtered', 25),
+    ('claim_detail', 25),
+    ('flag_post', 5),
+    ('note_post', 5),
+    ('report', 10),
+]
+STATUS_FILTERS = ['denied', 'paid', 'under review', 'underpaid']
+
+
+class Command(BaseCommand):
+    help = 'Boot the app under gunicorn against a seeded database and drive a weighted mix of concurrent users'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--claims', type=int, default=10000, help='Claims to seed into the load-test database')
+        parser.add_argument('--use-current-db', action='store_true',
+                            help='Run against the configured database instead of a seeded temporary copy')
+        parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+        parser.add_argument('--threads', type=int, default=4, help='Threads per gunicorn worker')
+        parser.add_argument('--concurrency', type=int, default=32, help='Concurrent clients')
+        parser.add_argument('--duration', type=float, default=20.0, help='Seconds of load')
+        parser.add_argument('--port', type=int, default=8766, help='Local port to bind')
+        parser.add_argument('--with-import', action='store_true',
+                            help='Run a load_claims import in parallel with the request mix')
+        parser.add_argument('--import-claims', type=int, default=5000, help='Claims in the concurrent import')
+        parser.add_argument('--json', type=str, default=None, help='Write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        temp_dir = tempfile.mkdtemp(prefix='erisa-loadtest-')
+        env = {'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'erisa_recovery.settings')}
+        try:
+            if options['use_current_db']:
+                max_id = self.manage_py(env, 'shell', '-c',
+                                        'from database.models import Claim; '
+                                        'print(Claim.objects.order_by("-id").values_list("id", flat=True).first() or 0)')
+                claim_ids = (1, int(max_id.strip().splitlines()[-1]))
+            else:
+                env['SQLITE_PATH'] = str(Path(temp_dir) / 'loadtest.sqlite3')
+                self.stdout.write(f'Seeding {options["claims"]} claims into {env["SQLITE_PATH"]}...')
+                self.manage_py(env, 'migrate', '--verbosity', '0')
+                self.manage_py(env, 'seed_claims', '--count', str(options['claims']), '--start-id', '1')
+                claim_ids = (1, options['claims'])
+            if claim_ids[1] < 1:
+                raise CommandError('No claims loaded; run load_claims or seed_claims first')
+
+            result, import_stats = self.run_mix(options, env, claim_ids, temp_dir)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+        summary = result.summary()
+        self.stdout.write(format_summary(summary))
+        if import_stats:
+            self.stdout.write(
+                f'Concurrent import: {import_stats["claims"]} claims in {import_stats["seconds"]:.1f}s '
+                f'({"ok" if import_stats["ok"] else "FAILED"})'
+            )
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as f:
+                json.dump({'summary': summary, 'import': import_stats}, f, indent=2)
+        if import_stats and not import_stats['ok']:
+            raise CommandError(f'Concurrent import failed: {import_stats["error"]}')
+
+    def manage_py(self, env, *args):
+        """Run a manage.py command in a subprocess against ``env``'s database and return its stdout."""
+        completed = subprocess.run(
+            [sys.executable, str(Path(settings.BASE_DIR) / 'manage.py'), *args],
+            env={**os.environ, **env}, capture_output=True, text=True,
+        )
+        if completed.returncode != 0:
+            raise CommandError(f'manage.py {args[0]} failed: {completed.stderr[-2000:]}')
+        return completed.stdout
+
+    def run_mix(self, options, env, claim_ids, temp_dir):
+        base_url = f'http://127.0.0.1:{options["port"]}'
+        command = python_module_command(
+            'gunicorn', 'erisa_recovery.wsgi:application',
+            '--bind', f'127.0.0.1:{options["port"]}',
+            '--workers', str(options['workers']), '--threads', str(options['threads']),
+        )
+        labels = [label for label, weight in REQUEST_MIX]
+        weights = [weight for label, weight in REQUEST_MIX]
+        rngs = {}
+
+        def next_request(index):
+            rng = rngs.setdefault(index, random.Random(index))
+            label = rng.choices(labels, weights)[0]
+            claim_id = rng.randint(*claim_ids)
+            if label == 'dashboard':
+                return label, 'GET', '/', None, {}
+            if label == 'dashboard_filtered':
+                return label, 'GET', f'/?status={rng.choice(STATUS_FILTERS)}'.replace(' ', '+'), None, {}
+            if label == 'load_more_filtered':
+                query = f'page={rng.randint(2, 4)}&insurer={rng.choice(INSURERS)}'.replace(' ', '+')
+                return label, 'GET', f'/load-more/?{query}', None, {}
+            if label == 'claim_detail':
+                return label, 'GET', f'/{claim_id}/detail/partial/', None, {}
+            if label == 'flag_post':
+                return label, 'POST', f'/{claim_id}/flag/', b'', {}
+            if label == 'note_post':
+                body = json.dumps({'text': 'Load test note'}).encode()
+                return label, 'POST', f'/{claim_id}/note/', body, {'Content-Type': 'application/json'}
+            return label, 'GET', '/report/', None, {}
+
+        import_stats = None
+        importer = None
+        if options['with_import']:
+            list_path, detail_path = write_import_files(
+                temp_dir, synthetic_claims(options['import_claims'], start_id=claim_ids[1] + 1, seed=1),
+            )
+            import_stats = {'claims': options['import_claims'], 'seconds': 0.0, 'ok': False, 'error': None}
+
+            def run_import():
+                started = time.perf_counter()
+                try:
+                    self.manage_py(env, 'load_claims', list_path, detail_path, '--mode', 'append', '--force')
+                    import_stats['ok'] = True
+                except CommandError as e:
+                    import_stats['error'] = str(e)
+                import_stats['seconds'] = time.perf_counter() - started
+
+            importer = threading.Thread(target=run_import)
+
+        self.stdout.write(
+            f'Load testing with {options["concurrency"]} clients for {options["duration"]}s '
+            f'(gunicorn {options["workers"]} workers x {options["threads"]} threads'
+            f'{", concurrent import" if importer else ""})'
+        )
+        with ServerProcess(command, base_url, env=env):
+            if importer:
+                importer.start()
+            result = run_load(base_url, next_request, options['concurrency'], options['duration'])
+            if importer:
+                importer.join()
+        return result, import_stats
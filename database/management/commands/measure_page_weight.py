@@ -0,0 +1,183 @@
+import gzip
+import json
+import re
+import statistics
+import time
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.http import JsonResponse
+from django.template.loader import render_to_string
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from backend import grid, views
+from database import claim_query
+
+PAGES = [
+    # (label, url name, query string)
+    ('dashboard', 'claims:dashboard', ''),
+    ('dashboard?view=grid', 'claims:dashboard', 'view=grid'),
+    ('report', 'claims:report', ''),
+    ('csv_upload', 'claims:csv_upload', ''),
+]
+ASSET_PATTERN = re.compile(r'<(?:script[^>]+src|link[^>]+href)="([^"]+)"')
+ELEMENT_PATTERN = re.compile(r'<[a-zA-Z]')
+GRID_ROW_PATTERN = re.compile(r'<template id="gridRowTemplate">(.*?)</template>', re.S)
+
+# Rows the grid view keeps in the DOM: a 70vh viewport of 41px rows (about
+# 15) plus 10 overscan rows on either side
+GRID_ROWS_IN_VIEW = 35
+
+
+def gzip_size(data):
+    return len(gzip.compress(data, compresslevel=6))
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure HTML and static asset bytes per page, on first load and on a repeat (cached) load, and '
+        'the cost of dashboard rows as HTML fragments and as grid JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000,
+                            help='Claims compared as HTML fragment and grid JSON (0 to skip; needs that many claims)')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed renders per row format (median is kept)')
+        parser.add_argument('--json', type=str, default=None, help='Write the measurements to this JSON file')
+
+    def handle(self, *args, **options):
+        client = Client()
+        results = {}
+        with override_settings(ALLOWED_HOSTS=['*']):
+            for label, url_name, query in PAGES:
+                response = client.get(f'{reverse(url_name)}?{query}' if query else reverse(url_name))
+                if response.status_code != 200:
+                    raise CommandError(f'{label} returned {response.status_code}')
+                html = response.content
+                assets = [self.measure_asset(client, url) for url in ASSET_PATTERN.findall(html.decode())]
+                assets = [asset for asset in assets if asset]
+                html_gzip = gzip_size(html)
+                results[label] = {
+                    'html_bytes': len(html),
+                    'html_gzip_bytes': html_gzip,
+                    'assets': assets,
+                    'first_load_gzip_bytes': html_gzip + sum(asset['gzip_bytes'] for asset in assets),
+                    'repeat_load_gzip_bytes': html_gzip + sum(
+                        asset['gzip_bytes'] for asset in assets if not asset['immutable']
+                    ),
+                }
+            if options['rows']:
+                grid_page = client.get(reverse('claims:dashboard') + '?view=grid').content.decode()
+                rows = self.measure_rows(client, options['rows'], options['repeat'], grid_page)
+
+        for label, row in results.items():
+            self.stdout.write(
+                f'{label}: HTML {row["html_bytes"]:,} B ({row["html_gzip_bytes"]:,} B gzip), '
+                f'first load {row["first_load_gzip_bytes"]:,} B, repeat load {row["repeat_load_gzip_bytes"]:,} B'
+            )
+            for asset in row['assets']:
+                cached = 'immutable' if asset['immutable'] else (asset['cache_control'] or 'no cache headers')
+                self.stdout.write(f'    {asset["url"]}: {asset["bytes"]:,} B ({asset["gzip_bytes"]:,} B gzip), {cached}')
+        if options['rows']:
+            self.stdout.write(self.format_rows(rows))
+            results['rows'] = rows
+
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+
+    def measure_asset(self, client, url):
+        """Size and caching of one locally served static file (None for external URLs)."""
+        if not url.startswith(settings.STATIC_URL) and not url.startswith('/' + settings.STATIC_URL.lstrip('/')):
+            return None
+        name = url.split(settings.STATIC_URL.lstrip('/'), 1)[1].split('?')[0]
+        path = finders.find(name)
+        if path is None and staticfiles_storage.exists(name):
+            path = staticfiles_storage.path(name)
+        if path is None:
+            return None
+        with open(path, 'rb') as f:
+            data = f.read()
+        response = client.get(url)
+        cache_control = response.get('Cache-Control', '') if response.status_code == 200 else ''
+        return {
+            'url': url,
+            'bytes': len(data),
+            'gzip_bytes': gzip_size(data),
+            'cache_control': cache_control,
+            'immutable': 'immutable' in cache_control,
+        }
+
+    def measure_rows(self, client, count, repeat, grid_page):
+        """Bytes, server time and DOM elements of ``count`` dashboard rows in each format, and first-screen times.
+
+        The HTML fragment is what load_more returns (claims_table_rows.html in
+        JSON), built here for all ``count`` rows at once; the grid JSON is one
+        claims_grid chunk. Both are built in-process from the same query.
+        """
+        query = claim_query.ClaimQuery.from_params({})
+        querysets = query.querysets()
+
+        def html_rows():
+            claims, _ = async_to_sync(views._aclaim_page)(query, querysets, 0, count)
+            html = render_to_string('claims/claims_table_rows.html', {'claims': claims})
+            return JsonResponse({'success': True, 'html': html}).content, html, len(claims)
+
+        def grid_rows():
+            chunk = async_to_sync(grid.achunk)(query, querysets, 0, count)
+            return JsonResponse({'success': True, **chunk}).content, len(chunk['columns']['id'])
+
+        html_times, grid_times = [], []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            html_body, html, html_count = html_rows()
+            html_times.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            grid_body, grid_count = grid_rows()
+            grid_times.append(time.perf_counter() - started)
+        if html_count < count or grid_count < count:
+            raise CommandError(f'--rows {count} needs at least {count} claims (found {min(html_count, grid_count)})')
+
+        match = GRID_ROW_PATTERN.search(grid_page)
+        grid_row_elements = len(ELEMENT_PATTERN.findall(match.group(1))) if match else 0
+        return {
+            'rows': count,
+            'html_bytes': len(html_body),
+            'html_gzip_bytes': gzip_size(html_body),
+            'html_ms': round(statistics.median(html_times) * 1000, 1),
+            # Every loaded row and its hidden details row stay in the DOM
+            'html_elements': len(ELEMENT_PATTERN.findall(html)),
+            'grid_bytes': len(grid_body),
+            'grid_gzip_bytes': gzip_size(grid_body),
+            'grid_ms': round(statistics.median(grid_times) * 1000, 1),
+            'grid_elements': grid_row_elements * GRID_ROWS_IN_VIEW,
+            # Server side of the first screen: the paged dashboard renders its
+            # first rows inline, the grid page fetches its first chunk after loading
+            'first_screen_paged_ms': self.time_request(client, reverse('claims:dashboard'), repeat),
+            'first_screen_grid_ms': round(
+                self.time_request(client, reverse('claims:dashboard') + '?view=grid', repeat)
+                + self.time_request(client, reverse('claims:claims_grid') + '?start=0&limit=500', repeat), 1,
+            ),
+        }
+
+    def time_request(self, client, url, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            client.get(url)
+            timings.append(time.perf_counter() - started)
+        return round(statistics.median(timings) * 1000, 1)
+
+    def format_rows(self, rows):
+        return (
+            f'{rows["rows"]:,} rows:\n'
+            f'    HTML fragment: {rows["html_bytes"]:,} B ({rows["html_gzip_bytes"]:,} B gzip), '
+            f'{rows["html_ms"]} ms, {rows["html_elements"]:,} elements in the DOM\n'
+            f'    grid JSON:     {rows["grid_bytes"]:,} B ({rows["grid_gzip_bytes"]:,} B gzip), '
+            f'{rows["grid_ms"]} ms, {rows["grid_elements"]:,} elements in the DOM ({GRID_ROWS_IN_VIEW} rows in view)\n'
+            f'First screen (server): paged dashboard {rows["first_screen_paged_ms"]} ms, '
+            f'grid dashboard and first chunk {rows["first_screen_grid_ms"]} ms'
+        )
@@ -0,0 +1,124 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from backend.loadgen import ServerProcess, fetch, python_module_command
+from database.models import Claim
+
+# Run in a fresh interpreter: how long the application import and warm-up take
+IMPORT_PROBE = '''
+import json, time
+started = time.perf_counter()
+import django
+from django.core.wsgi import get_wsgi_application
+modules = time.perf_counter()
+get_wsgi_application()
+loaded = time.perf_counter()
+from backend.warmup import warm_up
+timings = warm_up()
+print(json.dumps({
+    'imports': modules - started,
+    'application': loaded - modules,
+    'warm_up': time.perf_counter() - loaded,
+    'steps': timings,
+}))
+'''
+
+# Requests timed right after the worker answers its readiness probe, in order
+FIRST_REQUESTS = [
+    ('first dashboard', '/'),
+    ('first report', '/report/'),
+    ('warm dashboard', '/'),
+]
+READY_PATH = '/metrics'
+
+
+class Command(BaseCommand):
+    help = 'Measure worker import time and time to first response, with and without the startup warm-up'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=3, help='Server starts per configuration (median is kept)')
+        parser.add_argument('--port', type=int, default=8767, help='Local port to bind')
+        parser.add_argument('--server', choices=['wsgi', 'asgi'], default='wsgi',
+                            help='Serve erisa_recovery.wsgi with gunicorn or erisa_recovery.asgi with uvicorn')
+        parser.add_argument('--json', type=str, default=None, help='Write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        if not Claim.objects.exists():
+            raise CommandError('No claims loaded; run load_claims or seed_claims first')
+        env = {'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'erisa_recovery.settings')}
+
+        imports = self.measure_imports(env, options['runs'])
+        self.stdout.write(
+            f'Import: modules {imports["imports"] * 1000:.0f}ms, application {imports["application"] * 1000:.0f}ms, '
+            f'warm-up {imports["warm_up"] * 1000:.0f}ms ('
+            + ', '.join(f'{name} {"failed" if seconds is None else f"{seconds * 1000:.0f}ms"}'
+                        for name, seconds in imports['steps'].items())
+            + ')'
+        )
+
+        responses = {}
+        for label, warm in (('warm-up off', '0'), ('warm-up on', '1')):
+            runs = [self.measure_responses({**env, 'WARMUP_ON_STARTUP': warm}, options) for _ in range(options['runs'])]
+            responses[label] = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+
+        columns = ['ready', *(label for label, path in FIRST_REQUESTS), 'first dashboard since start']
+        self.stdout.write(f'\n{options["server"].upper()}, median of {options["runs"]} starts (ms):')
+        self.stdout.write(f'  {"":<12}' + ''.join(f'{column:>{len(column) + 3}}' for column in columns))
+        for label, row in responses.items():
+            self.stdout.write(f'  {label:<12}' + ''.join(
+                f'{row[column] * 1000:>{len(column) + 3}.0f}' for column in columns
+            ))
+
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as f:
+                json.dump({'imports': imports, 'responses': responses}, f, indent=2)
+
+    def measure_imports(self, env, runs):
+        results = []
+        for _ in range(runs):
+            completed = subprocess.run(
+                [sys.executable, '-c', IMPORT_PROBE], cwd=settings.BASE_DIR,
+                env={**os.environ, **env}, capture_output=True, text=True,
+            )
+            if completed.returncode != 0:
+                raise CommandError(f'Import probe failed: {completed.stderr[-2000:]}')
+            results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+        median = {key: statistics.median(result[key] for result in results)
+                  for key in ('imports', 'application', 'warm_up')}
+        median['steps'] = {
+            name: None if None in (values := [result['steps'][name] for result in results])
+            else statistics.median(values)
+            for name in results[0]['steps']
+        }
+        return median
+
+    def measure_responses(self, env, options):
+        """Start one single-worker server and time its readiness and first requests (seconds)."""
+        base_url = f'http://127.0.0.1:{options["port"]}'
+        if options['server'] == 'wsgi':
+            command = python_module_command(
+                'gunicorn', 'erisa_recovery.wsgi:application',
+                '--bind', f'127.0.0.1:{options["port"]}', '--workers', '1',
+            )
+        else:
+            command = python_module_command(
+                'uvicorn', 'erisa_recovery.asgi:application',
+                '--host', '127.0.0.1', '--port', str(options['port']), '--log-level', 'warning',
+            )
+        timings = {}
+        started = time.perf_counter()
+        with ServerProcess(command, base_url, env=env, ready_path=READY_PATH, startup_timeout=60):
+            timings['ready'] = time.perf_counter() - started
+            for label, path in FIRST_REQUESTS:
+                request_started = time.perf_counter()
+                status, _ = fetch(base_url, path)
+                if status >= 400:
+                    raise CommandError(f'{path} returned {status}')
+                timings[label] = time.perf_counter() - request_started
+        timings['first dashboard since start'] = timings['ready'] + timings['first dashboard']
+        return timings
@@ -0,0 +1,20 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from backend.events import prune_events
+
+
+class Command(BaseCommand):
+    help = 'Delete live dashboard events older than the retention window'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age',
+            type=int,
+            default=None,
+            help='Retention in seconds (defaults to SSE_EVENT_RETENTION_SECONDS)'
+        )
+
+    def handle(self, *args, **options):
+        max_age = options['max_age']
+        deleted = prune_events(timedelta(seconds=max_age) if max_age is not None else None)
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} dashboard events'))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from backend import caching
+from database import cpt, shards
+from database.models import ArchivedClaimCptCode, ArchivedClaimDetail, ClaimCptCode, ClaimDetail
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the CPT code catalog and claim/code links from the cpt_codes of every claim detail'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Details read per batch')
+
+    def handle(self, *args, **options):
+        catalog = cpt.CodeCatalog()
+        written = dict.fromkeys((ClaimCptCode, ArchivedClaimCptCode), 0)
+        for alias in shards.claim_databases():
+            with shards.use_shard(alias), transaction.atomic(using=shards.write_alias()):
+                self.rebuild(catalog, written, options['batch_size'])
+        caching.bump_version(caching.CLAIMS)
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {written[ClaimCptCode]} CPT code links for live claims '
+            f'and {written[ArchivedClaimCptCode]} for archived claims'
+        ))
+
+    def rebuild(self, catalog, written, batch_size):
+        """Rebuild the links of one claim database, adding to ``written`` per link model"""
+        for model, detail_model in ((ClaimCptCode, ClaimDetail), (ArchivedClaimCptCode, ArchivedClaimDetail)):
+            model.objects.all().delete()
+            batch = {}
+            details = detail_model.objects.order_by('claim_id').values_list('claim_id', 'cpt_codes')
+            for claim_id, cpt_codes in details.iterator(chunk_size=batch_size):
+                batch[claim_id] = cpt_codes
+                if len(batch) >= batch_size:
+                    written[model] += cpt.sync_claim_codes(batch, catalog, model)
+                    batch = {}
+            written[model] += cpt.sync_claim_codes(batch, catalog, model)
@@ -0,0 +1,28 @@
+import time
+from django.core.management.base import BaseCommand
+from database import worklists
+
+
+class Command(BaseCommand):
+    help = 'Update saved-filter worklists with the claims changed, flagged or noted since the last run'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Re-materialize every worklist from scratch')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep refreshing every N seconds (0 refreshes once)')
+        parser.add_argument('--batch-size', type=int, help='Change log entries per batch (default: WORKLIST_BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            if options['rebuild']:
+                count = worklists.rebuild_all()
+                summary = f'Rebuilt worklists with {count} entries'
+            else:
+                count = worklists.refresh(options['batch_size'])
+                summary = f'Refreshed worklists: {count} entries added or removed'
+            self.stdout.write(self.style.SUCCESS(f'{summary} in {(time.perf_counter() - started) * 1000:.0f}ms'))
+            if options['interval'] <= 0:
+                return
+            options['rebuild'] = False
+            time.sleep(options['interval'])
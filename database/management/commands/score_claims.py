@@ -0,0 +1,24 @@
+import time
+from django.core.management.base import BaseCommand
+from database import priority
+
+
+class Command(BaseCommand):
+    help = 'Compute recovery-priority scores for claims changed, flagged or noted since the last run'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Rescore every live claim (ages and insurer ratios drift; run daily)')
+        parser.add_argument('--batch-size', type=int, help='Claims per batch (default: PRIORITY_BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['all']:
+            scored, written = priority.score_all(
+                options['batch_size'], progress=lambda done: self.stdout.write(f'  {done} claims scored...'),
+            )
+        else:
+            scored, written = priority.score_changed(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Scored {scored} claims ({written} scores changed) in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,37 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from backend import caching
+from database import shards
+from database.models import Claim
+from database.synthetic import seed_database
+
+
+class Command(BaseCommand):
+    help = 'Insert synthetic claims (with details, and flags/notes on a sample) for benchmarks and load tests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=10000, help='Claims to create')
+        parser.add_argument('--start-id', type=int, help='First claim id (default: after the highest existing id)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for reproducible data')
+        parser.add_argument('--annotate-every', type=int, default=50,
+                            help='Flag and note every Nth claim (0 disables)')
+
+    def handle(self, *args, **options):
+        start_id = options['start_id']
+        if start_id is None:
+            start_id = max(
+                Claim.objects.using(alias).order_by('-id').values_list('id', flat=True).first() or 0
+                for alias in shards.claim_databases()
+            ) + 1
+        elif shards.count(Claim, id__gte=start_id, id__lt=start_id + options['count']):
+            raise CommandError(f'Claims already exist in the id range starting at {start_id}')
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            seed_database(options['count'], start_id, options['seed'], annotate_every=options['annotate_every'])
+            caching.bump_version(caching.CLAIMS)
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {options["count"]} claims (ids {start_id}-{start_id + options["count"] - 1}) '
+            f'in {time.perf_counter() - started:.1f}s'
+        ))
@@ -0,0 +1,55 @@
+import sqlite3
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from backend import caching
+from database.routers import replica_alias
+
+
+def sqlite_path(alias):
+    config = connections.settings[alias]
+    if config['ENGINE'] != 'django.db.backends.sqlite3':
+        raise CommandError(f'Database "{alias}" is not SQLite; replicate it with the database server instead')
+    return str(config['NAME'])
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database onto the local read replica (for testing replica routing)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep copying every N seconds, simulating replication lag (0 copies once)')
+
+    def handle(self, *args, **options):
+        alias = replica_alias()
+        if alias is None:
+            raise CommandError(
+                f'No "{getattr(settings, "REPLICA_DATABASE_ALIAS", "replica")}" database is configured; '
+                'set SQLITE_REPLICA_PATH'
+            )
+        primary, replica = sqlite_path(DEFAULT_DB_ALIAS), sqlite_path(alias)
+        if primary == replica:
+            raise CommandError('The primary and the replica are the same file')
+
+        while True:
+            started = time.perf_counter()
+            self.copy(primary, replica)
+            # Aggregates cached from the previous snapshot are now stale
+            caching.bump_version(caching.CLAIMS)
+            self.stdout.write(self.style.SUCCESS(
+                f'Copied {primary} to {replica} in {(time.perf_counter() - started) * 1000:.0f}ms'
+            ))
+            if options['interval'] <= 0:
+                return
+            time.sleep(options['interval'])
+
+    def copy(self, primary, replica):
+        """Snapshot the primary onto the replica with SQLite's online backup API."""
+        source = sqlite3.connect(primary, timeout=20)
+        target = sqlite3.connect(replica, timeout=20)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
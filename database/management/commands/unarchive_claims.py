@@ -0,0 +1,39 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from backend import caching
+from database import shards
+from database.archive import unarchive_claims
+from database.models import ArchivedClaim
+
+
+class Command(BaseCommand):
+    help = 'Move archived claims (with details, flags and notes) back into the live tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('claim_ids', nargs='*', type=int, help='Archived claim ids to restore')
+        parser.add_argument('--discharged-after', type=str,
+                            help='Also restore archived claims discharged on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--batch-size', type=int, help='Claims moved per transaction (default: ARCHIVE_BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        ids = set(options['claim_ids'])
+        if options['discharged_after']:
+            try:
+                after = datetime.strptime(options['discharged_after'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError(f'Invalid --discharged-after date: {options["discharged_after"]}')
+            for alias in shards.claim_databases():
+                ids.update(
+                    ArchivedClaim.objects.using(alias).filter(discharge_date__gte=after).values_list('id', flat=True)
+                )
+        if not ids:
+            raise CommandError('Give claim ids or --discharged-after')
+
+        # Ids archived on another shard are skipped by each shard's pass
+        restored = sum(shards.fan_out(unarchive_claims, ids, batch_size=options['batch_size']))
+        if restored:
+            caching.bump_version(caching.CLAIMS)
+        skipped = len(ids) - restored
+        self.stdout.write(self.style.SUCCESS(
+            f'Restored {restored} claims' + (f' ({skipped} ids were not archived)' if skipped else '')
+        ))
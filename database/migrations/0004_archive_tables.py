@@ -0,0 +1,82 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:15
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0003_dashboardevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedClaim',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('patient_name', models.CharField(max_length=200)),
+                ('billed_amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('paid_amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('status', models.CharField(max_length=50)),
+                ('insurer_name', models.CharField(max_length=200)),
+                ('discharge_date', models.DateField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('archived_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-discharge_date'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedClaimDetail',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('denial_reason', models.TextField(blank=True)),
+                ('cpt_codes', models.CharField(blank=True, max_length=500)),
+                ('claim', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='detail', to='database.archivedclaim')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedFlag',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField()),
+                ('claim', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='flags', to='database.archivedclaim')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedNote',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('text', models.TextField()),
+                ('created_at', models.DateTimeField()),
+                ('claim', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notes', to='database.archivedclaim')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchiveRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('insurer_name', models.CharField(max_length=200)),
+                ('status', models.CharField(max_length=50)),
+                ('claim_count', models.IntegerField(default=0)),
+                ('billed_total', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('paid_total', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('underpayment_total', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('flag_count', models.IntegerField(default=0)),
+                ('note_count', models.IntegerField(default=0)),
+                ('flagged_claim_count', models.IntegerField(default=0)),
+                ('noted_claim_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('insurer_name', 'status'), name='archive_rollup_insurer_status')],
+            },
+        ),
+    ]
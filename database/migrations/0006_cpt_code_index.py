@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0005_claim_change_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CptCode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=10, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ClaimCptCode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('claim', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cpt_links', to='database.claim')),
+                ('code', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='claim_links', to='database.cptcode')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['code', 'claim'], name='claim_cpt_code_lookup')],
+                'constraints': [models.UniqueConstraint(fields=('claim', 'code'), name='claim_cpt_code_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedClaimCptCode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('claim', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cpt_links', to='database.archivedclaim')),
+                ('code', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='database.cptcode')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['code', 'claim'], name='archived_cpt_code_lookup')],
+            },
+        ),
+    ]
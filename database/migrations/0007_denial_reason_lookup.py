@@ -0,0 +1,81 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+DETAIL_MODELS = ('ClaimDetail', 'ArchivedClaimDetail')
+
+
+def encode_denial_reasons(apps, schema_editor):
+    """Store each distinct reason once and point the details at it (one UPDATE per reason)."""
+    # The database being migrated, which is not the router's choice for shards
+    db_alias = schema_editor.connection.alias
+    DenialReason = apps.get_model('database', 'DenialReason')
+    for model_name in DETAIL_MODELS:
+        model = apps.get_model('database', model_name)
+        texts = (
+            model.objects.using(db_alias).exclude(denial_reason_text='')
+            .values_list('denial_reason_text', flat=True).distinct()
+        )
+        for text in list(texts):
+            reason, _ = DenialReason.objects.using(db_alias).get_or_create(text=text)
+            model.objects.using(db_alias).filter(denial_reason_text=text).update(denial_reason=reason)
+
+
+def decode_denial_reasons(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    DenialReason = apps.get_model('database', 'DenialReason')
+    for model_name in DETAIL_MODELS:
+        model = apps.get_model('database', model_name)
+        for reason in DenialReason.objects.using(db_alias).all():
+            model.objects.using(db_alias).filter(denial_reason=reason).update(denial_reason_text=reason.text)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0006_cpt_code_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DenialReason',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.CharField(max_length=500, unique=True)),
+            ],
+        ),
+        migrations.RenameField(
+            model_name='claimdetail',
+            old_name='denial_reason',
+            new_name='denial_reason_text',
+        ),
+        migrations.RenameField(
+            model_name='archivedclaimdetail',
+            old_name='denial_reason',
+            new_name='denial_reason_text',
+        ),
+        migrations.AddField(
+            model_name='claimdetail',
+            name='denial_reason',
+            field=models.ForeignKey(
+                blank=True, null=True, on_delete=django.db.models.deletion.PROTECT,
+                related_name='details', to='database.denialreason',
+            ),
+        ),
+        migrations.AddField(
+            model_name='archivedclaimdetail',
+            name='denial_reason',
+            field=models.ForeignKey(
+                blank=True, null=True, on_delete=django.db.models.deletion.PROTECT,
+                related_name='+', to='database.denialreason',
+            ),
+        ),
+        migrations.RunPython(encode_denial_reasons, decode_denial_reasons),
+        migrations.RemoveField(
+            model_name='claimdetail',
+            name='denial_reason_text',
+        ),
+        migrations.RemoveField(
+            model_name='archivedclaimdetail',
+            name='denial_reason_text',
+        ),
+    ]
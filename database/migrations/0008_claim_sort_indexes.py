@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:46
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0007_denial_reason_lookup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archivedclaim',
+            index=models.Index(fields=['discharge_date'], name='archivedclaim_discharge_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedclaim',
+            index=models.Index(fields=['billed_amount'], name='archivedclaim_billed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedclaim',
+            index=models.Index(fields=['paid_amount'], name='archivedclaim_paid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedclaim',
+            index=models.Index(models.ExpressionWrapper(django.db.models.expressions.CombinedExpression(models.F('billed_amount'), '-', models.F('paid_amount')), output_field=models.FloatField()), name='archivedclaim_underpaid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedclaim',
+            index=models.Index(fields=['patient_name'], name='archivedclaim_patient_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='claim',
+            index=models.Index(fields=['discharge_date'], name='claim_discharge_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='claim',
+            index=models.Index(fields=['billed_amount'], name='claim_billed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='claim',
+            index=models.Index(fields=['paid_amount'], name='claim_paid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='claim',
+            index=models.Index(models.ExpressionWrapper(django.db.models.expressions.CombinedExpression(models.F('billed_amount'), '-', models.F('paid_amount')), output_field=models.FloatField()), name='claim_underpaid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='claim',
+            index=models.Index(fields=['patient_name'], name='claim_patient_idx'),
+        ),
+    ]
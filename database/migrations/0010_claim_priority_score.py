@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0009_created_by_without_constraint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedclaim',
+            name='priority_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='claim',
+            name='priority_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='archivedclaim',
+            index=models.Index(fields=['priority_score'], name='archivedclaim_priority_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='claim',
+            index=models.Index(fields=['priority_score'], name='claim_priority_idx'),
+        ),
+    ]
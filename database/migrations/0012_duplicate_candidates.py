@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0011_saved_filters_and_worklists'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DuplicateGroup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('claim_ids', models.JSONField(default=list)),
+                ('size', models.IntegerField()),
+                ('score', models.FloatField(db_index=True)),
+                ('patient_name', models.CharField(max_length=200)),
+                ('discharge_date', models.DateField()),
+                ('billed_amount', models.DecimalField(decimal_places=2, max_digits=16)),
+                ('excess_billed', models.DecimalField(decimal_places=2, max_digits=16)),
+            ],
+            options={
+                'ordering': ['-score', 'id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DuplicateKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField()),
+                ('claim', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='database.claim')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('key', 'claim'), name='duplicate_key_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DuplicatePair',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('similarity', models.FloatField()),
+                ('claim', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='database.claim')),
+                ('other_claim', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='database.claim')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('claim', 'other_claim'), name='duplicate_pair_unique')],
+            },
+        ),
+    ]
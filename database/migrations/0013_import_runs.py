@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:16
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0012_duplicate_candidates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_id', models.CharField(max_length=32)),
+                ('mode', models.CharField(max_length=10)),
+                ('status', models.CharField(max_length=10)),
+                ('error', models.TextField(blank=True)),
+                ('claim_list_size', models.BigIntegerField(default=0)),
+                ('claim_detail_size', models.BigIntegerField(default=0)),
+                ('claim_rows', models.IntegerField(default=0)),
+                ('detail_rows', models.IntegerField(default=0)),
+                ('seconds', models.FloatField()),
+                ('queries', models.IntegerField()),
+                ('peak_memory', models.BigIntegerField()),
+                ('profile', models.JSONField(default=dict)),
+                ('cprofile_path', models.CharField(blank=True, max_length=500)),
+                ('started_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-started_at', '-id'],
+            },
+        ),
+    ]
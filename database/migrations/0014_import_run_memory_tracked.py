@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0013_import_runs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importrun',
+            name='memory_tracked',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AlterField(
+            model_name='importrun',
+            name='peak_memory',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
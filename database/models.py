@@ -1,10 +1,18 @@
 
 from django.db import models
+from django.db.models import ExpressionWrapper, F, FloatField
 from django.contrib.auth.models import User
 from django.utils import timezone
 
 
-class Claim(models.Model):
+# billed - paid, for sorting by underpayment. The wrapper keeps Django from
+# adding a second CAST to the index definition, so the index expression and
+# ORDER BY compile to the same SQL and SQLite can use claim_underpaid_idx.
+UNDERPAYMENT_SORT = ExpressionWrapper(F('billed_amount') - F('paid_amount'), output_field=FloatField())
+
+
+class ClaimFields(models.Model):
+    """Columns shared by live claims and their archived copies."""
     id = models.IntegerField(primary_key=True)
     patient_name = models.CharField(max_length=200)
     billed_amount = models.DecimalField(max_digits=12, decimal_places=2)
@@ -13,6 +21,11 @@ class Claim(models.Model):
     insurer_name = models.CharField(max_length=200)
     discharge_date = models.DateField()
     created_at = models.DateTimeField(default=timezone.now)
+    # Recovery priority, 0-100, written in batches by database/priority.py;
+    # archived claims keep 0
+    priority_score = models.FloatField(default=0)
+
+    is_archived = False
 
     def underpayment(self):
         return max(self.billed_amount - self.paid_amount, 0)
@@ -21,21 +34,89 @@ class Claim(models.Model):
         return f"Claim {self.id} - {self.patient_name}"
 
     class Meta:
+        abstract = True
         ordering = ['-discharge_date']
+        # One index per server-side sort column (see database/claim_query.py).
+        # SQLite ends every index entry with the rowid, which is the claim id,
+        # so each one also serves ORDER BY <column>, id and range filters on
+        # its column.
+        indexes = [
+            models.Index(fields=['discharge_date'], name='%(class)s_discharge_idx'),
+            models.Index(fields=['billed_amount'], name='%(class)s_billed_idx'),
+            models.Index(fields=['paid_amount'], name='%(class)s_paid_idx'),
+            models.Index(UNDERPAYMENT_SORT, name='%(class)s_underpaid_idx'),
+            models.Index(fields=['patient_name'], name='%(class)s_patient_idx'),
+            models.Index(fields=['priority_score'], name='%(class)s_priority_idx'),
+        ]
+
+
+class LoadedValuesMixin:
+    """Remember the column values an instance was loaded with, for the change log."""
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+
+class Claim(LoadedValuesMixin, ClaimFields):
+    pass
 
 
-class ClaimDetail(models.Model):
+class DenialReason(models.Model):
+    """One distinct denial reason sentence, shared by every detail that cites it (see database/denials.py)."""
+    text = models.CharField(max_length=500, unique=True)
+
+    def __str__(self):
+        return self.text
+
+
+class ClaimDetail(LoadedValuesMixin, models.Model):
     claim = models.OneToOneField(Claim, on_delete=models.CASCADE, related_name='detail')
-    denial_reason = models.TextField(blank=True)
+    denial_reason = models.ForeignKey(
+        DenialReason, on_delete=models.PROTECT, null=True, blank=True, related_name='details',
+    )
     cpt_codes = models.CharField(max_length=500, blank=True)
 
     def __str__(self):
         return f"Detail for Claim {self.claim.id}"
 
 
+class CptCode(models.Model):
+    """A CPT procedure code seen on a claim detail (see database/cpt.py)."""
+    code = models.CharField(max_length=10, unique=True)
+
+    def __str__(self):
+        return self.code
+
+
+class ClaimCptCode(models.Model):
+    """Claim to CPT code association parsed from ``ClaimDetail.cpt_codes``.
+
+    Indexed on (code, claim) so "claims that billed X" is an index range scan.
+    """
+    claim = models.ForeignKey(Claim, on_delete=models.CASCADE, related_name='cpt_links')
+    code = models.ForeignKey(CptCode, on_delete=models.PROTECT, related_name='claim_links')
+
+    def __str__(self):
+        return f"{self.code_id} on Claim {self.claim_id}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['claim', 'code'], name='claim_cpt_code_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['code', 'claim'], name='claim_cpt_code_lookup'),
+        ]
+
+
+# Users stay on the default database when claims are sharded (database/shards.py),
+# so the created_by columns of shard rows can't be enforced as foreign keys there
+
 class Flag(models.Model):
     claim = models.ForeignKey(Claim, on_delete=models.CASCADE, related_name='flags')
-    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, db_constraint=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -45,8 +126,269 @@ class Flag(models.Model):
 class Note(models.Model):
     claim = models.ForeignKey(Claim, on_delete=models.CASCADE, related_name='notes')
     text = models.TextField()
-    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, db_constraint=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"Note for Claim {self.claim.id}"
+
+
+class SavedFilter(models.Model):
+    """A user's saved dashboard filters and the worklist of claims they match (see database/worklists.py)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='saved_filters')
+    name = models.CharField(max_length=100)
+    # ClaimQuery.spec(): the filter query parameters, without sort order
+    spec = models.JSONField(default=dict)
+    # Size of the worklist, kept in step with its entries
+    claim_count = models.IntegerField(default=0)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.user})"
+
+    class Meta:
+        ordering = ['name']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='saved_filter_user_name_unique'),
+        ]
+
+
+class WorklistEntry(models.Model):
+    """A claim matched by a saved filter.
+
+    Like ``ClaimChange`` it holds a plain claim id, so worklists stay on the
+    default database when claims are sharded. The unique (filter, claim)
+    index is also what a worklist page is read from, in claim id order.
+    """
+    saved_filter = models.ForeignKey(SavedFilter, on_delete=models.CASCADE, related_name='entries', db_index=False)
+    claim_id = models.IntegerField()
+
+    def __str__(self):
+        return f"Claim {self.claim_id} in {self.saved_filter_id}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['saved_filter', 'claim_id'], name='worklist_entry_unique'),
+        ]
+
+
+# Duplicate-claim candidates (see database/duplicates.py), on the claim's
+# shard. The claim links are not enforced or cascaded, so archiving a claim
+# doesn't have to touch them; the next detection run drops the rows of claims
+# that left, and joins skip them until then.
+
+class DuplicateKey(models.Model):
+    """A blocking key of a live claim: claims sharing a key are compared with each other.
+
+    The unique (key, claim) index lists a block's claims in one range scan.
+    """
+    key = models.BigIntegerField()
+    claim = models.ForeignKey(Claim, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+
+    def __str__(self):
+        return f"Key {self.key} of Claim {self.claim_id}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['key', 'claim'], name='duplicate_key_unique'),
+        ]
+
+
+class DuplicatePair(models.Model):
+    """Two claims similar enough to be the same claim submitted twice.
+
+    Stored in both directions, so "candidates for claim X" is an index lookup
+    on ``claim_id`` alone.
+    """
+    claim = models.ForeignKey(
+        Claim, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+',
+    )
+    other_claim = models.ForeignKey(Claim, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    # 0-1, weighted by DUPLICATE_WEIGHTS
+    similarity = models.FloatField()
+
+    def __str__(self):
+        return f"Claim {self.claim_id} ~ Claim {self.other_claim_id} ({self.similarity:.2f})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['claim', 'other_claim'], name='duplicate_pair_unique'),
+        ]
+
+
+class DuplicateGroup(models.Model):
+    """Claims connected by duplicate pairs, rebuilt from the pairs after every detection run."""
+    claim_ids = models.JSONField(default=list)
+    size = models.IntegerField()
+    # Highest pair similarity in the group
+    score = models.FloatField(db_index=True)
+    patient_name = models.CharField(max_length=200)
+    discharge_date = models.DateField()
+    billed_amount = models.DecimalField(max_digits=16, decimal_places=2)
+    # Billed on every claim but the largest: what is at stake if they are duplicates
+    excess_billed = models.DecimalField(max_digits=16, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.size} possible duplicates for {self.patient_name}"
+
+    class Meta:
+        ordering = ['-score', 'id']
+
+
+class DashboardEvent(models.Model):
+    """Entry in the change feed that live dashboards follow over server-sent events."""
+    kind = models.CharField(max_length=20)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.kind} event {self.id}"
+
+    class Meta:
+        ordering = ['id']
+
+
+class ClaimChange(models.Model):
+    """One insert, update or delete of a claim or claim detail (see database/changes.py).
+
+    Rows are only ever appended; the id is the change's sequence number.
+    """
+    CLAIM = 'claim'
+    DETAIL = 'detail'
+
+    claim_id = models.IntegerField(db_index=True)
+    kind = models.CharField(max_length=10)
+    action = models.CharField(max_length=10)
+    # {field: [old, new]} for the tracked fields that changed
+    changes = models.JSONField(default=dict)
+    source = models.CharField(max_length=20, blank=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"Change {self.id}: {self.action} {self.kind} {self.claim_id}"
+
+    class Meta:
+        ordering = ['id']
+
+
+class ChangeCursor(models.Model):
+    """How far a named consumer has read the claim change log."""
+    name = models.CharField(max_length=100, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} at {self.position}"
+
+
+class ImportRun(models.Model):
+    """A profiled claims import (``load_claims --profile``, see database/import_profile.py)."""
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+
+    job_id = models.CharField(max_length=32)
+    mode = models.CharField(max_length=10)
+    status = models.CharField(max_length=10)
+    error = models.TextField(blank=True)
+    # File sizes in bytes, and rows read from each file
+    claim_list_size = models.BigIntegerField(default=0)
+    claim_detail_size = models.BigIntegerField(default=0)
+    claim_rows = models.IntegerField(default=0)
+    detail_rows = models.IntegerField(default=0)
+    seconds = models.FloatField()
+    queries = models.IntegerField()
+    # Highest memory traced by tracemalloc, in bytes; null for runs without memory tracking, whose
+    # timings are not slowed down by tracemalloc and so only compare with other such runs
+    memory_tracked = models.BooleanField(default=True)
+    peak_memory = models.BigIntegerField(null=True, blank=True)
+    # ImportProfile.summary(): stages, phases and batches
+    profile = models.JSONField(default=dict)
+    # cProfile dump written alongside, if any
+    cprofile_path = models.CharField(max_length=500, blank=True)
+    started_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"Import {self.job_id} ({self.status})"
+
+    @property
+    def rows_per_second(self):
+        return round((self.claim_rows + self.detail_rows) / self.seconds) if self.seconds else None
+
+    class Meta:
+        ordering = ['-started_at', '-id']
+
+
+# Cold storage for closed claims (see database/archive.py). Related names match
+# the live models so templates and lookups work on either.
+
+class ArchivedClaim(ClaimFields):
+    archived_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    is_archived = True
+
+    class Meta(ClaimFields.Meta):
+        pass
+
+
+class ArchivedClaimDetail(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    claim = models.OneToOneField(ArchivedClaim, on_delete=models.CASCADE, related_name='detail')
+    denial_reason = models.ForeignKey(DenialReason, on_delete=models.PROTECT, null=True, blank=True, related_name='+')
+    cpt_codes = models.CharField(max_length=500, blank=True)
+
+
+class ArchivedFlag(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    claim = models.ForeignKey(ArchivedClaim, on_delete=models.CASCADE, related_name='flags')
+    created_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', db_constraint=False,
+    )
+    created_at = models.DateTimeField()
+
+
+class ArchivedNote(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    claim = models.ForeignKey(ArchivedClaim, on_delete=models.CASCADE, related_name='notes')
+    text = models.TextField()
+    created_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', db_constraint=False,
+    )
+    created_at = models.DateTimeField()
+
+
+class ArchivedClaimCptCode(models.Model):
+    # Links carry no data of their own, so unlike the rows above they don't keep their ids
+    claim = models.ForeignKey(ArchivedClaim, on_delete=models.CASCADE, related_name='cpt_links')
+    code = models.ForeignKey(CptCode, on_delete=models.PROTECT, related_name='+')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['code', 'claim'], name='archived_cpt_code_lookup'),
+        ]
+
+
+class ArchiveRollup(models.Model):
+    """Running totals of the archived claims for one insurer and status.
+
+    Kept up to date by archive_claims()/unarchive_claims() so dashboard and
+    report statistics can include archived claims without scanning them.
+    """
+    insurer_name = models.CharField(max_length=200)
+    status = models.CharField(max_length=50)
+    claim_count = models.IntegerField(default=0)
+    billed_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    paid_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    underpayment_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    flag_count = models.IntegerField(default=0)
+    note_count = models.IntegerField(default=0)
+    flagged_claim_count = models.IntegerField(default=0)
+    noted_claim_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"Archived {self.status} claims for {self.insurer_name}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['insurer_name', 'status'], name='archive_rollup_insurer_status'),
+        ]
@@ -0,0 +1,228 @@
+"""Recovery-priority scores: which open claims are most worth chasing next.
+
+``Claim.priority_score`` runs from 0 to 100 and is indexed, so "the top 100
+to work next" is a walk down that index (``?sort=-priority`` on the
+dashboard). It is a weighted mix (``PRIORITY_WEIGHTS``) of:
+
+- underpayment: billed minus paid, full marks at ``PRIORITY_UNDERPAYMENT_CAP``
+- shortfall: how far the claim's paid/billed ratio falls below its insurer's
+  ratio over all live claims
+- denial reason: how often a claim citing the reason is recovered on appeal
+  (``DENIAL_REASON_RECOVERABILITY``, overridden per reason text by
+  ``PRIORITY_DENIAL_REASON_RECOVERABILITY``)
+- age: days since discharge, full marks at ``PRIORITY_AGE_DAYS``, so older
+  receivables come up first
+- activity: flags and notes left on the claim, full marks at ``ACTIVITY_CAP``
+
+A claim with nothing left to recover (paid in full) scores 0, as do archived
+claims. Scoring works a batch at a time: one query reads the batch's amounts
+and reasons, two more count its flags and notes, and a single UPDATE writes
+the scores that changed. No model instances are loaded and no query runs per
+claim.
+
+``score_changed()`` is incremental. It follows the claim change log with the
+``priority-score`` consumer, and the flag and note tables by id, and rescores
+only the claims they touched. ``load_claims`` runs it after every import.
+``score_all()`` rescores every live claim; run it daily (``score_claims
+--all``), because ages and insurer ratios move for claims that don't change.
+"""
+from collections import Counter, defaultdict
+from datetime import date
+
+from django.conf import settings
+from django.db.models import Sum
+
+from . import changes, shards
+from .models import ChangeCursor, Claim, DenialReason, Flag, Note
+
+CONSUMER = 'priority-score'
+
+DEFAULT_WEIGHTS = {
+    'underpayment': 0.35,
+    'shortfall': 0.2,
+    'denial_reason': 0.2,
+    'age': 0.1,
+    'activity': 0.15,
+}
+
+# Share of claims denied for the reason that are recovered on appeal: coding
+# and paperwork problems usually are, coverage and eligibility denials rarely
+DENIAL_REASON_RECOVERABILITY = {
+    'Coding error / modifier missing': 0.9,
+    'Insufficient documentation': 0.85,
+    'Invalid patient information': 0.85,
+    'Authorization not obtained': 0.5,
+    'Out-of-network provider': 0.4,
+    'Experimental/investigational procedure': 0.35,
+    'Duplicate claim submission': 0.3,
+    'Service not covered under plan': 0.3,
+    'Claim filed too late': 0.2,
+    'Policy terminated before service date': 0.1,
+}
+# Reasons not listed above
+DEFAULT_RECOVERABILITY = 0.5
+
+# Flags plus notes at which the activity component is full
+ACTIVITY_CAP = 3
+
+CLAIM_COLUMNS = [
+    'id', 'billed_amount', 'paid_amount', 'insurer_name', 'discharge_date', 'detail__denial_reason_id',
+    'priority_score',
+]
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _share(value, cap):
+    return min(max(value / cap, 0.0), 1.0) if cap else 0.0
+
+
+def insurer_ratios():
+    """({insurer: paid/billed over its live claims}, the same ratio over all live claims)."""
+    totals = defaultdict(lambda: [0.0, 0.0])
+    for rows in shards.fan_out(
+        lambda: list(Claim.objects.values_list('insurer_name').annotate(Sum('billed_amount'), Sum('paid_amount')))
+    ):
+        for insurer, billed, paid in rows:
+            totals[insurer][0] += float(billed or 0)
+            totals[insurer][1] += float(paid or 0)
+    billed = sum(billed for billed, _ in totals.values())
+    paid = sum(paid for _, paid in totals.values())
+    ratios = {insurer: paid / billed for insurer, (billed, paid) in totals.items() if billed}
+    return ratios, (paid / billed if billed else 1.0)
+
+
+class Scorer:
+    """Scores batches of claims against one snapshot of the weights, insurer ratios and date.
+
+    Build one per run: it reads the insurer ratios and the reason catalog once.
+    """
+
+    def __init__(self, today=None):
+        self.today = today or date.today()
+        self.weights = {**DEFAULT_WEIGHTS, **_setting('PRIORITY_WEIGHTS', {})}
+        self.underpayment_cap = _setting('PRIORITY_UNDERPAYMENT_CAP', 250000)
+        self.age_days = _setting('PRIORITY_AGE_DAYS', 730)
+        self.ratios, self.overall_ratio = insurer_ratios()
+        recoverability = {**DENIAL_REASON_RECOVERABILITY, **_setting('PRIORITY_DENIAL_REASON_RECOVERABILITY', {})}
+        self.reasons = {
+            reason_id: recoverability.get(text, DEFAULT_RECOVERABILITY)
+            for reason_id, text in DenialReason.objects.values_list('id', 'text')
+        }
+
+    def score(self, billed, paid, insurer, discharged, reason_id, activity):
+        billed = float(billed)
+        paid = float(paid)
+        underpayment = billed - paid
+        if underpayment <= 0:
+            return 0.0
+        expected = self.ratios.get(insurer, self.overall_ratio)
+        components = {
+            'underpayment': _share(underpayment, self.underpayment_cap),
+            'shortfall': _share(expected - paid / billed, expected) if billed > 0 else 0.0,
+            'denial_reason': 0.0 if reason_id is None else self.reasons.get(reason_id, DEFAULT_RECOVERABILITY),
+            'age': _share((self.today - discharged).days, self.age_days),
+            'activity': _share(activity, ACTIVITY_CAP),
+        }
+        total = sum(self.weights.values())
+        return round(100 * sum(self.weights[name] * value for name, value in components.items()) / total, 2)
+
+    def score_batch(self, queryset):
+        """Score the claims of ``queryset`` (already limited to one batch).
+
+        Returns (claims scored, scores written, highest claim id seen).
+        """
+        rows = list(queryset.values_list(*CLAIM_COLUMNS))
+        if not rows:
+            return 0, 0, None
+        ids = [row[0] for row in rows]
+        activity = Counter()
+        for model in (Flag, Note):
+            activity.update(model.objects.filter(claim_id__in=ids).values_list('claim_id', flat=True))
+        updated = []
+        for claim_id, billed, paid, insurer, discharged, reason_id, current in rows:
+            score = self.score(billed, paid, insurer, discharged, reason_id, activity[claim_id])
+            if score != current:
+                updated.append(Claim(id=claim_id, priority_score=score))
+        if updated:
+            Claim.objects.bulk_update(updated, ['priority_score'])
+        return len(rows), len(updated), ids[-1]
+
+    def score_ids(self, claim_ids, batch_size=None):
+        """Rescore the live claims among ``claim_ids`` on every claim database; returns (scored, written)."""
+        batch_size = batch_size or _setting('PRIORITY_BATCH_SIZE', 1000)
+        claim_ids = sorted(claim_ids)
+
+        def score_here():
+            scored = written = 0
+            for start in range(0, len(claim_ids), batch_size):
+                batch_scored, batch_written, _ = self.score_batch(
+                    Claim.objects.filter(id__in=claim_ids[start:start + batch_size]).order_by('id')
+                )
+                scored += batch_scored
+                written += batch_written
+            return scored, written
+        return _add_up(shards.fan_out(score_here))
+
+    def score_every_claim(self, batch_size=None, progress=None):
+        """Rescore all live claims, walking each claim database by id; returns (scored, written)."""
+        batch_size = batch_size or _setting('PRIORITY_BATCH_SIZE', 1000)
+
+        def score_here():
+            scored = written = 0
+            last_id = 0
+            while True:
+                batch_scored, batch_written, last_id = self.score_batch(
+                    Claim.objects.filter(id__gt=last_id).order_by('id')[:batch_size]
+                )
+                if not batch_scored:
+                    return scored, written
+                scored += batch_scored
+                written += batch_written
+                if progress:
+                    progress(scored)
+        return _add_up(shards.fan_out(score_here))
+
+
+def _add_up(results):
+    return tuple(map(sum, zip(*results))) if results else (0, 0)
+
+
+def score_all(batch_size=None, progress=None):
+    """Rescore every live claim and mark the change log and flags/notes as read; returns (scored, written).
+
+    Cursors are read before scoring, so changes made while it runs are picked
+    up again by the next ``score_changed()``.
+    """
+    position = changes.latest_sequence()
+    activity = changes.ActivityCursor(CONSUMER)
+    positions = activity.latest()
+    result = Scorer().score_every_claim(batch_size, progress)
+    changes.ChangeConsumer(CONSUMER).reset(position)
+    activity.save(positions)
+    return result
+
+
+def score_changed(batch_size=None):
+    """Rescore the claims changed, flagged or noted since the last run; returns (scored, written).
+
+    The first run, when the consumer has no cursor yet, scores everything.
+    """
+    if not ChangeCursor.objects.filter(name=CONSUMER).exists():
+        return score_all(batch_size)
+    scorer = Scorer()
+    activity = changes.ActivityCursor(CONSUMER)
+    claim_ids, positions = activity.claims_since()
+    scored, written = scorer.score_ids(claim_ids, batch_size)
+    activity.save(positions)
+
+    totals = [scored, written]
+
+    def rescore(batch):
+        batch_scored, batch_written = scorer.score_ids({change.claim_id for change in batch}, batch_size)
+        totals[0] += batch_scored
+        totals[1] += batch_written
+    changes.ChangeConsumer(CONSUMER).consume(rescore, batch_size=batch_size or _setting('PRIORITY_BATCH_SIZE', 1000))
+    return tuple(totals)
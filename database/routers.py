@@ -0,0 +1,94 @@
+"""Primary/replica database routing.
+
+Writes always go to ``default``. Reads go to the replica alias named by
+``REPLICA_DATABASE_ALIAS`` only inside code marked with ``use_replica()`` (or
+the ``reads_from_replica`` view decorator), and never while the request is
+pinned to the primary: unsafe requests and requests arriving within
+``REPLICA_PIN_SECONDS`` of one (see ``backend.middleware.PrimaryPinMiddleware``)
+read their own writes from the primary. When no replica is configured every
+read simply stays on ``default``.
+
+Sharded claim models (see ``database.shards``) are routed to their shard
+first; the replica only applies to what stays on ``default``.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from . import shards
+
+_use_replica = ContextVar('use_replica', default=False)
+_pinned_to_primary = ContextVar('pinned_to_primary', default=False)
+
+
+def replica_alias():
+    """The configured replica alias, or None when it is not in DATABASES."""
+    alias = getattr(settings, 'REPLICA_DATABASE_ALIAS', None)
+    return alias if alias and alias in connections.settings else None
+
+
+def read_alias():
+    """Database alias reads should use in the current context."""
+    alias = replica_alias()
+    if alias and _use_replica.get() and not _pinned_to_primary.get():
+        return alias
+    return DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def use_replica():
+    """Send reads inside the block to the replica (unless pinned to the primary)."""
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+@contextmanager
+def pin_to_primary():
+    """Keep every read inside the block on the primary."""
+    token = _pinned_to_primary.set(True)
+    try:
+        yield
+    finally:
+        _pinned_to_primary.reset(token)
+
+
+def reads_from_replica(view):
+    """Decorator for read-only views (sync or async) whose queries may use the replica."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            with use_replica():
+                return await view(request, *args, **kwargs)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with use_replica():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    """Route sharded claim models to their shard, and other reads to the replica when allowed."""
+
+    def db_for_read(self, model, **hints):
+        return shards.route(model, hints) or read_alias()
+
+    def db_for_write(self, model, **hints):
+        return shards.route(model, hints) or DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same data, and shard rows only point at
+        # default rows whose ids are kept the same everywhere
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of the primary and is never migrated directly
+        return db != replica_alias()
@@ -0,0 +1,193 @@
+"""Horizontal sharding of claims by insurer.
+
+When ``CLAIM_SHARDS`` lists database aliases, every claim lives in exactly one
+of them together with its detail, flags, notes, CPT code links, duplicate
+candidates and archived copies (``SHARDED_MODELS``). A new claim goes to ``shard_for(insurer_name)``,
+a stable hash of the insurer, so each payer's claims sit together; a claim
+whose insurer later changes stays on the shard it was first written to.
+``default`` keeps everything else: users, the change log, dashboard events and
+the denial reason and CPT code catalogs. Catalog rows are copied into a shard,
+with the same ids, the first time the shard references them, so joins and
+foreign keys resolve locally.
+
+Code reaches a shard in two ways: querysets pinned with ``.using(alias)`` for
+every alias in ``claim_databases()``, or plain queries inside
+``use_shard(alias)``, which ``database.routers`` sends to that shard. Rows
+loaded from a shard keep using it for related lookups and saves, so
+``claim.flags.create(...)`` writes next to the claim. Reads fan out to every
+shard and the callers merge the results. Without shards ``claim_databases()``
+is ``[None]`` and every query routes exactly as before.
+"""
+import asyncio
+import multiprocessing
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import django
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Models whose rows are placed on a shard with their claim
+SHARDED_MODELS = {
+    'database.claim', 'database.claimdetail', 'database.flag', 'database.note', 'database.claimcptcode',
+    'database.archivedclaim', 'database.archivedclaimdetail', 'database.archivedflag', 'database.archivednote',
+    'database.archivedclaimcptcode', 'database.archiverollup', 'database.duplicatekey', 'database.duplicatepair',
+    'database.duplicategroup',
+}
+
+_current = ContextVar('claim_shard', default=None)
+
+# Worker processes are spawned rather than forked: forking a threaded web
+# worker or a process with open database connections is unsafe
+_worker_context = multiprocessing.get_context('spawn')
+# Queue a worker_pool() process shares with the process that started it
+_worker_messages = None
+
+
+def shard_aliases():
+    """Configured shard aliases, empty when claims are not sharded."""
+    return list(getattr(settings, 'CLAIM_SHARDS', []))
+
+
+def is_sharded():
+    return bool(shard_aliases())
+
+
+def claim_databases():
+    """Aliases to fan claim reads out to; ``[None]`` (the router's choice) without shards."""
+    return shard_aliases() or [None]
+
+
+def shard_for(insurer_name):
+    """Alias a new claim from ``insurer_name`` is written to.
+
+    CRC32 of the normalized name rather than ``hash()``, which is salted per
+    process. Adding a shard changes where new claims of some insurers go;
+    existing claims stay put and are still found by every fan-out read.
+    """
+    aliases = shard_aliases()
+    if not aliases:
+        return DEFAULT_DB_ALIAS
+    key = zlib.crc32((insurer_name or '').strip().casefold().encode('utf-8'))
+    return aliases[key % len(aliases)]
+
+
+def current_shard():
+    return _current.get()
+
+
+def write_alias():
+    """Alias that writes in the current context go to, for ``transaction.atomic(using=...)``."""
+    return current_shard() or DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def use_shard(alias):
+    """Route sharded models inside the block to ``alias`` (``None`` leaves routing alone)."""
+    if alias is None:
+        yield
+        return
+    token = _current.set(alias)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def route(model, hints):
+    """Shard for a query on ``model``, or None to fall back to primary/replica routing."""
+    if model._meta.label_lower not in SHARDED_MODELS:
+        return None
+    instance = hints.get('instance')
+    if instance is not None and instance._state.db in shard_aliases():
+        return instance._state.db
+    return current_shard()
+
+
+def fan_out(func, *args, **kwargs):
+    """Call ``func`` once per claim database inside ``use_shard()``; results in ``claim_databases()`` order."""
+    results = []
+    for alias in claim_databases():
+        with use_shard(alias):
+            results.append(func(*args, **kwargs))
+    return results
+
+
+async def afan_out(func, *args, **kwargs):
+    """Await ``func`` on every claim database together; results in ``claim_databases()`` order."""
+    async def run(alias):
+        with use_shard(alias):
+            return await func(*args, **kwargs)
+    return await asyncio.gather(*(run(alias) for alias in claim_databases()))
+
+
+def get_claim(queryset, pk):
+    """Claim ``pk`` from whichever database holds it; raises ``DoesNotExist`` when none does."""
+    for alias in claim_databases():
+        try:
+            return queryset.using(alias).get(pk=pk)
+        except queryset.model.DoesNotExist:
+            continue
+    raise queryset.model.DoesNotExist(f'{queryset.model.__name__} {pk} does not exist')
+
+
+async def aget_claim(queryset, pk):
+    for alias in claim_databases():
+        try:
+            return await queryset.using(alias).aget(pk=pk)
+        except queryset.model.DoesNotExist:
+            continue
+    raise queryset.model.DoesNotExist(f'{queryset.model.__name__} {pk} does not exist')
+
+
+def count(model, **filters):
+    """Rows of a sharded model matching ``filters``, summed over every claim database."""
+    return sum(model.objects.using(alias).filter(**filters).count() for alias in claim_databases())
+
+
+def copy_lookups(model, rows, field, copied):
+    """Copy catalog rows ({id: value of ``field``}) into the current shard, keeping their ids.
+
+    ``copied`` is the caller's {alias: ids} record of what it already copied,
+    so each row is written once per shard. A no-op outside ``use_shard()``.
+    """
+    alias = current_shard()
+    if alias is None:
+        return
+    done = copied.setdefault(alias, set())
+    missing = {row_id: value for row_id, value in rows.items() if row_id not in done}
+    if missing:
+        model.objects.using(alias).bulk_create(
+            [model(id=row_id, **{field: value}) for row_id, value in missing.items()], ignore_conflicts=True,
+        )
+        done.update(missing)
+
+
+def worker_queue():
+    """Queue to pass to ``worker_pool()`` for messages from its workers to the caller."""
+    return _worker_context.Queue()
+
+
+def _start_worker(messages):
+    global _worker_messages
+    _worker_messages = messages
+    django.setup()
+
+
+def worker_pool(workers, messages=None):
+    """Process pool for per-shard work that should run in parallel, not just concurrently.
+
+    Python threads share one interpreter lock, so CPU-bound work such as row
+    by row imports only speeds up across processes. Each worker sets Django
+    up before its first task and reaches ``messages`` via ``worker_messages()``.
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=_worker_context, initializer=_start_worker, initargs=(messages,),
+    )
+
+
+def worker_messages():
+    """The queue given to ``worker_pool()``, inside one of its workers."""
+    return _worker_messages
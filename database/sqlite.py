@@ -0,0 +1,20 @@
+"""SQLite performance profile applied to every new connection."""
+from django.conf import settings
+
+# Pragmas that are safe to set on any connection, in the order they are applied
+PROFILE_PRAGMAS = ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size', 'temp_store')
+
+
+def apply_sqlite_profile(sender, connection, **kwargs):
+    """Apply ``settings.SQLITE_PROFILE`` pragmas when Django opens a SQLite connection."""
+    profile = getattr(settings, 'SQLITE_PROFILE', None)
+    if connection.vendor != 'sqlite' or not profile:
+        return
+    # In-memory test databases cannot use WAL; the remaining pragmas still apply
+    in_memory = connection.is_in_memory_db()
+    with connection.cursor() as cursor:
+        for pragma in PROFILE_PRAGMAS:
+            value = profile.get(pragma)
+            if value is None or (pragma == 'journal_mode' and in_memory):
+                continue
+            cursor.execute(f'PRAGMA {pragma} = {value}')
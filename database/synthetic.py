@@ -0,0 +1,171 @@
+"""Synthetic claim data for benchmarks, load tests and concurrency checks."""
+import os
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from . import changes, cpt, denials, shards
+from .models import Claim, ClaimChange, ClaimDetail, Flag, Note
+
+STATUSES = ['Under Review', 'Paid', 'Denied', 'Underpaid']
+STATUS_WEIGHTS = [64, 21, 15, 5]
+INSURERS = ['Aetna', 'Blue Cross', 'Cigna', 'Self Funded Inc.', 'United Healthcare']
+DENIAL_REASONS = [
+    'Policy terminated before service date',
+    'Experimental/investigational procedure',
+    'Insufficient documentation',
+    'Coding error / modifier missing',
+    'Authorization not obtained',
+    'Duplicate claim submission',
+    'Invalid patient information',
+    'Out-of-network provider',
+    'Claim filed too late',
+    'Service not covered under plan',
+]
+CPT_CODES = [
+    '99204', '99213', '99214', '99215', '82947', '99406', '90834', '90837',
+    '93000', '36415', '80053', '85025', '71046', '97110', '99283', '99284',
+]
+FIRST_NAMES = ['Virginia', 'Andrew', 'Maria', 'James', 'Linda', 'Robert', 'Patricia', 'Michael', 'Susan', 'David']
+LAST_NAMES = ['Rhodes', 'Hunt', 'Garcia', 'Smith', 'Johnson', 'Brown', 'Lee', 'Walker', 'Young', 'King']
+
+
+def synthetic_claims(count, start_id=1, seed=0):
+    """Yield ``count`` claim dicts shaped like rows of claim_list_data.csv."""
+    rng = random.Random(seed)
+    base_date = date(2022, 1, 1)
+    for claim_id in range(start_id, start_id + count):
+        billed = Decimal(rng.randint(10_000, 80_000_000)) / 100
+        status = rng.choices(STATUSES, STATUS_WEIGHTS)[0]
+        if status == 'Paid':
+            paid = billed
+        elif status == 'Denied':
+            paid = Decimal('0.00')
+        else:
+            paid = (billed * Decimal(rng.randint(0, 95)) / 100).quantize(Decimal('0.01'))
+        yield {
+            'id': claim_id,
+            'patient_name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+            'billed_amount': billed,
+            'paid_amount': paid,
+            'status': status,
+            'insurer_name': rng.choice(INSURERS),
+            'discharge_date': base_date + timedelta(days=rng.randint(0, 1000)),
+            'denial_reason': rng.choice(DENIAL_REASONS) if status == 'Denied' or rng.random() < 0.6 else '',
+            'cpt_codes': ','.join(rng.sample(CPT_CODES, rng.randint(1, 3))),
+        }
+
+
+def write_import_files(directory, claims):
+    """Write claims as the pipe-delimited list/detail pair load_claims expects.
+
+    Returns ``(claim_list_path, claim_detail_path)``.
+    """
+    list_path = os.path.join(directory, 'claim_list.csv')
+    detail_path = os.path.join(directory, 'claim_detail.csv')
+    with open(list_path, 'w', encoding='utf-8') as list_file, \
+            open(detail_path, 'w', encoding='utf-8') as detail_file:
+        list_file.write('id|patient_name|billed_amount|paid_amount|status|insurer_name|discharge_date\n')
+        for detail_id, claim in enumerate(claims, start=1):
+            list_file.write(
+                f"{claim['id']}|{claim['patient_name']}|{claim['billed_amount']}|{claim['paid_amount']}|"
+                f"{claim['status']}|{claim['insurer_name']}|{claim['discharge_date']:%Y-%m-%d}\n"
+            )
+            detail_file.write(f"{detail_id}|{claim['id']}|{claim['denial_reason'] or 'N/A'}|{claim['cpt_codes']}\n")
+    return list_path, detail_path
+
+
+def resubmissions(claims, rate, start_id, seed=0):
+    """Yield near-duplicate copies of about ``rate`` of ``claims``, under new ids from ``start_id``.
+
+    A copy is what a payer resubmission looks like: same insurer, discharge
+    date and codes, the patient name reformatted or misspelled, the billed
+    amount sometimes adjusted. Each yielded dict has the copied claim's id in
+    ``resubmission_of``.
+    """
+    rng = random.Random(seed)
+    claim_id = start_id
+    for claim in claims:
+        if rng.random() >= rate:
+            continue
+        first, last = claim['patient_name'].split(' ', 1)
+        name = rng.choice([
+            claim['patient_name'],
+            f'{last}, {first}',
+            claim['patient_name'].upper(),
+            # One letter dropped
+            f'{first} {last[:-2]}{last[-1]}',
+        ])
+        billed = claim['billed_amount']
+        if rng.random() < 0.3:
+            billed = (billed * Decimal(rng.randint(98, 102)) / 100).quantize(Decimal('0.01'))
+        codes = claim['cpt_codes'].split(',')
+        rng.shuffle(codes)
+        yield {
+            **claim,
+            'id': claim_id,
+            'patient_name': name,
+            'billed_amount': billed,
+            'paid_amount': Decimal('0.00') if rng.random() < 0.5 else min(claim['paid_amount'], billed),
+            'status': 'Under Review',
+            'cpt_codes': ','.join(codes),
+            'resubmission_of': claim['id'],
+        }
+        claim_id += 1
+
+
+def seed_database(count, start_id=1, seed=0, batch_size=5000, annotate_every=50):
+    """Bulk-insert ``count`` synthetic claims with details straight into the database.
+
+    Every ``annotate_every``-th claim also gets a flag and a note so views that
+    prefetch them have something to load. With sharded claims each claim goes
+    to its insurer's shard. Returns the number of claims created.
+    """
+    return seed_rows(synthetic_claims(count, start_id, seed), batch_size, annotate_every)
+
+
+def seed_rows(claims, batch_size=5000, annotate_every=50):
+    """Bulk-insert claim dicts shaped like ``synthetic_claims()``'s; returns how many were inserted."""
+    batch = []
+    catalog = cpt.CodeCatalog()
+    reasons = denials.ReasonCatalog()
+    inserted = 0
+
+    def write(rows):
+        for row in rows:
+            row['denial_reason_id'] = reasons.id_for(row['denial_reason'])
+        Claim.objects.bulk_create(
+            Claim(**{key: row[key] for key in (
+                'id', 'patient_name', 'billed_amount', 'paid_amount', 'status', 'insurer_name', 'discharge_date',
+            )}) for row in rows
+        )
+        ClaimDetail.objects.bulk_create(
+            ClaimDetail(claim_id=row['id'], denial_reason_id=row['denial_reason_id'], cpt_codes=row['cpt_codes'])
+            for row in rows
+        )
+        cpt.sync_claim_codes({row['id']: row['cpt_codes'] for row in rows}, catalog)
+        changes.record_many(
+            changes.change(kind, row['id'], changes.INSERT, new=changes.tracked_values(kind, row), source='seed')
+            for row in rows for kind in (ClaimChange.CLAIM, ClaimChange.DETAIL)
+        )
+        annotated = [row['id'] for row in rows if annotate_every and row['id'] % annotate_every == 0]
+        Flag.objects.bulk_create(Flag(claim_id=claim_id) for claim_id in annotated)
+        Note.objects.bulk_create(Note(claim_id=claim_id, text='Synthetic note') for claim_id in annotated)
+
+    def flush():
+        groups = {}
+        for row in batch:
+            groups.setdefault(shards.shard_for(row['insurer_name']) if shards.is_sharded() else None, []).append(row)
+        for alias, rows in groups.items():
+            with shards.use_shard(alias):
+                write(rows)
+        batch.clear()
+
+    for row in claims:
+        batch.append(row)
+        inserted += 1
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return inserted
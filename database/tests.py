@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TransactionTestCase
+
+from . import changes, worklists
+from .models import Claim, SavedFilter, WorklistEntry
+
+LIST_HEADER = 'id|patient_name|billed_amount|paid_amount|status|insurer_name|discharge_date'
+DETAIL_HEADER = 'id|claim_id|denial_reason|cpt_codes'
+
+
+class ImportHooksTests(TransactionTestCase):
+    """The post-import hooks see the changes of the import that just committed."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+
+    def load(self, claims):
+        """Import ``claims`` ((id, status, billed, paid) tuples) with their hooks."""
+        list_path = os.path.join(self.temp_dir, 'claims.csv')
+        detail_path = os.path.join(self.temp_dir, 'details.csv')
+        with open(list_path, 'w') as f:
+            f.write('\n'.join([LIST_HEADER] + [
+                f'{claim_id}|Patient {claim_id}|{billed}|{paid}|{status}|United Healthcare|2024-01-15'
+                for claim_id, status, billed, paid in claims
+            ]) + '\n')
+        with open(detail_path, 'w') as f:
+            f.write('\n'.join([DETAIL_HEADER] + [
+                f'{claim_id}|{claim_id}|N/A|99204' for claim_id, _, _, _ in claims
+            ]) + '\n')
+        call_command('load_claims', list_path, detail_path, '--force', stdout=StringIO())
+
+    def test_hooks_apply_the_import_just_committed(self):
+        self.load([(1, 'Paid', '1000.00', '1000.00'), (2, 'Paid', '2000.00', '2000.00')])
+        saved_filter = SavedFilter.objects.create(
+            user=User.objects.create_user('analyst'), name='Denied', spec={'status': 'Denied'},
+        )
+        worklists.rebuild(saved_filter)
+        score_before = Claim.objects.get(id=2).priority_score
+
+        # Incremental runs now: every consumer has a cursor
+        self.load([(1, 'Paid', '1000.00', '1000.00'), (2, 'Denied', '200000.00', '0.00')])
+
+        latest = changes.latest_sequence()
+        positions = dict(changes.log_cursors().values_list('name', 'position'))
+        self.assertEqual(positions, {'priority-score': latest, 'worklists': latest, 'duplicates': latest})
+        self.assertGreater(Claim.objects.get(id=2).priority_score, score_before)
+        self.assertEqual(
+            list(WorklistEntry.objects.filter(saved_filter=saved_filter).values_list('claim_id', flat=True)), [2],
+        )
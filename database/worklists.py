@@ -0,0 +1,134 @@
+"""Saved filters and their materialized worklists.
+
+An analyst saves the dashboard's current filters under a name
+(``SavedFilter.spec`` holds ``ClaimQuery.spec()``). The ids of the live claims
+they match are written to ``WorklistEntry``, and the match count to
+``SavedFilter.claim_count``. Opening a worklist reads one page of ids from the
+(filter, claim) index plus the stored count. It never re-runs the filter's
+COUNT and page queries over the claim tables.
+
+``refresh()`` keeps worklists current incrementally. It follows the claim
+change log with the ``worklists`` consumer, and the flag and note tables by id
+(for the flagged and has-notes filters). Every saved filter is re-evaluated
+against only the claims that changed, and the entries and counts are adjusted
+in the same transaction that advances the cursor. ``load_claims`` runs it
+after every import; ``manage.py refresh_worklists --interval N`` keeps it
+running so flags and notes show up within N seconds.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import changes
+from .claim_query import ClaimQuery
+from .models import ChangeCursor, SavedFilter, WorklistEntry
+
+CONSUMER = 'worklists'
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def query_for(saved_filter):
+    return ClaimQuery.from_params(saved_filter.spec, strict=False)
+
+
+def matching_ids(saved_filter, claim_ids=None):
+    """Ids of the live claims ``saved_filter`` matches, among ``claim_ids`` when given."""
+    matched = set()
+    for queryset in query_for(saved_filter).querysets():
+        queryset = queryset.order_by()
+        if claim_ids is not None:
+            queryset = queryset.filter(id__in=claim_ids)
+        matched.update(queryset.values_list('id', flat=True))
+    return matched
+
+
+def rebuild(saved_filter):
+    """Re-materialize one worklist from scratch; returns its size."""
+    claim_ids = sorted(matching_ids(saved_filter))
+    with transaction.atomic():
+        WorklistEntry.objects.filter(saved_filter=saved_filter).delete()
+        WorklistEntry.objects.bulk_create(
+            [WorklistEntry(saved_filter=saved_filter, claim_id=claim_id) for claim_id in claim_ids],
+            batch_size=_setting('WORKLIST_BATCH_SIZE', 1000),
+        )
+        SavedFilter.objects.filter(id=saved_filter.id).update(
+            claim_count=len(claim_ids), refreshed_at=timezone.now(),
+        )
+    saved_filter.claim_count = len(claim_ids)
+    return len(claim_ids)
+
+
+def save_filter(user, name, query):
+    """Save ``query``'s filters for ``user`` under ``name`` (replacing one of the same name) and materialize them."""
+    saved_filter, _ = SavedFilter.objects.update_or_create(user=user, name=name, defaults={'spec': query.spec()})
+    rebuild(saved_filter)
+    return saved_filter
+
+
+def apply_changes(claim_ids):
+    """Add or drop ``claim_ids`` in every worklist according to their current state; returns entries changed."""
+    claim_ids = set(claim_ids)
+    if not claim_ids:
+        return 0
+    changed = 0
+    for saved_filter in SavedFilter.objects.all():
+        matched = matching_ids(saved_filter, claim_ids)
+        entries = WorklistEntry.objects.filter(saved_filter=saved_filter)
+        listed = set(entries.filter(claim_id__in=claim_ids).values_list('claim_id', flat=True))
+        added = matched - listed
+        removed = listed - matched
+        if added:
+            WorklistEntry.objects.bulk_create(
+                [WorklistEntry(saved_filter=saved_filter, claim_id=claim_id) for claim_id in added],
+            )
+        if removed:
+            entries.filter(claim_id__in=removed).delete()
+        SavedFilter.objects.filter(id=saved_filter.id).update(
+            claim_count=F('claim_count') + len(added) - len(removed), refreshed_at=timezone.now(),
+        )
+        changed += len(added) + len(removed)
+    return changed
+
+
+def rebuild_all():
+    """Re-materialize every worklist and mark the change log and flags/notes as read; returns entries written."""
+    position = changes.latest_sequence()
+    activity = changes.ActivityCursor(CONSUMER)
+    positions = activity.latest()
+    written = sum(rebuild(saved_filter) for saved_filter in SavedFilter.objects.all())
+    changes.ChangeConsumer(CONSUMER).reset(position)
+    activity.save(positions)
+    return written
+
+
+def refresh(batch_size=None):
+    """Bring every worklist up to date with the claims changed, flagged or noted since the last run.
+
+    Returns the number of entries added or removed. The first run, when the
+    consumer has no cursor yet, rebuilds every worklist.
+    """
+    if not ChangeCursor.objects.filter(name=CONSUMER).exists():
+        return rebuild_all()
+    if not SavedFilter.objects.exists():
+        # Nothing to maintain; just keep the cursors from falling behind
+        changes.ChangeConsumer(CONSUMER).reset(changes.latest_sequence())
+        activity = changes.ActivityCursor(CONSUMER)
+        activity.save(activity.latest())
+        return 0
+    batch_size = batch_size or _setting('WORKLIST_BATCH_SIZE', 1000)
+    activity = changes.ActivityCursor(CONSUMER)
+    claim_ids, positions = activity.claims_since()
+    with transaction.atomic():
+        changed = apply_changes(claim_ids)
+        activity.save(positions)
+
+    changed_by_log = []
+    changes.ChangeConsumer(CONSUMER).consume(
+        lambda batch: changed_by_log.append(apply_changes({change.claim_id for change in batch})),
+        batch_size=batch_size,
+    )
+    return changed + sum(changed_by_log)
@@ -0,0 +1,25 @@
+"""
+ASGI config for erisa_recovery project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server, e.g.::
+
+    gunicorn erisa_recovery.asgi:application -k uvicorn.workers.UvicornWorker
+
+For more information on this file, see
+https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'erisa_recovery.settings')
+
+application = get_asgi_application()
+
+# Compile templates, open the database and fill the stats caches before the
+# first request (backend/warmup.py; WARMUP_ON_STARTUP turns it off)
+from backend.warmup import warm_up_on_startup  # noqa: E402
+
+warm_up_on_startup()
@@ -2,8 +2,12 @@
 Django settings for erisa_recovery project.
 """
 
+import os
+import tempfile
 from pathlib import Path
 
+import django
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -29,7 +33,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'backend.middleware.RequestTimingMiddleware',
+    'backend.middleware.PrimaryPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -57,15 +64,132 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'erisa_recovery.wsgi.application'
+ASGI_APPLICATION = 'erisa_recovery.asgi.application'
 
 # Database
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+        # Keep connections open between requests instead of reopening the file
+        # every time (set DB_CONN_MAX_AGE=0 when serving through ASGI)
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Seconds the sqlite3 driver waits for a lock before "database is locked"
+            'timeout': 20,
+        },
     }
 }
 
+# Take the write lock when a transaction starts, so read-then-write
+# transactions wait on busy_timeout instead of failing on lock upgrade
+if django.VERSION >= (5, 1):
+    DATABASES['default']['OPTIONS']['transaction_mode'] = 'IMMEDIATE'
+
+# Read replica for analytics traffic (database/routers.py). Only views marked
+# with reads_from_replica use it, and never within REPLICA_PIN_SECONDS of the
+# same client's last write. Locally, point SQLITE_REPLICA_PATH at a second
+# file and refresh it with `manage.py sync_replica`.
+DATABASE_ROUTERS = ['database.routers.ReplicaRouter']
+REPLICA_DATABASE_ALIAS = 'replica'
+REPLICA_PIN_SECONDS = 5
+REPLICA_PIN_COOKIE = 'db_primary_until'
+
+if os.environ.get('SQLITE_REPLICA_PATH'):
+    DATABASES[REPLICA_DATABASE_ALIAS] = {
+        **DATABASES['default'],
+        'NAME': os.environ['SQLITE_REPLICA_PATH'],
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        # Tests run against the primary's test database
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Horizontal sharding of claims by insurer (database/shards.py): claims and
+# their details, flags, notes, CPT links and archive tables live in the
+# CLAIM_SHARDS databases, everything else stays on default. Locally, list
+# several SQLite files in SQLITE_SHARD_PATHS (comma separated) and run
+# `manage.py migrate --database shardN` for each; unset means no sharding.
+CLAIM_SHARDS = []
+for _index, _path in enumerate(p for p in os.environ.get('SQLITE_SHARD_PATHS', '').split(',') if p.strip()):
+    CLAIM_SHARDS.append(f'shard{_index}')
+    DATABASES[f'shard{_index}'] = {
+        **DATABASES['default'],
+        'NAME': _path.strip(),
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+    }
+
+# SQLite performance profile, applied as pragmas on every new connection
+# (see database/sqlite.py). Set SQLITE_PROFILE = None to use SQLite defaults.
+SQLITE_PROFILE = {
+    # Readers no longer block the writer (and vice versa)
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+    # Durable at checkpoints; safe with WAL and much cheaper per commit
+    'synchronous': 'NORMAL',
+    # Milliseconds to wait for the write lock before raising "database is locked"
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 20000)),
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    # Negative values are KiB: 64 MiB page cache per connection
+    'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -64 * 1024)),
+    'temp_store': 'MEMORY',
+}
+
+# Imports commit every IMPORT_CHUNK_SIZE rows and pause briefly so flag/note
+# writes can take the SQLite write lock while a long import is running
+IMPORT_CHUNK_SIZE = 200
+IMPORT_CHUNK_PAUSE_SECONDS = 0.05
+
+# Upload previews (database/import_diff.py) keep the uploaded claim list and
+# its diff on disk for paging; previews older than the TTL are removed
+IMPORT_PREVIEW_DIR = os.path.join(tempfile.gettempdir(), 'erisa-import-previews')
+IMPORT_PREVIEW_TTL_SECONDS = 3600
+
+# Import profiling (database/import_profile.py, `load_claims --profile`):
+# batches kept per profiled import (neighbours are merged beyond that) and
+# profiled imports listed on the upload page
+IMPORT_PROFILE_MAX_BATCHES = 500
+IMPORT_HISTORY_SIZE = 20
+
+# Hot/cold archiving (database/archive.py, `manage.py archive_claims`): claims
+# in a final status discharged more than ARCHIVE_AFTER_DAYS ago move to the
+# archive tables, ARCHIVE_BATCH_SIZE claims per transaction
+ARCHIVE_AFTER_DAYS = 730
+ARCHIVE_STATUSES = ['Paid', 'Denied']
+ARCHIVE_BATCH_SIZE = 500
+
+# Claim change log (database/changes.py): `manage.py compact_claim_changes`
+# deletes changes every consumer has read once they are older than the
+# retention window, and compacts unread changes older than the compaction age
+CLAIM_CHANGE_RETENTION_DAYS = 90
+CLAIM_CHANGE_COMPACT_AFTER_HOURS = 24
+
+# Recovery-priority scores (database/priority.py): underpayment at which that
+# component is full, days since discharge at which age is, claims per batch,
+# and whether load_claims rescores the claims it changed
+PRIORITY_UNDERPAYMENT_CAP = 250000
+PRIORITY_AGE_DAYS = 730
+PRIORITY_BATCH_SIZE = 1000
+PRIORITY_SCORE_AFTER_IMPORT = True
+
+# Saved-filter worklists (database/worklists.py): change log entries applied
+# per transaction by `manage.py refresh_worklists` and after imports
+WORKLIST_BATCH_SIZE = 1000
+
+# Duplicate-claim detection (database/duplicates.py): pair similarity needed
+# to call two claims possible duplicates, width of the billed-amount buckets
+# relative to the amount, largest block compared pair by pair, claims per
+# batch, and whether load_claims checks the claims it changed
+DUPLICATE_MIN_SIMILARITY = 0.9
+DUPLICATE_AMOUNT_BUCKET = 0.05
+DUPLICATE_MAX_BLOCK_SIZE = 200
+DUPLICATE_BATCH_SIZE = 1000
+DUPLICATE_DETECT_AFTER_IMPORT = True
+
+# Claims JSON read API (backend/api.py): most ids per batch fetch and largest
+# cursor page
+CLAIMS_API_MAX_IDS = 1000
+CLAIMS_API_MAX_LIMIT = 1000
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -94,6 +218,54 @@ USE_TZ = True
 # Static files (CSS, JavaScript, Images)
 STATIC_URL = "static/"
 STATICFILES_DIRS = [BASE_DIR / "frontend" / "static"]
+STATIC_ROOT = BASE_DIR / "staticfiles"
+
+# collectstatic writes content-hashed copies plus .gz/.br variants; WhiteNoise
+# serves the hashed names with a far-future immutable Cache-Control header.
+# With DEBUG on, {% static %} keeps the plain names and files come straight
+# from the finders, so no collectstatic is needed during development.
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"},
+}
+
+# Live dashboard updates (server-sent events)
+# Each open stream holds a worker thread, so keep the per-process limit well
+# below the gunicorn thread count and let streams recycle periodically.
+SSE_MAX_CONNECTIONS_PER_WORKER = 8
+SSE_MAX_STREAM_SECONDS = 300
+SSE_POLL_INTERVAL = 1.0
+SSE_HEARTBEAT_SECONDS = 15
+SSE_EVENT_RETENTION_SECONDS = 3600
+
+# Cache settings (production_settings.py switches the shared tier to Redis)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'erisa-recovery',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    }
+}
+
+# Two-tier cache for dashboard/report aggregates (backend/caching.py).
+# Entries are keyed by a data version that writes bump, so the timeout only
+# bounds memory use; other workers notice a bump within
+# CACHE_VERSION_CHECK_SECONDS.
+CACHE_LAYER_ALIAS = 'default'
+CACHE_LAYER_TIMEOUT = 300
+CACHE_LOCAL_MAX_ENTRIES = 256
+CACHE_VERSION_CHECK_SECONDS = 1.0
+CACHE_LOCK_TIMEOUT = 30
+CACHE_LOCK_WAIT_SECONDS = 5
+
+# Worker warm-up (backend/warmup.py): compile templates, open the database
+# and fill the stats caches when the WSGI/ASGI application is loaded
+WARMUP_ON_STARTUP = os.environ.get('WARMUP_ON_STARTUP', '1') == '1'
+
+# Request instrumentation (backend/middleware.py): requests slower than the
+# threshold are logged as warnings together with their slowest queries
+SLOW_REQUEST_THRESHOLD_MS = 500
+SLOW_REQUEST_TOP_QUERIES = 5
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
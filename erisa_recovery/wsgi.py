@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'erisa_recovery.settings')
 
 application = get_wsgi_application()
+
+# Compile templates, open the database and fill the stats caches before the
+# first request (backend/warmup.py; WARMUP_ON_STARTUP turns it off)
+from backend.warmup import warm_up_on_startup  # noqa: E402
+
+warm_up_on_startup()
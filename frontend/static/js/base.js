@@ -0,0 +1,31 @@
+document.body.addEventListener('htmx:beforeRequest', (e) => {
+  console.log('[HTMX beforeRequest]', e.detail);
+});
+document.body.addEventListener('htmx:afterOnLoad', (e) => {
+  console.log('[HTMX afterOnLoad]', e.detail);
+});
+document.body.addEventListener('htmx:afterSwap', (e) => {
+  console.log('[HTMX afterSwap]', e.detail);
+});
+document.body.addEventListener('htmx:error', (e) => {
+  console.error('[HTMX error]', e.detail);
+});
+
+// Test if HTMX is loaded
+console.log('HTMX loaded:', typeof htmx !== 'undefined');
+if (typeof htmx !== 'undefined') {
+  console.log('HTMX version:', htmx.version);
+}
+
+// Auto-scroll to detail pane after HTMX content loads
+document.body.addEventListener('htmx:afterSwap', (e) => {
+  // Check if this is a detail pane update
+  if (e.target.id === 'detail-pane') {
+    // Smooth scroll to the detail pane
+    e.target.scrollIntoView({ 
+      behavior: 'smooth', 
+      block: 'start',
+      inline: 'nearest'
+    });
+  }
+});
@@ -0,0 +1,157 @@
+// Upload page behaviour. URLs come from the JSON config the template renders
+// with json_script.
+const uploadConfig = JSON.parse(document.getElementById('upload-config').textContent);
+
+function selectMode(mode) {
+  // Uncheck all radio buttons
+  document.querySelectorAll('input[name="mode"]').forEach(radio => {
+    radio.checked = false;
+  });
+  
+  // Check the selected mode
+  document.getElementById('mode_' + mode).checked = true;
+  
+  // Update visual selection
+  document.querySelectorAll('.mode-option').forEach(option => {
+    option.classList.remove('selected');
+  });
+  
+  // Add selected class to clicked option
+  event.currentTarget.classList.add('selected');
+  
+  // Show warning for overwrite mode
+  if (mode === 'overwrite') {
+    if (!confirm('⚠️ WARNING: Overwrite mode will delete ALL existing data and replace it with the CSV content. Are you absolutely sure?')) {
+      // Revert to smart mode if user cancels
+      document.getElementById('mode_smart').checked = true;
+      document.querySelectorAll('.mode-option').forEach(option => {
+        option.classList.remove('selected');
+      });
+      document.querySelector('.mode-option').classList.add('selected');
+    }
+  }
+}
+
+// Import preview: the server diffs the claim list against the database in bulk
+// and keeps the result, so paging through it doesn't re-read the file
+const PREVIEW_URL = uploadConfig.urls.preview;
+// Holds a TOKEN placeholder for the preview's token
+const PREVIEW_PAGE_URL = uploadConfig.urls.previewPage;
+const PREVIEW_CATEGORIES = {
+  changed: 'Changed',
+  new: 'New',
+  restored: 'Restored from archive',
+  missing: 'Not in file',
+};
+const previewState = {token: null, category: 'changed', page: 1, summary: null};
+
+function escapeHtml(value) {
+  const div = document.createElement('div');
+  div.textContent = value;
+  return div.innerHTML;
+}
+
+function previewImport() {
+  const listInput = document.getElementById('claim_list_file');
+  if (!listInput.files.length) {
+    alert('Choose a claim list file to preview.');
+    return;
+  }
+  const button = document.getElementById('previewBtn');
+  const data = new FormData();
+  data.append('claim_list_file', listInput.files[0]);
+  button.disabled = true;
+  button.textContent = '⏳ Comparing...';
+  fetch(PREVIEW_URL, {
+    method: 'POST',
+    body: data,
+    headers: {'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value},
+  })
+    .then(response => response.json())
+    .then(result => {
+      if (!result.success) {
+        alert(result.message);
+        return;
+      }
+      previewState.token = result.token;
+      previewState.summary = result.summary;
+      renderPreviewSummary(result.summary);
+      renderPreviewPage(result.page);
+      document.getElementById('importPreview').style.display = 'block';
+    })
+    .catch(error => alert('Preview failed: ' + error))
+    .finally(() => {
+      button.disabled = false;
+      button.textContent = '🔍 Preview Changes';
+    });
+}
+
+function renderPreviewSummary(summary) {
+  const mode = document.querySelector('input[name="mode"]:checked').value;
+  let text = `${summary.file_rows} rows compared in ${summary.seconds}s: ` +
+    `<strong>${summary.new}</strong> new, <strong>${summary.changed}</strong> changed, ` +
+    `${summary.unchanged} unchanged, ${summary.restored} restored from the archive, ` +
+    `${summary.missing} existing claims not in the file.`;
+  if (mode === 'append' && summary.changed) {
+    text += ' Append mode skips the changed claims.';
+  }
+  if (summary.duplicates) {
+    text += ` ${summary.duplicates} repeated ids (the last row wins).`;
+  }
+  if (summary.errors) {
+    text += ` ${summary.errors} rows could not be read and will be skipped:<br><small>` +
+      summary.error_samples.map(escapeHtml).join('<br>') + '</small>';
+  }
+  document.getElementById('previewSummary').innerHTML = text;
+  document.getElementById('previewTabs').innerHTML = Object.entries(PREVIEW_CATEGORIES)
+    .map(([category, label]) =>
+      `<button type="button" data-category="${category}" onclick="showPreviewCategory('${category}')" ` +
+      `style="margin-right: 6px;">${label} (${summary[category]})</button>`)
+    .join('');
+}
+
+function showPreviewCategory(category) {
+  previewState.category = category;
+  loadPreviewPage(1);
+}
+
+function loadPreviewPage(page) {
+  const url = PREVIEW_PAGE_URL.replace('TOKEN', previewState.token) +
+    `?category=${previewState.category}&page=${page}`;
+  fetch(url)
+    .then(response => response.json())
+    .then(result => {
+      if (!result.success) {
+        alert(result.message);
+        return;
+      }
+      renderPreviewPage(result.page);
+    });
+}
+
+function renderPreviewPage(page) {
+  previewState.category = page.category;
+  previewState.page = page.page;
+  document.querySelectorAll('#previewTabs button').forEach(button => {
+    button.style.fontWeight = button.dataset.category === page.category ? 'bold' : 'normal';
+  });
+  document.getElementById('previewRows').innerHTML = page.rows.map(row => {
+    const cells = row.changes
+      ? Object.entries(row.changes).map(([field, [before, after]]) =>
+          `${field}: <del style="color: #dc3545;">${escapeHtml(before)}</del> → ` +
+          `<ins style="color: #28a745;">${escapeHtml(after)}</ins>`)
+      : Object.entries(row.values).map(([field, value]) => `${field}: ${escapeHtml(value)}`);
+    return `<tr style="border-top: 1px solid #ddd;"><td style="padding: 8px;">${row.id}` +
+      `${row.archived ? ' <small>(archived)</small>' : ''}</td>` +
+      `<td style="padding: 8px;">${cells.join('<br>')}</td></tr>`;
+  }).join('') || '<tr><td colspan="2" style="padding: 8px; color: #555;">Nothing in this category.</td></tr>';
+  const pages = Math.max(Math.ceil(page.total / page.per_page), 1);
+  document.getElementById('previewPageInfo').textContent = `Page ${page.page} of ${pages}`;
+  document.getElementById('previewPrev').disabled = page.page <= 1;
+  document.getElementById('previewNext').disabled = !page.has_more;
+}
+
+// Initialize with smart mode selected
+document.addEventListener('DOMContentLoaded', function() {
+  document.querySelector('.mode-option').classList.add('selected');
+});
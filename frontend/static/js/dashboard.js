@@ -0,0 +1,1165 @@
+// Dashboard behaviour. Page-specific values (URLs, pagination state) come from
+// the JSON config the template renders with json_script.
+const dashboardConfig = JSON.parse(document.getElementById('dashboard-config').textContent);
+
+// Global variables
+let currentClaimId = null;
+let activeFilters = {
+  insurer: [],
+  status: [],
+  flagged: false
+};
+
+// Search functionality - now handled by Alpine.js
+
+// Filter functionality - now handled by Alpine.js
+
+// Restore essential JavaScript functions
+function toggleFilterDropdown() {
+  console.log('toggleFilterDropdown called');
+  const dropdown = document.getElementById('filterDropdown');
+  if (dropdown) {
+    if (dropdown.style.display === 'none' || dropdown.style.display === '') {
+      dropdown.style.display = 'block';
+      console.log('Filter dropdown shown');
+      // Add click outside to close
+      setTimeout(() => {
+        document.addEventListener('click', closeFilterOnClickOutside);
+      }, 100);
+    } else {
+      dropdown.style.display = 'none';
+      console.log('Filter dropdown hidden');
+      document.removeEventListener('click', closeFilterOnClickOutside);
+    }
+  } else {
+    console.log('Filter dropdown not found');
+  }
+}
+
+function closeFilterOnClickOutside(event) {
+  const dropdown = document.getElementById('filterDropdown');
+  const filterButton = event.target.closest('.filter-btn');
+  
+  if (dropdown && !dropdown.contains(event.target) && !filterButton) {
+    dropdown.style.display = 'none';
+    console.log('Filter dropdown closed by clicking outside');
+    document.removeEventListener('click', closeFilterOnClickOutside);
+  }
+}
+
+function toggleDetails(claimId) {
+  console.log('toggleDetails called for claim:', claimId);
+  const detailsRow = document.getElementById(`details-${claimId}`);
+  const arrow = document.getElementById(`arrow-${claimId}`);
+  
+  console.log('Details row found:', detailsRow);
+  
+  if (detailsRow) {
+    if (detailsRow.style.display === 'none' || detailsRow.style.display === '') {
+      detailsRow.style.display = 'table-row';
+      if (arrow) {
+        arrow.innerHTML = '▼';
+      }
+    } else {
+      detailsRow.style.display = 'none';
+      if (arrow) {
+        arrow.innerHTML = '▶';
+      }
+    }
+  } else {
+    console.log('Details row not found for claim:', claimId);
+  }
+}
+
+function addFlag(claimId) {
+  console.log('addFlag called for claim:', claimId);
+  // Show flag form
+  showFlagForm(claimId);
+}
+
+function showFlagForm(claimId) {
+  const flagForm = document.getElementById('flagForm');
+  if (flagForm) {
+    flagForm.style.display = 'block';
+    document.getElementById('flagClaimId').value = claimId;
+  }
+}
+
+function hideFlagForm() {
+  const flagForm = document.getElementById('flagForm');
+  if (flagForm) {
+    flagForm.style.display = 'none';
+  }
+}
+
+function addNote(claimId) {
+  console.log('addNote called for claim:', claimId);
+  showNoteForm(claimId);
+}
+
+function showNoteForm(claimId) {
+  const noteForm = document.getElementById('noteForm');
+  if (noteForm) {
+    noteForm.style.display = 'block';
+    document.getElementById('noteClaimId').value = claimId;
+  }
+}
+
+function hideNoteForm() {
+  const noteForm = document.getElementById('noteForm');
+  if (noteForm) {
+    noteForm.style.display = 'none';
+  }
+}
+
+// CSV Upload functionality
+function uploadCSV() {
+  const fileInput = document.getElementById('csvFileInput');
+  const uploadBtn = document.getElementById('uploadBtn');
+  const statusSpan = document.getElementById('uploadStatus');
+  
+  if (!fileInput.files[0]) {
+    statusSpan.textContent = 'Please select a CSV file first';
+    statusSpan.style.color = '#dc2626';
+    return;
+  }
+  
+  const formData = new FormData();
+  formData.append('claim_list_file', fileInput.files[0]);
+  
+  // Show loading state
+  uploadBtn.disabled = true;
+  uploadBtn.innerHTML = '⏳ Uploading...';
+  statusSpan.textContent = 'Uploading and processing CSV...';
+  statusSpan.style.color = '#2563eb';
+  
+  fetch(dashboardConfig.urls.csvUpload, {
+    method: 'POST',
+    body: formData,
+    headers: {
+      'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
+    }
+  })
+  .then(response => response.json())
+  .then(data => {
+    if (data.success) {
+      statusSpan.textContent = `✅ Success! ${data.message}`;
+      statusSpan.style.color = '#059669';
+      
+      // Live updates patch stats and rows as the import lands; reload only without them
+      if (!liveUpdatesConnected()) {
+        setTimeout(() => {
+          window.location.reload();
+        }, 1500);
+      }
+    } else {
+      statusSpan.textContent = `❌ Error: ${data.message}`;
+      statusSpan.style.color = '#dc2626';
+    }
+  })
+  .catch(error => {
+    console.error('Upload error:', error);
+    statusSpan.textContent = '❌ Upload failed. Please try again.';
+    statusSpan.style.color = '#dc2626';
+  })
+  .finally(() => {
+    // Reset button state
+    uploadBtn.disabled = false;
+    uploadBtn.innerHTML = `
+      <svg xmlns="http://www.w3.org/2000/svg" class="lucide lucide-upload" width="16" height="16" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round">
+        <path d="M21 15v4a2 2 0 0 1-2 2H5a2 2 0 0 1-2-2v-4"/>
+        <polyline points="7,10 12,15 17,10"/>
+        <line x1="12" y1="15" x2="12" y2="3"/>
+      </svg>
+      <span style="font-family: 'Inter', -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;">Upload CSV Data</span>
+    `;
+  });
+}
+
+// Handle file selection
+document.getElementById('csvFileInput').addEventListener('change', function(e) {
+  const statusSpan = document.getElementById('uploadStatus');
+  if (e.target.files[0]) {
+    statusSpan.textContent = `Selected: ${e.target.files[0].name}`;
+    statusSpan.style.color = '#059669';
+  } else {
+    statusSpan.textContent = '';
+  }
+});
+
+// Sidebar status filtering
+function filterByStatus(status) {
+  console.log('filterByStatus called with status:', status);
+  
+  // Update active state in sidebar
+  document.querySelectorAll('.status-option').forEach(option => {
+    option.classList.remove('active');
+    option.style.background = 'white';
+    option.style.borderLeft = '4px solid transparent';
+  });
+  
+  // Highlight selected option
+  const selectedOption = event.currentTarget;
+  console.log('Selected option:', selectedOption);
+  selectedOption.classList.add('active');
+  
+  if (status === 'all') {
+    selectedOption.style.background = '#eff6ff';
+    selectedOption.style.borderLeft = '4px solid #2563eb';
+    console.log('Showing all claims');
+    showAllClaims();
+  } else {
+    // Set appropriate colors based on status
+    let bgColor, borderColor;
+    switch(status) {
+      case 'pending':
+        bgColor = '#fefce8';
+        borderColor = '#d97706';
+        break;
+      case 'under_review':
+        bgColor = '#f1f5f9';
+        borderColor = '#4b5563';
+        break;
+      case 'paid':
+        bgColor = '#f0fdf4';
+        borderColor = '#059669';
+        break;
+      case 'denied':
+        bgColor = '#fef2f2';
+        borderColor = '#b91c1c';
+        break;
+      case 'underpaid':
+        bgColor = '#f3f4f6';
+        borderColor = '#6d28d9';
+        break;
+    }
+    selectedOption.style.background = bgColor;
+    selectedOption.style.borderLeft = `4px solid ${borderColor}`;
+    
+    console.log('Filtering claims by status:', status);
+    // Filter claims by status
+    filterClaimsByStatus(status);
+  }
+}
+
+function filterClaimsByStatus(status) {
+  console.log('filterClaimsByStatus called with status:', status);
+  const rows = document.querySelectorAll('.claim-row');
+  console.log('Found claim rows:', rows.length);
+  
+  rows.forEach((row, index) => {
+    const statusCell = row.querySelector('td:nth-child(4) .status-badge');
+    if (statusCell) {
+      const claimStatus = statusCell.textContent.toLowerCase().replace(/\s+/g, '_');
+      console.log(`Row ${index}: claim status = "${claimStatus}", filtering for "${status}"`);
+      if (claimStatus === status) {
+        row.style.display = '';
+        console.log(`Row ${index}: showing`);
+      } else {
+        row.style.display = 'none';
+        console.log(`Row ${index}: hiding`);
+      }
+    } else {
+      console.log(`Row ${index}: no status badge found`);
+    }
+  });
+}
+
+function filterByInsurer() {
+  console.log('filterByInsurer called');
+  const checkboxes = document.querySelectorAll('input[value="Aetna"], input[value="Blue Cross"], input[value="Cigna"], input[value="Humana"], input[value="UnitedHealth"], input[value="Other"]');
+  activeFilters.insurer = Array.from(checkboxes)
+    .filter(cb => cb.checked)
+    .map(cb => cb.value);
+  console.log('Active insurer filters:', activeFilters.insurer);
+  applyClientSideFilters();
+}
+
+// Legacy filterByStatus function for checkbox filters (kept for compatibility)
+function filterByStatusCheckbox() {
+  const checkboxes = document.querySelectorAll('input[value="Denied"], input[value="Paid"], input[value="Under Review"], input[value="Underpaid"]');
+  activeFilters.status = Array.from(checkboxes)
+    .filter(cb => cb.checked)
+    .map(cb => cb.value);
+  applyClientSideFilters();
+}
+
+// Flagged and has-notes are filtered server-side, so every page only holds matching claims
+function filterByFlagged() {
+  const checkbox = document.querySelector('input[value="Flagged"]');
+  reloadWithParams({ flagged: checkbox.checked ? '1' : '' });
+}
+
+function filterByHasNotes(checked) {
+  reloadWithParams({ has_notes: checked ? '1' : '' });
+}
+
+function clearAllFilters() {
+  // Uncheck all checkboxes
+  document.querySelectorAll('input[type="checkbox"]').forEach(cb => cb.checked = false);
+  
+  // Reset active filters
+  activeFilters = { insurer: [], status: [], flagged: false };
+  
+  // Show all claims
+  showAllClaims();
+  updateVisibleRowCount();
+}
+
+function showAllClaims() {
+  const rows = document.querySelectorAll('.claim-row');
+  rows.forEach(row => row.style.display = '');
+}
+
+function applyClientSideFilters() {
+  const rows = document.querySelectorAll('.claim-row');
+  
+  rows.forEach(row => {
+    let shouldShow = true;
+    
+    // Check insurer filter
+    if (activeFilters.insurer.length > 0) {
+      const insurerCell = row.querySelector('td:nth-child(3)'); // Insurer column
+      if (insurerCell) {
+        const insurerText = insurerCell.textContent.trim();
+        const matchesInsurer = activeFilters.insurer.some(insurer => 
+          insurerText.toLowerCase().includes(insurer.toLowerCase())
+        );
+        if (!matchesInsurer) shouldShow = false;
+      }
+    }
+    
+    // Check status filter
+    if (activeFilters.status.length > 0) {
+      const statusCell = row.querySelector('td:nth-child(4)'); // Status column
+      if (statusCell) {
+        const statusBadge = statusCell.querySelector('.status-badge');
+        if (statusBadge) {
+          const statusText = statusBadge.textContent.trim();
+          const matchesStatus = activeFilters.status.some(status => 
+            statusText.toLowerCase().includes(status.toLowerCase())
+          );
+          if (!matchesStatus) shouldShow = false;
+        }
+      }
+    }
+    
+    // Check flagged filter
+    if (activeFilters.flagged) {
+      // Check if the row has a data attribute indicating it has flags
+      const hasFlags = row.getAttribute('data-has-flags') === 'true';
+      const claimId = row.querySelector('td:first-child').textContent.trim();
+      console.log(`Claim ${claimId}: hasFlags=${hasFlags}`);
+      if (!hasFlags) shouldShow = false;
+    }
+    
+    // Show or hide the row
+    row.style.display = shouldShow ? '' : 'none';
+  });
+  
+  // Update visible row count
+  updateVisibleRowCount();
+}
+
+function updateVisibleRowCount() {
+  const visibleRows = document.querySelectorAll('.claim-row:not([style*="display: none"])');
+  console.log(`Showing ${visibleRows.length} filtered rows`);
+}
+
+function applyFilters() {
+  // Reset pagination when filters are applied
+  currentPage = 1;
+  
+  // Reload claims with current filters
+  loadClaimsPage(currentPage);
+}
+
+// Action functions
+function toggleDetails(claimId) {
+  console.log('toggleDetails called for claim:', claimId);
+  const detailsRow = document.getElementById(`details-${claimId}`);
+  const arrow = document.getElementById(`arrow-${claimId}`);
+  
+  console.log('Details row found:', detailsRow);
+  console.log('Arrow found:', arrow);
+  
+  if (detailsRow && arrow) {
+    if (detailsRow.style.display === 'table-row') {
+      // Collapse details
+      console.log('Collapsing details for claim:', claimId);
+      detailsRow.style.display = 'none';
+      arrow.innerHTML = `<svg xmlns="http://www.w3.org/2000/svg" class="lucide lucide-chevron-right" width="16" height="16" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round">
+        <polyline points="9,18 15,12 9,6"/>
+      </svg>`;
+    } else {
+      // Expand details - show all sections except flags
+      console.log('Expanding details for claim:', claimId);
+      hideAllSections();
+      detailsRow.style.display = 'table-row';
+      
+      const claimInfoSection = detailsRow.querySelector('.claim-info-section');
+      const medicalDetailsSection = detailsRow.querySelector('.medical-details-section');
+      const notesSection = detailsRow.querySelector('.notes-section');
+      const flagsSection = detailsRow.querySelector('.flags-section');
+      
+      if (claimInfoSection) claimInfoSection.style.display = 'block';
+      if (medicalDetailsSection) medicalDetailsSection.style.display = 'block';
+      if (notesSection) notesSection.style.display = 'block';
+      if (flagsSection) flagsSection.style.display = 'none'; // Hide flags
+      
+      // Rotate arrow to point down
+      arrow.innerHTML = `<svg xmlns="http://www.w3.org/2000/svg" class="lucide lucide-chevron-down" width="16" height="16" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round">
+        <polyline points="6,9 12,15 18,9"/>
+      </svg>`;
+    }
+  } else {
+    console.log('Details row or arrow not found for claim:', claimId);
+  }
+}
+
+function viewFlags(claimId) {
+  if (dashboardConfig.grid) {
+    // The detail modal lists the claim's flags
+    showClaimDetail(claimId);
+    return;
+  }
+  hideAllSections();
+  const detailsRow = document.getElementById(`details-${claimId}`);
+  if (detailsRow) {
+    detailsRow.style.display = 'table-row';
+    
+         // Show only the flags section, hide all others
+     const flagsSection = detailsRow.querySelector('.flags-section');
+     const claimInfoSection = detailsRow.querySelector('.claim-info-section');
+     const medicalDetailsSection = detailsRow.querySelector('.medical-details-section');
+     const notesSection = detailsRow.querySelector('.notes-section');
+     
+    // Show flags section
+    if (flagsSection) {
+      flagsSection.style.display = 'block';
+      console.log('Flags section displayed for claim:', claimId);
+      
+      // Check if there are any flags in the section
+      const flagItems = flagsSection.querySelectorAll('.flag-item');
+      console.log('Number of flag items found:', flagItems.length);
+      
+      // If no flags are found, show the "No flags yet" message
+      if (flagItems.length === 0) {
+        const noFlagsMessage = flagsSection.querySelector('.empty-list');
+        if (noFlagsMessage) {
+          noFlagsMessage.style.display = 'block';
+        }
+      }
+    }
+    
+    // Hide all other sections
+    if (claimInfoSection) {
+      claimInfoSection.style.display = 'none';
+    }
+    if (medicalDetailsSection) {
+      medicalDetailsSection.style.display = 'none';
+    }
+    if (notesSection) {
+      notesSection.style.display = 'none';
+    }
+    
+    // Also hide the medical details section that doesn't have a specific class
+    const allDetailSections = detailsRow.querySelectorAll('.detail-section');
+    allDetailSections.forEach(section => {
+      if (!section.classList.contains('flags-section')) {
+        section.style.display = 'none';
+      }
+    });
+    
+    // Update arrow to point down when showing flags
+    const arrow = document.getElementById(`arrow-${claimId}`);
+    if (arrow) {
+      arrow.innerHTML = `<svg xmlns="http://www.w3.org/2000/svg" class="lucide lucide-chevron-down" width="16" height="16" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round">
+        <polyline points="6,9 12,15 18,9"/>
+      </svg>`;
+    }
+  }
+}
+
+function addFlag(claimId) {
+  // Simple flag addition - you can enhance this with a form
+  fetch(`/${claimId}/flag/`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
+    },
+    body: JSON.stringify({})
+  })
+  .then(response => response.json())
+  .then(data => {
+    if (data.success) {
+      alert('Flag added successfully!');
+      // Update the dashboard count (the live stats event does this when connected)
+      if (!liveUpdatesConnected()) {
+        updateFlagsCount();
+      }
+      // Add the new flag to the display
+      addFlagToDisplay(claimId, data);
+      // Show the flags immediately for this claim
+      viewFlags(claimId);
+    } else {
+      alert('Error adding flag: ' + data.error);
+    }
+  })
+  .catch(error => {
+    console.error('Error:', error);
+    alert('Error adding flag');
+  });
+}
+
+
+
+function showNoteForm(claimId) {
+  currentClaimId = claimId;
+  document.getElementById('noteModal').style.display = 'block';
+  document.getElementById('noteText').focus();
+}
+
+function hideNoteForm() {
+  document.getElementById('noteModal').style.display = 'none';
+  document.getElementById('noteForm').reset();
+  currentClaimId = null;
+}
+
+function hideDetails(claimId) {
+  const detailsRow = document.getElementById(`details-${claimId}`);
+  const arrow = document.getElementById(`arrow-${claimId}`);
+  if (detailsRow) {
+    detailsRow.style.display = 'none';
+  }
+  if (arrow) {
+    // Reset arrow to point right
+    arrow.innerHTML = `<svg xmlns="http://www.w3.org/2000/svg" class="lucide lucide-chevron-right" width="16" height="16" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round">
+      <polyline points="9,18 15,12 9,6"/>
+    </svg>`;
+  }
+}
+
+function hideAllSections() {
+  // Hide all detail rows
+  document.querySelectorAll('.claim-details-row').forEach(row => {
+    row.style.display = 'none';
+  });
+  
+  // Reset all arrows to point right
+  document.querySelectorAll('.expand-arrow').forEach(arrow => {
+    arrow.innerHTML = `<svg xmlns="http://www.w3.org/2000/svg" class="lucide lucide-chevron-right" width="16" height="16" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round">
+      <polyline points="9,18 15,12 9,6"/>
+    </svg>`;
+  });
+}
+
+function saveNote(event) {
+  event.preventDefault();
+  
+  if (!currentClaimId) return;
+  
+  const noteText = document.getElementById('noteText').value.trim();
+  if (!noteText) return;
+  
+  fetch(`/${currentClaimId}/note/`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
+    },
+    body: JSON.stringify({ text: noteText })
+  })
+  .then(response => response.json())
+  .then(data => {
+    if (data.success) {
+      alert('Note added successfully!');
+      hideNoteForm();
+      if (!liveUpdatesConnected()) {
+        location.reload(); // Refresh to show new note
+      }
+    } else {
+      alert('Error adding note: ' + data.error);
+    }
+  })
+  .catch(error => {
+    console.error('Error:', error);
+    alert('Error adding note');
+  });
+}
+
+// Close modal when clicking outside
+window.onclick = function(event) {
+  const modal = document.getElementById('noteModal');
+  if (event.target === modal) {
+    hideNoteForm();
+  }
+}
+
+// Update flags count in dashboard
+function updateFlagsCount() {
+  // Find the flagged claims count element and increment it
+  const flaggedCountElement = document.querySelector('.stat-card:nth-child(2) .card-number');
+  if (flaggedCountElement) {
+    const currentCount = parseInt(flaggedCountElement.textContent) || 0;
+    flaggedCountElement.textContent = currentCount + 1;
+  }
+}
+
+// Add new flag to display
+function addFlagToDisplay(claimId, flagData) {
+  const flagsList = document.getElementById(`flags-${claimId}`);
+  if (flagsList) {
+    const flagItem = document.createElement('div');
+    flagItem.className = 'flag-item';
+    
+    const timestamp = new Date().toLocaleString('en-US', {
+      month: 'short',
+      day: 'numeric',
+      year: 'numeric',
+      hour: 'numeric',
+      minute: 'numeric'
+    });
+    
+    flagItem.innerHTML = `
+      <div class="item-meta">${timestamp}</div>
+      <div class="item-body">Flagged by: System</div>
+    `;
+    
+    // Remove "No flags yet" message if it exists
+    const noFlagsMessage = flagsList.querySelector('.empty-list');
+    if (noFlagsMessage) {
+      noFlagsMessage.remove();
+    }
+    
+    flagsList.appendChild(flagItem);
+  }
+}
+
+// Pagination variables
+let currentPage = dashboardConfig.currentPage;
+let hasMoreClaims = dashboardConfig.hasMore;
+let hasPreviousClaims = dashboardConfig.hasPrevious;
+
+// Load more claims function
+function loadMoreClaims() {
+  const nextBtn = document.getElementById('nextBtn');
+  if (!hasMoreClaims || (nextBtn && nextBtn.disabled)) return;
+  
+  currentPage++;
+  loadClaimsPage(currentPage);
+}
+
+// Load previous claims function
+function loadPreviousClaims() {
+  const prevBtn = document.getElementById('prevBtn');
+  if (!hasPreviousClaims || currentPage <= 1 || (prevBtn && prevBtn.disabled)) return;
+  
+  currentPage--;
+  loadClaimsPage(currentPage);
+}
+
+// Query parameters for the server-side filters (status, insurer, CPT code, archived,
+// sort, ranges, flagged, has notes)
+function serverFilterParams() {
+  const statusFilter = document.querySelector('input[value="Denied"]:checked, input[value="Paid"]:checked, input[value="Under Review"]:checked, input[value="Underpaid"]:checked');
+  const insurerFilter = document.querySelector('input[value="Aetna"]:checked, input[value="Blue Cross"]:checked, input[value="Cigna"]:checked, input[value="Humana"]:checked, input[value="UnitedHealth"]:checked, input[value="Other"]:checked');
+  
+  const params = new URLSearchParams();
+  params.set('status', statusFilter ? statusFilter.value : '');
+  params.set('insurer', insurerFilter ? insurerFilter.value : '');
+  if (dashboardConfig.cptCode) params.set('cpt', dashboardConfig.cptCode);
+  if (dashboardConfig.includeArchived) params.set('archived', '1');
+  if (dashboardConfig.worklist) params.set('worklist', dashboardConfig.worklist);
+  Object.entries(dashboardConfig.query).forEach(([name, value]) => params.set(name, value));
+  return params;
+}
+
+// Reload the dashboard from page 1 with the given parameters changed ('' removes one)
+function reloadWithParams(changes) {
+  const url = new URL(window.location.href);
+  if (dashboardConfig.worklist) {
+    // Changing a worklist's filters leaves the worklist for the live table with those filters
+    url.search = new URLSearchParams(dashboardConfig.filterSpec).toString();
+    if (dashboardConfig.grid) url.searchParams.set('view', 'grid');
+  }
+  Object.entries(changes).forEach(([name, value]) => {
+    if (value) {
+      url.searchParams.set(name, value);
+    } else {
+      url.searchParams.delete(name);
+    }
+  });
+  url.searchParams.delete('page');
+  window.location.href = url.toString();
+}
+
+// Sort the table server-side by a column; clicking the current sort column reverses it
+function sortClaims(column) {
+  const current = dashboardConfig.query.sort || 'id';
+  const sort = current === column ? `-${column}` : column;
+  reloadWithParams({ sort: sort === 'id' ? '' : sort });
+}
+
+// Apply the sort and range fields of the "Sort & Ranges" filter form
+function applyTableQuery(event) {
+  event.preventDefault();
+  const form = event.target;
+  const changes = { sort: `${form.direction.value}${form.sort.value}` };
+  if (changes.sort === 'id') changes.sort = '';
+  ['billed_min', 'billed_max', 'paid_min', 'paid_max', 'discharged_from', 'discharged_to'].forEach(name => {
+    changes[name] = form.elements[name].value.trim();
+  });
+  reloadWithParams(changes);
+}
+
+// Reload the dashboard showing only claims that billed the entered CPT code
+function applyCptFilter(event) {
+  event.preventDefault();
+  reloadWithParams({ cpt: document.getElementById('cptFilter').value.trim() });
+}
+
+// Reload the dashboard with or without archived claims
+function toggleArchived(include) {
+  reloadWithParams({ archived: include ? '1' : '' });
+}
+
+// Load claims for a specific page
+function loadClaimsPage(page) {
+  // Build URL with the current filter values
+  const params = serverFilterParams();
+  params.set('page', page);
+  const url = `${dashboardConfig.urls.loadMore}?${params}`;
+  
+  // Show loading state for the appropriate button
+  const loadMoreBtn = document.getElementById('nextBtn');
+  const loadPrevBtn = document.getElementById('prevBtn');
+  
+  if (page > currentPage && loadMoreBtn) {
+    loadMoreBtn.textContent = '⏳';
+    loadMoreBtn.disabled = true;
+  } else if (page < currentPage && loadPrevBtn) {
+    loadPrevBtn.textContent = '⏳';
+    loadPrevBtn.disabled = true;
+  }
+  
+  fetch(url)
+    .then(response => response.json())
+    .then(data => {
+      if (data.success) {
+        // Replace the tbody content with new claims
+        const tbody = document.querySelector('.claims-table tbody');
+        if (tbody) {
+          tbody.innerHTML = data.html;
+        }
+        
+        // Update pagination state
+        hasMoreClaims = data.has_more;
+        hasPreviousClaims = data.has_previous;
+        currentPage = data.current_page;
+        
+        // Update pagination info
+        updatePaginationInfo();
+        
+        // Re-enable buttons
+        if (page > currentPage && loadMoreBtn) {
+          loadMoreBtn.textContent = '➡️';
+          loadMoreBtn.disabled = false;
+        } else if (page < currentPage && loadPrevBtn) {
+          loadPrevBtn.textContent = '⬅️';
+          loadPrevBtn.disabled = false;
+        }
+        
+        // Re-attach event listeners to new elements
+        reattachEventListeners();
+             } else {
+         alert('Error loading claims: ' + data.error);
+         // Re-enable buttons on error
+         if (page > currentPage && loadMoreBtn) {
+           loadMoreBtn.textContent = '➡️';
+           loadMoreBtn.disabled = false;
+         } else if (page < currentPage && loadPrevBtn) {
+           loadPrevBtn.textContent = '⬅️';
+           loadPrevBtn.disabled = false;
+         }
+       }
+    })
+         .catch(error => {
+       console.error('Error:', error);
+       alert('Error loading claims');
+       // Re-enable buttons on error
+       if (page > currentPage && loadMoreBtn) {
+         loadMoreBtn.textContent = '➡️';
+         loadMoreBtn.disabled = false;
+       } else if (page < currentPage && loadPrevBtn) {
+         loadPrevBtn.textContent = '⬅️';
+         loadPrevBtn.disabled = false;
+       }
+     });
+}
+
+// Update pagination information display
+function updatePaginationInfo() {
+  const paginationInfo = document.querySelector('.pagination-info');
+  if (paginationInfo) {
+    const start = ((currentPage - 1) * 30) + 1;
+    const end = Math.min(currentPage * 30, 100);
+    paginationInfo.textContent = `Showing claims ${start} - ${end}`;
+  }
+  
+  // Update arrow button states
+  const prevBtn = document.getElementById('prevBtn');
+  const nextBtn = document.getElementById('nextBtn');
+  
+  if (prevBtn) {
+    if (hasPreviousClaims) {
+      prevBtn.style.opacity = '1';
+      prevBtn.style.cursor = 'pointer';
+      prevBtn.disabled = false;
+    } else {
+      prevBtn.style.opacity = '0.5';
+      prevBtn.style.cursor = 'not-allowed';
+      prevBtn.disabled = true;
+    }
+  }
+  
+  if (nextBtn) {
+    if (hasMoreClaims) {
+      nextBtn.style.opacity = '1';
+      nextBtn.style.cursor = 'pointer';
+      nextBtn.disabled = false;
+    } else {
+      nextBtn.style.opacity = '0.5';
+      nextBtn.style.cursor = 'not-allowed';
+      nextBtn.disabled = true;
+    }
+  }
+}
+
+// Re-attach event listeners to new elements after AJAX load
+function reattachEventListeners() {
+  // Re-attach hover effects to new claim rows
+  const newRows = document.querySelectorAll('.claim-row');
+  newRows.forEach(row => {
+    row.addEventListener('mouseover', function() {
+      this.style.backgroundColor = '#f8f9fa';
+    });
+    row.addEventListener('mouseout', function() {
+      this.style.backgroundColor = 'white';
+    });
+  });
+}
+
+// Grid view (?view=grid): every claim matching the filters in one scrolling
+// table. Rows arrive from the grid endpoint in column-oriented chunks
+// (backend/grid.py) and only the rows in view, plus GRID_OVERSCAN on either
+// side, are in the DOM; spacer rows above and below keep the scrollbar true.
+const GRID_ROW_HEIGHT = 41;  // .claims-grid-viewport tr.claim-row in claims-table.css
+const GRID_CHUNK_SIZE = 500;
+const GRID_OVERSCAN = 10;
+const gridState = {
+  total: null,
+  chunks: new Map(),    // chunk index -> response
+  loading: new Set(),
+  reload: new Set(),    // chunks that changed while their request was in flight
+  frame: null,
+  interactive: false,
+};
+
+function initGrid() {
+  const viewport = document.getElementById('gridViewport');
+  viewport.addEventListener('scroll', scheduleGridRender, { passive: true });
+  window.addEventListener('resize', scheduleGridRender);
+  document.getElementById('gridBody').addEventListener('click', handleGridClick);
+  loadGridChunk(0);
+}
+
+function loadGridChunk(index) {
+  if (gridState.loading.has(index)) return;
+  gridState.loading.add(index);
+  
+  const params = serverFilterParams();
+  params.set('start', index * GRID_CHUNK_SIZE);
+  params.set('limit', GRID_CHUNK_SIZE);
+  fetch(`${dashboardConfig.urls.grid}?${params}`)
+    .then(response => response.json())
+    .then(data => {
+      gridState.loading.delete(index);
+      if (!data.success) {
+        document.getElementById('gridCount').textContent = `Error loading claims: ${data.error}`;
+        return;
+      }
+      if (data.total !== undefined) {
+        gridState.total = data.total;
+        document.getElementById('gridCount').textContent = `${data.total.toLocaleString()} claims`;
+      }
+      gridState.chunks.set(index, data);
+      if (gridState.reload.delete(index)) loadGridChunk(index);
+      scheduleGridRender();
+    })
+    .catch(error => {
+      gridState.loading.delete(index);
+      console.error('Error loading grid rows:', error);
+    });
+}
+
+function scheduleGridRender() {
+  if (gridState.frame === null) {
+    gridState.frame = requestAnimationFrame(renderGrid);
+  }
+}
+
+function gridSpacer(height) {
+  const row = document.createElement('tr');
+  row.className = 'grid-spacer';
+  const cell = document.createElement('td');
+  cell.colSpan = 8;
+  cell.style.height = `${height}px`;
+  row.appendChild(cell);
+  return row;
+}
+
+// Replace the rendered rows with the ones in view, fetching chunks not loaded yet
+function renderGrid() {
+  gridState.frame = null;
+  const viewport = document.getElementById('gridViewport');
+  const total = gridState.total || 0;
+  const first = Math.max(0, Math.floor(viewport.scrollTop / GRID_ROW_HEIGHT) - GRID_OVERSCAN);
+  const last = Math.min(total, first + Math.ceil(viewport.clientHeight / GRID_ROW_HEIGHT) + 2 * GRID_OVERSCAN);
+  const template = document.getElementById('gridRowTemplate').content.firstElementChild;
+  
+  const fragment = document.createDocumentFragment();
+  fragment.appendChild(gridSpacer(first * GRID_ROW_HEIGHT));
+  let complete = true;
+  for (let position = first; position < last; position++) {
+    const index = Math.floor(position / GRID_CHUNK_SIZE);
+    const chunk = gridState.chunks.get(index);
+    const row = template.cloneNode(true);
+    if (chunk && position - chunk.start < chunk.columns.id.length) {
+      fillGridRow(row, chunk, position - chunk.start);
+    } else {
+      if (!chunk) loadGridChunk(index);
+      row.classList.add('claim-row-loading');
+      row.querySelector('[data-column="patient_name"]').textContent = 'Loading…';
+      row.querySelectorAll('button, [data-column="status"], [data-column="archived"]').forEach(el => el.remove());
+      complete = false;
+    }
+    fragment.appendChild(row);
+  }
+  fragment.appendChild(gridSpacer((total - last) * GRID_ROW_HEIGHT));
+  document.getElementById('gridBody').replaceChildren(fragment);
+  
+  if (!gridState.interactive && complete && gridState.total !== null) {
+    // First screen of real rows; read it with performance.getEntriesByName()
+    gridState.interactive = true;
+    performance.mark('claims-grid-interactive');
+  }
+}
+
+function fillGridRow(row, chunk, offset) {
+  const columns = chunk.columns;
+  const billed = columns.billed_amount[offset];
+  const paid = columns.paid_amount[offset];
+  const status = chunk.dictionaries.status[columns.status[offset]];
+  const archived = columns.archived[offset] === 1;
+  const text = (name, value) => {
+    row.querySelector(`[data-column="${name}"]`).textContent = value;
+  };
+  
+  row.dataset.claimId = columns.id[offset];
+  text('id', columns.id[offset]);
+  text('patient_name', columns.patient_name[offset]);
+  text('insurer_name', chunk.dictionaries.insurer_name[columns.insurer_name[offset]]);
+  text('status', status);
+  text('billed_amount', `$${billed.toFixed(2)}`);
+  text('paid_amount', `$${paid.toFixed(2)}`);
+  text('underpayment', `$${Math.max(billed - paid, 0).toFixed(2)}`);
+  // Same class as |lower|cut:' ' in claims_table_rows.html
+  row.querySelector('[data-column="status"]').classList.add(`status-${status.toLowerCase().replace(/ /g, '')}`);
+  if (archived) {
+    row.classList.add('claim-row-archived');
+    row.querySelectorAll('[data-action="add-flag"], [data-action="note"]').forEach(el => el.remove());
+  } else {
+    row.querySelector('[data-column="archived"]').remove();
+  }
+}
+
+function handleGridClick(event) {
+  const button = event.target.closest('[data-action]');
+  const row = button && button.closest('tr');
+  if (!row || !row.dataset.claimId) return;
+  
+  const claimId = Number(row.dataset.claimId);
+  if (button.dataset.action === 'detail' || button.dataset.action === 'flags') {
+    showClaimDetail(claimId);
+  } else if (button.dataset.action === 'add-flag') {
+    addFlag(claimId);
+  } else if (button.dataset.action === 'note') {
+    addNote(claimId);
+  }
+}
+
+// Refetch the loaded chunks holding changed claims; their old rows stay until the new ones arrive
+function refreshGridRows(ids) {
+  const changed = new Set(ids);
+  gridState.chunks.forEach((chunk, index) => {
+    if (!chunk.columns.id.some(id => changed.has(id))) return;
+    if (gridState.loading.has(index)) {
+      gridState.reload.add(index);
+    } else {
+      loadGridChunk(index);
+    }
+  });
+}
+
+// Grid rows have no details row, so details open in a modal with the claim detail partial
+function showClaimDetail(claimId) {
+  fetch(`/${claimId}/detail/partial/`)
+    .then(response => {
+      if (!response.ok) throw new Error(`HTTP ${response.status}`);
+      return response.text();
+    })
+    .then(html => {
+      const pane = document.getElementById('detail-pane');
+      pane.innerHTML = html;
+      // The partial's links and forms are htmx requests targeting #detail-pane
+      if (window.htmx) htmx.process(pane);
+      document.getElementById('claimDetailModal').classList.add('open');
+    })
+    .catch(error => {
+      console.error('Error loading claim details:', error);
+      alert('Error loading claim details');
+    });
+}
+
+function hideClaimDetail() {
+  document.getElementById('claimDetailModal').classList.remove('open');
+  document.getElementById('detail-pane').replaceChildren();
+}
+
+// Switch between the paged table and the grid view, keeping every other parameter
+function setTableView(view) {
+  const url = new URL(window.location.href);
+  if (view) {
+    url.searchParams.set('view', view);
+  } else {
+    url.searchParams.delete('view');
+  }
+  url.searchParams.delete('page');
+  window.location.href = url.toString();
+}
+
+// Live dashboard updates via server-sent events
+let liveEvents = null;
+
+function connectLiveUpdates() {
+  if (!window.EventSource) return;
+  
+  liveEvents = new EventSource(dashboardConfig.urls.events);
+  liveEvents.addEventListener('stats', e => applyStatsEvent(JSON.parse(e.data)));
+  liveEvents.addEventListener('claims', e => refreshClaimRows(JSON.parse(e.data).ids));
+  liveEvents.addEventListener('import', e => showImportProgress(JSON.parse(e.data)));
+}
+
+function liveUpdatesConnected() {
+  // CONNECTING still counts: the browser resumes from Last-Event-ID without losing events
+  return liveEvents !== null && liveEvents.readyState !== EventSource.CLOSED;
+}
+
+// Apply counter deltas and absolute values to every element bound to a stat
+function applyStatsEvent(data) {
+  Object.entries(data.deltas || {}).forEach(([key, delta]) => {
+    document.querySelectorAll(`[data-stat="${key}"]`).forEach(el => {
+      const current = parseInt(el.textContent.replace(/[^0-9-]/g, ''), 10) || 0;
+      el.textContent = (el.dataset.prefix || '') + (current + delta);
+    });
+  });
+  Object.entries(data.values || {}).forEach(([key, value]) => {
+    document.querySelectorAll(`[data-stat="${key}"]`).forEach(el => {
+      el.textContent = (el.dataset.prefix || '') + Math.round(value);
+    });
+  });
+}
+
+// Re-render only the changed claims that are currently on screen
+function refreshClaimRows(ids) {
+  if (dashboardConfig.grid) {
+    refreshGridRows(ids);
+    return;
+  }
+  const visibleIds = ids.filter(id => document.querySelector(`.claim-row[data-claim-id="${id}"]`));
+  if (visibleIds.length === 0) return;
+  
+  fetch(`${dashboardConfig.urls.claimRows}?ids=${visibleIds.join(',')}`)
+    .then(response => response.json())
+    .then(data => {
+      if (!data.success) return;
+      
+      Object.entries(data.rows).forEach(([claimId, html]) => {
+        const template = document.createElement('template');
+        template.innerHTML = html.trim();
+        
+        const oldRow = document.querySelector(`.claim-row[data-claim-id="${claimId}"]`);
+        const oldDetails = document.getElementById(`details-${claimId}`);
+        const newRow = template.content.querySelector('.claim-row');
+        const newDetails = template.content.querySelector('.claim-details-row');
+        if (!oldRow || !newRow) return;
+        
+        // Keep an open details panel (and whichever sections were showing) open across the swap
+        if (oldDetails && newDetails) {
+          newDetails.style.display = oldDetails.style.display;
+          const oldSections = oldDetails.querySelectorAll('.detail-section');
+          newDetails.querySelectorAll('.detail-section').forEach((section, index) => {
+            if (oldSections[index]) section.style.display = oldSections[index].style.display;
+          });
+          oldDetails.replaceWith(newDetails);
+        }
+        oldRow.replaceWith(newRow);
+      });
+      
+      reattachEventListeners();
+    })
+    .catch(error => console.error('Error refreshing claim rows:', error));
+}
+
+function showImportProgress(progress) {
+  const statusSpan = document.getElementById('uploadStatus');
+  if (!statusSpan) return;
+  
+  if (progress.done) {
+    statusSpan.textContent = progress.phase === 'failed' ? '❌ Import failed' : '✅ Import complete';
+    statusSpan.style.color = progress.phase === 'failed' ? '#dc2626' : '#059669';
+  } else {
+    const total = progress.total ? ` / ${progress.total}` : '';
+    statusSpan.textContent = `Importing ${progress.phase}: ${progress.processed}${total} rows`;
+    statusSpan.style.color = '#2563eb';
+  }
+}
+
+// Export and Report functions
+function exportToExcel() {
+  // Download the claims matching the current filters as CSV
+  window.location.href = `${dashboardConfig.urls.export}?${serverFilterParams()}`;
+}
+
+function generateReport() {
+  // Placeholder for report generation functionality
+  alert('Report generation functionality will be implemented here');
+}
+
+// Initialize page
+document.addEventListener('DOMContentLoaded', function() {
+  // Set initial state
+  showAllClaims();
+  
+  // Initialize pagination, or the grid view's first rows
+  if (dashboardConfig.grid) {
+    initGrid();
+  } else {
+    updatePaginationInfo();
+  }
+  
+  // Follow live changes from imports and other analysts
+  connectLiveUpdates();
+});
@@ -0,0 +1,21 @@
+"""gunicorn settings picked up automatically when gunicorn runs from the project root.
+
+Workers warm up (backend/warmup.py) before taking traffic. Without
+``--preload`` that already happens when each worker imports
+``erisa_recovery.wsgi``, and the hook below is a no-op; with ``--preload``
+the import happens once in the master, so the master drops its database
+connections before forking and each worker warms up its own.
+"""
+
+
+def pre_fork(server, worker):
+    from django.conf import settings
+
+    if settings.configured:
+        from django.db import connections
+        connections.close_all()
+
+
+def post_worker_init(worker):
+    from backend.warmup import warm_up_on_startup
+    warm_up_on_startup()